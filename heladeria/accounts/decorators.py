@@ -1,42 +1,79 @@
 # accounts/decorators.py
 from functools import wraps
+from inspect import iscoroutinefunction
+
 from django.shortcuts import redirect
 from django.contrib import messages
 
+from .models import UserPerfilAsignacion
+
 SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
 
+
+def _rol(u):
+    try:
+        return (u.active_asignacion.perfil.nombre or "").lower()
+    except Exception:
+        return ""
+
+
+async def _arol(u):
+    """Como `_rol`, pero con una consulta async (el acceso perezoso a FKs no se permite en vistas async)."""
+    if not u.active_asignacion_id:
+        return ""
+    nombre = await (
+        UserPerfilAsignacion.objects.filter(pk=u.active_asignacion_id)
+        .values_list("perfil__nombre", flat=True)
+        .afirst()
+    )
+    return (nombre or "").lower()
+
+
+async def ausuario(request):
+    """
+    Usuario autenticado en vistas async. Deja `request.user` ya resuelto para que
+    el código que lo lee después (ETag, vistas) no dispare una consulta síncrona.
+    """
+    u = await request.auser()
+    request.user = u
+    return u
+
+
 def perfil_required(allow=(), readonly_for=()):
     """
     - allow: roles con acceso total
     - readonly_for: roles con acceso SOLO LECTURA (métodos seguros)
     - superuser siempre pasa
+    Funciona con vistas síncronas y async.
     """
     allow = tuple(r.lower() for r in allow)
     readonly_for = tuple(r.lower() for r in readonly_for)
 
+    def permitido(request, u, rol):
+        return u.is_superuser or rol in allow or (rol in readonly_for and request.method in SAFE_METHODS)
+
+    def rechazar(request):
+        messages.error(request, "No tienes permisos para esta sección.")
+        return redirect("dashboard")
+
     def deco(view):
-        @wraps(view)
-        def _inner(request, *args, **kwargs):
-            u = request.user
-            if not u.is_authenticated:
-                return redirect("accounts:login")
-
-            if u.is_superuser:
-                return view(request, *args, **kwargs)
-
-            rol = ""
-            try:
-                rol = (u.active_asignacion.perfil.nombre or "").lower()
-            except Exception:
-                pass
-
-            if rol in allow:
-                return view(request, *args, **kwargs)
-
-            if rol in readonly_for and request.method in SAFE_METHODS:
-                return view(request, *args, **kwargs)
-
-            messages.error(request, "No tienes permisos para esta sección.")
-            return redirect("dashboard")
-        return _inner
-    return deco
\ No newline at end of file
+        if iscoroutinefunction(view):
+            async def _inner(request, *args, **kwargs):
+                u = await ausuario(request)
+                if not u.is_authenticated:
+                    return redirect("accounts:login")
+                rol = "" if u.is_superuser else await _arol(u)
+                if permitido(request, u, rol):
+                    return await view(request, *args, **kwargs)
+                return rechazar(request)
+        else:
+            def _inner(request, *args, **kwargs):
+                u = request.user
+                if not u.is_authenticated:
+                    return redirect("accounts:login")
+                rol = "" if u.is_superuser else _rol(u)
+                if permitido(request, u, rol):
+                    return view(request, *args, **kwargs)
+                return rechazar(request)
+        return wraps(view)(_inner)
+    return deco
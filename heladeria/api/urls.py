@@ -1,15 +1,14 @@
-from rest_framework import routers
-from django.urls import path, include
-from rest_framework.authtoken.views import obtain_auth_token
+from django.urls import path
 
-from .views import health, info, InsumoViewSet, CategoriaViewSet
-
-router = routers.DefaultRouter()
-router.register(r'insumos',InsumoViewSet)
-router.register(r'categoria',CategoriaViewSet)
+from .views import RECURSOS, detalle_recurso, health, info, listar_recurso
 
 urlpatterns = [
     path("health/", health, name="api-health"),
     path("info/", info, name="api-info"),
-    path('',include(router.urls)),
 ]
+
+for _recurso in RECURSOS:
+    urlpatterns += [
+        path(f"{_recurso}/", listar_recurso, {"recurso": _recurso}, name=f"api-{_recurso}-list"),
+        path(f"{_recurso}/<int:pk>/", detalle_recurso, {"recurso": _recurso}, name=f"api-{_recurso}-detail"),
+    ]
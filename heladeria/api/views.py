@@ -0,0 +1,280 @@
+"""
+API de lectura para integraciones (catálogo y movimientos), sin Django REST Framework.
+
+Cada recurso se sirve desde un solo queryset con `values_list()`, sin instanciar
+modelos. Parámetros comunes de los listados:
+
+    fields=a,b        columnas a devolver (por defecto todas las del recurso)
+    ids=1,2,3         búsqueda por lote de ids (máx. MAX_IDS)
+    after=<id>        paginación keyset: filas con id > after, ordenadas por id
+    limit=<n>         filas por página (default LIMIT_DEFAULT, máx. LIMIT_MAX)
+    inactivos=1       incluye registros desactivados
+    format=ndjson     streaming de todas las filas (desde `after`), una por línea
+
+La respuesta JSON trae `results` y `next` (URL de la página siguiente o null) y
+lleva ETag por versión de datos, igual que las APIs internas de inventario.
+"""
+import hmac
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+
+from accounts.services import user_has_role
+from inventario import metricas
+from inventario.models import (
+    Bodega, Categoria, Entrada, Insumo, InsumoLote, MovimientoLedger, Salida, UnidadMedida,
+)
+from inventario.versiones import calcular_etag, marcar_respuesta, respuesta_no_modificada
+
+API_VERSION = "1"
+LIMIT_DEFAULT = 100
+LIMIT_MAX = 1000
+MAX_IDS = 500
+CHUNK_STREAMING = 2000
+
+# Por recurso: modelo, columnas expuestas {nombre: ruta ORM} y modelos de los que depende el ETag
+RECURSOS = {
+    "insumos": {
+        "modelo": Insumo,
+        "campos": {
+            "id": "id",
+            "nombre": "nombre",
+            "categoria_id": "categoria_id",
+            "categoria": "categoria__nombre",
+            "unidad_medida": "unidad_medida__nombre_corto",
+            "stock_minimo": "stock_minimo",
+            "stock_maximo": "stock_maximo",
+            "precio_unitario": "precio_unitario",
+            "is_active": "is_active",
+            "updated_at": "updated_at",
+        },
+        "versiones": (Insumo, Categoria, UnidadMedida),
+    },
+    "categorias": {
+        "modelo": Categoria,
+        "campos": {
+            "id": "id",
+            "nombre": "nombre",
+            "descripcion": "descripcion",
+            "is_active": "is_active",
+            "updated_at": "updated_at",
+        },
+        "versiones": (Categoria,),
+    },
+    "bodegas": {
+        "modelo": Bodega,
+        "campos": {
+            "id": "id",
+            "nombre": "nombre",
+            "direccion": "direccion",
+            "descripcion": "descripcion",
+            "is_active": "is_active",
+            "updated_at": "updated_at",
+        },
+        "versiones": (Bodega,),
+    },
+    "lotes": {
+        "modelo": InsumoLote,
+        "campos": {
+            "id": "id",
+            "insumo_id": "insumo_id",
+            "insumo": "insumo__nombre",
+            "bodega_id": "bodega_id",
+            "bodega": "bodega__nombre",
+            "proveedor_id": "proveedor_id",
+            "fecha_ingreso": "fecha_ingreso",
+            "fecha_expiracion": "fecha_expiracion",
+            "cantidad_inicial": "cantidad_inicial",
+            "cantidad_actual": "cantidad_actual",
+            "is_active": "is_active",
+            "updated_at": "updated_at",
+        },
+        "versiones": (InsumoLote, Insumo, Bodega),
+    },
+    "movimientos": {
+        "modelo": MovimientoLedger,
+        "campos": {
+            "id": "id",
+            "tipo": "tipo",
+            "origen_id": "origen_id",
+            "subtipo": "subtipo",
+            "fecha": "fecha",
+            "insumo_id": "insumo_id",
+            "insumo": "insumo__nombre",
+            "lote_id": "insumo_lote_id",
+            "ubicacion_id": "ubicacion_id",
+            "bodega_id": "bodega_id",
+            "cantidad": "cantidad",
+            "orden_id": "orden_id",
+            "observaciones": "observaciones",
+            "is_active": "is_active",
+        },
+        "versiones": (Entrada, Salida, MovimientoLedger),
+    },
+}
+
+
+def _error(mensaje, status=400):
+    return JsonResponse({"error": mensaje}, status=status)
+
+
+def api_auth(view):
+    """Sesión autenticada con rol de lectura; responde JSON 401/403 en vez de redirigir al login."""
+    @wraps(view)
+    def _inner(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return _error("Autenticación requerida.", status=401)
+        if not user_has_role(request.user, "Administrador", "Encargado", "Bodeguero"):
+            return _error("No tienes permisos para esta API.", status=403)
+        return view(request, *args, **kwargs)
+    return _inner
+
+
+def _lista_ids(valor, maximo=None):
+    try:
+        ids = [int(x) for x in valor.split(",") if x.strip()]
+    except ValueError:
+        raise ValueError("Los ids deben ser enteros separados por coma.")
+    if maximo and len(ids) > maximo:
+        raise ValueError(f"Máximo {maximo} ids por consulta.")
+    return ids
+
+
+def _columnas(recurso, request):
+    """Columnas pedidas en `fields` (en el orden pedido); todas si no se indica."""
+    disponibles = RECURSOS[recurso]["campos"]
+    pedidas = [c.strip() for c in (request.GET.get("fields") or "").split(",") if c.strip()]
+    if not pedidas:
+        return list(disponibles)
+    invalidas = [c for c in pedidas if c not in disponibles]
+    if invalidas:
+        raise ValueError(f"Campos no disponibles: {', '.join(invalidas)}. Opciones: {', '.join(disponibles)}.")
+    return pedidas
+
+
+def _queryset(recurso, request, columnas):
+    config = RECURSOS[recurso]
+    qs = config["modelo"].objects.order_by("id")
+    if request.GET.get("inactivos") != "1":
+        qs = qs.filter(is_active=True)
+    if request.GET.get("ids"):
+        qs = qs.filter(id__in=_lista_ids(request.GET["ids"], MAX_IDS))
+    if request.GET.get("after"):
+        qs = qs.filter(id__gt=int(request.GET["after"]))
+    return qs.values_list(*(config["campos"][c] for c in columnas))
+
+
+def _ndjson(filas, columnas):
+    encoder = DjangoJSONEncoder()
+    for fila in filas:
+        yield encoder.encode(dict(zip(columnas, fila))) + "\n"
+
+
+def _url_siguiente(request, ultimo_id):
+    params = request.GET.copy()
+    params["after"] = ultimo_id
+    return request.build_absolute_uri(f"{request.path}?{params.urlencode()}")
+
+
+@require_GET
+def health(request):
+    """Estado del servicio y de la conexión a la base de datos (sin autenticación)."""
+    try:
+        connection.ensure_connection()
+        db_ok = True
+    except Exception:
+        db_ok = False
+    return JsonResponse({"status": "ok" if db_ok else "error", "database": db_ok}, status=200 if db_ok else 503)
+
+
+@require_GET
+def metrics(request):
+    """
+    Métricas en formato de texto de Prometheus (ver inventario/metricas.py).
+    Con METRICAS_TOKEN exige "Authorization: Bearer <token>". Sin token solo responde
+    con DEBUG activo: detrás de un proxy local todas las peticiones llegan desde
+    127.0.0.1, así que la dirección de origen no sirve para restringir el acceso.
+    """
+    if settings.METRICAS_TOKEN:
+        autorizado = hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {settings.METRICAS_TOKEN}"
+        )
+    else:
+        autorizado = settings.DEBUG
+    if not autorizado:
+        return HttpResponse("No autorizado\n", status=403, content_type="text/plain; charset=utf-8")
+    respuesta = HttpResponse(metricas.exportar_texto(), content_type="text/plain; version=0.0.4; charset=utf-8")
+    respuesta["Cache-Control"] = "no-store"
+    return respuesta
+
+
+@require_GET
+def info(request):
+    """Versión de la API, recursos y parámetros disponibles."""
+    return JsonResponse({
+        "version": API_VERSION,
+        "recursos": {nombre: list(config["campos"]) for nombre, config in RECURSOS.items()},
+        "parametros": ["fields", "ids", "after", "limit", "inactivos", "format"],
+        "limit_max": LIMIT_MAX,
+        "max_ids": MAX_IDS,
+    })
+
+
+@require_GET
+@api_auth
+def listar_recurso(request, recurso):
+    try:
+        columnas = _columnas(recurso, request)
+        qs = _queryset(recurso, request, columnas)
+        limit = max(1, min(int(request.GET.get("limit") or LIMIT_DEFAULT), LIMIT_MAX))
+    except ValueError as exc:
+        return _error(str(exc))
+
+    if request.GET.get("format") == "ndjson":
+        respuesta = StreamingHttpResponse(
+            _ndjson(qs.iterator(chunk_size=CHUNK_STREAMING), columnas),
+            content_type="application/x-ndjson",
+        )
+        respuesta["Cache-Control"] = "no-store"
+        return respuesta
+
+    etag = calcular_etag(request, RECURSOS[recurso]["versiones"])
+    no_modificada = respuesta_no_modificada(request, etag)
+    if no_modificada is not None:
+        return no_modificada
+
+    # El id de la última fila se necesita para el cursor aunque no se haya pedido
+    if "id" not in columnas:
+        qs = qs.values_list("id", *(RECURSOS[recurso]["campos"][c] for c in columnas))
+        filas = [(fila[0], fila[1:]) for fila in qs[:limit + 1]]
+    else:
+        indice_id = columnas.index("id")
+        filas = [(fila[indice_id], fila) for fila in qs[:limit + 1]]
+
+    hay_mas = len(filas) > limit
+    filas = filas[:limit]
+    return marcar_respuesta(JsonResponse({
+        "results": [dict(zip(columnas, fila)) for _, fila in filas],
+        "next": _url_siguiente(request, filas[-1][0]) if hay_mas else None,
+    }), etag)
+
+
+@require_GET
+@api_auth
+def detalle_recurso(request, recurso, pk):
+    try:
+        columnas = _columnas(recurso, request)
+    except ValueError as exc:
+        return _error(str(exc))
+    config = RECURSOS[recurso]
+    qs = config["modelo"].objects.filter(pk=pk)
+    if request.GET.get("inactivos") != "1":
+        qs = qs.filter(is_active=True)
+    fila = qs.values_list(*(config["campos"][c] for c in columnas)).first()
+    if fila is None:
+        return _error("No encontrado.", status=404)
+    return JsonResponse(dict(zip(columnas, fila)))
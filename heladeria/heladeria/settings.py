@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'inventario.middleware.MetricasMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,6 +54,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'inventario.middleware.VersionesPorPeticionMiddleware',
+    'inventario.middleware.LecturaReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'heladeria.urls'
@@ -110,6 +114,64 @@ elif "mysql" in DB_ENGINE:
         }
     }
 
+# --- Cache compartido entre procesos ---
+# Las versiones de datos (inventario/versiones.py) viven en el cache: los workers y los
+# comandos de manage.py (importar_catalogo, check_sobrestock --fix, etc.) deben ver el
+# mismo contador, si no los ETag, fragmentos y catálogos de referencia quedan obsoletos.
+# El cache de memoria por defecto es por proceso, así que nunca se usa. CACHE_URL apunta a
+# Redis (recomendado con varios servidores); sin él, archivos en CACHE_DIR (una sola máquina).
+if os.environ.get("CACHE_URL"):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ["CACHE_URL"],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_DIR', os.path.join(tempfile.gettempdir(), 'heladeria_cache')),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
+    }
+
+# --- Réplica de lectura (opcional, ver inventario/replica.py) ---
+# SQLite: DB_REPLICA_NAME es un segundo archivo que `manage.py sincronizar_replica --cada N`
+# mantiene copiado desde la primaria. MySQL: DB_REPLICA_HOST (y opcionalmente
+# DB_REPLICA_PORT/USER/PASSWORD) apunta a una réplica real; el comando solo escribe el latido
+# (la réplica solo se usa si sus versiones de datos coinciden con las del cache compartido).
+if "sqlite" in DB_ENGINE and os.environ.get("DB_REPLICA_NAME"):
+    DATABASES["replica"] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / os.environ["DB_REPLICA_NAME"],
+        'TEST': {'MIRROR': 'default'},
+    }
+elif "mysql" in DB_ENGINE and os.environ.get("DB_REPLICA_HOST"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        'USER': os.environ.get('DB_REPLICA_USER', DATABASES["default"]["USER"]),
+        'PASSWORD': os.environ.get('DB_REPLICA_PASSWORD', DATABASES["default"]["PASSWORD"]),
+        'HOST': os.environ["DB_REPLICA_HOST"],
+        'PORT': os.environ.get('DB_REPLICA_PORT', DATABASES["default"]["PORT"]),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# MySQL no tiene índices parciales: los de Meta.indexes con condition se crean completos y siguen sirviendo
+SILENCED_SYSTEM_CHECKS = ["models.W037"]
+
+DATABASE_ROUTERS = ["inventario.replica.ReplicaRouter"]
+REPLICA_LAG_MAXIMO = int(os.environ.get("REPLICA_LAG_MAXIMO", 30))  # segundos; más atrasada se usa la primaria
+REPLICA_CHEQUEO_SEGUNDOS = 5  # cada cuánto cada proceso vuelve a leer el latido
+REPLICA_PEGADO_SEGUNDOS = 10  # lecturas en la primaria después de una escritura
+
+# Métricas Prometheus en /metrics (ver inventario/metricas.py). Con varios procesos,
+# METRICAS_DIR es un directorio compartido donde cada uno vuelca su registro.
+# Con METRICAS_TOKEN se exige "Authorization: Bearer <token>"; sin él, /metrics solo responde con DEBUG.
+METRICAS_DIR = os.environ.get("METRICAS_DIR", "")
+METRICAS_ESCRITURA_SEGUNDOS = 5
+METRICAS_TOKEN = os.environ.get("METRICAS_TOKEN", "")
+
 AUTH_USER_MODEL = "accounts.UsuarioApp" 
 
 # Redirige a la URL con nombre 'dashboard' después de un login exitoso
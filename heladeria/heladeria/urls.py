@@ -18,6 +18,7 @@ from django.contrib import admin
 from django.urls import path, include
 # Importa la vista principal (asumida en inventario/views.py)
 from inventario.views import dashboard_view 
+from api.views import metrics
 from django.conf.urls.static import static
 from django.conf import settings # 🔑 Necesario para acceder a DEBUG, MEDIA_URL, etc.
 
@@ -35,6 +36,12 @@ urlpatterns = [
 
     # 3. Rutas de Autenticación (Login, Logout, Password Change, etc.)
     path('accounts/', include('accounts.urls', namespace='accounts')), 
+
+    # 4. API de lectura para integraciones (JSON / NDJSON)
+    path('api/', include('api.urls')),
+
+    # 5. Métricas para Prometheus (texto plano, sin sesión)
+    path('metrics', metrics, name='metrics'),
     
     
 ]
@@ -4,10 +4,11 @@ from django import forms
 from datetime import date
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
+from .versiones import incrementar_version_al_confirmar
 from .models import (
     Categoria, Insumo, Ubicacion, Bodega,
     InsumoLote, Entrada, Salida, AlertaInsumo,
-    OrdenInsumo, OrdenInsumoDetalle
+    OrdenInsumo, OrdenInsumoDetalle, normalizar_nombre
 )
 
 # 👇 --- IMPORTACIONES ADICIONALES PARA VALIDACIONES ---
@@ -70,6 +71,36 @@ class SalidaAdminForm(forms.ModelForm):
         return cleaned_data
 
 
+class NombreUnicoAdminForm(forms.ModelForm):
+    """
+    Categoría e Insumo: el nombre normalizado (clave) es único. Sin esta validación
+    un nombre repetido llegaba a save() y fallaba con IntegrityError.
+    """
+    class Meta:
+        fields = '__all__'
+
+    def clean_nombre(self):
+        nombre = self.cleaned_data["nombre"].strip()
+        qs = self._meta.model.objects.filter(clave=normalizar_nombre(nombre))
+        if self.instance.pk:
+            qs = qs.exclude(pk=self.instance.pk)
+        if qs.exists():
+            raise forms.ValidationError(
+                f"Ya existe otro registro de {self._meta.model._meta.verbose_name} con este nombre."
+            )
+        return nombre
+
+
+class CategoriaAdminForm(NombreUnicoAdminForm):
+    class Meta(NombreUnicoAdminForm.Meta):
+        model = Categoria
+
+
+class InsumoAdminForm(NombreUnicoAdminForm):
+    class Meta(NombreUnicoAdminForm.Meta):
+        model = Insumo
+
+
 # =====================================================
 # MIXIN DE PERMISOS POR ROL (Sin cambios)
 # =====================================================
@@ -133,6 +164,7 @@ class RoleScopedInventarioAdminMixin:
 @admin.action(description="Marcar órdenes de insumo como CERRADAS")
 def marcar_cerrada(modeladmin, request, queryset):
     updated = queryset.update(estado="CERRADA")
+    incrementar_version_al_confirmar(OrdenInsumo)
     modeladmin.message_user(
         request, f"{updated} órdenes marcadas como cerradas.", messages.SUCCESS
     )
@@ -144,6 +176,7 @@ def marcar_cerrada(modeladmin, request, queryset):
 
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
+    form = CategoriaAdminForm
     list_display = ("id", "nombre", "is_active", "created_at")
     search_fields = ("nombre",)
     list_filter = ("is_active",)
@@ -175,6 +208,7 @@ class OrdenInsumoAdmin(admin.ModelAdmin):
 
 @admin.register(Insumo)
 class InsumoAdmin(admin.ModelAdmin):
+    form = InsumoAdminForm
     list_display = ("id", "nombre", "categoria", "unidad_medida", "precio_unitario", "is_active")
     search_fields = ("nombre",)
     list_filter = ("categoria", "is_active")
@@ -5,6 +5,8 @@ NO requiere modificar models.py ni migraciones
 from django.core.cache import cache
 from django.conf import settings
 
+from .metricas import contar_cache
+
 # Clave para el cache
 ALERTAS_CONFIG_KEY = 'sistema_alertas_activas'
 ALERTAS_DEFAULT = True  # Por defecto las alertas están activas
@@ -15,6 +17,7 @@ def alertas_activadas():
     Usa Django cache para persistir la configuración
     """
     estado = cache.get(ALERTAS_CONFIG_KEY)
+    contar_cache("alertas_config", estado is not None)
     if estado is None:
         # Primera vez, usar valor por defecto
         cache.set(ALERTAS_CONFIG_KEY, ALERTAS_DEFAULT, timeout=None)
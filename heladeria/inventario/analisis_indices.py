@@ -0,0 +1,303 @@
+"""
+Planes de ejecución de las consultas de las vistas más usadas.
+
+Cada entrada de CONSULTAS arma el mismo queryset que su vista (filtros, orden
+con su desempate y el LIMIT de la primera página) y lo pasa por EXPLAIN QUERY
+PLAN (SQLite) o EXPLAIN (MySQL). Del plan se marcan:
+- recorrido completo de una tabla (SCAN sin índice / type=ALL),
+- orden sin índice (USE TEMP B-TREE FOR ORDER BY / Using filesort),
+- tabla temporal (USE TEMP B-TREE FOR GROUP BY o DISTINCT / Using temporary),
+- ORDER BY heredado de Meta.ordering en consultas que no piden orden.
+
+Cada consulta trae el índice que cubre su filtro y su orden. Si el plan tiene
+hallazgos y el modelo aún no lo declara, el comando `analizar_indices` lo
+propone como línea de Meta.indexes; la migración sale de makemigrations.
+
+CONSULTAS es una copia de lo que arma cada vista y puede quedar desfasada: los
+tests (PlanesDeConsultaTests) pasan por explicar_sql el SQL que las vistas
+ejecutan de verdad, capturado con CaptureQueriesContext.
+
+En SQLite `filter(is_active=True)` se compila como `WHERE "is_active"`, que no
+usa los índices compuestos que empiezan por is_active: para los listados de
+activos sirven índices parciales (condition=Q(is_active=True)).
+"""
+import re
+from collections import namedtuple
+from datetime import date, timedelta
+
+from django.db import connections, models
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from .kardex import _movimientos as movimientos_kardex
+from .models import (
+    AlertaInsumo, Insumo, InsumoLote, MovimientoLedger, OrdenInsumo,
+    ReporteDisponibilidadSnapshot, StockDiario,
+)
+
+# indice: el que debería resolver la consulta (None si ninguno sirve); nota: contexto para el informe
+Consulta = namedtuple("Consulta", "nombre vista armar indice nota", defaults=(None, ""))
+Hallazgo = namedtuple("Hallazgo", "tipo detalle")
+Resultado = namedtuple("Resultado", "consulta modelo sql plan hallazgos")
+
+RECORRIDO_COMPLETO = "recorrido completo"
+ORDEN_SIN_INDICE = "orden sin índice"
+TABLA_TEMPORAL = "tabla temporal"
+ORDEN_POR_DEFECTO = "orden de Meta.ordering"
+
+_SCAN_SQLITE = re.compile(r"^SCAN (?:TABLE )?(?P<tabla>[^\s(]\S*)(?: AS \S+)?$")
+_SUBCONSULTA_SQLITE = re.compile(r"^(?:CO-ROUTINE|MATERIALIZE) (?P<nombre>\S+)")
+_TEMP_SQLITE = re.compile(r"USE TEMP B-TREE FOR (?P<para>.+)$")
+
+
+# --- Consultas de las vistas ---
+
+def _listar_insumos(m):
+    stock = (
+        InsumoLote.objects.filter(insumo=OuterRef("pk")).order_by()
+        .values("insumo").annotate(total=Sum("cantidad_actual")).values("total")
+    )
+    return (
+        Insumo.objects.filter(is_active=True)
+        .annotate(stock_actual=Coalesce(Subquery(stock), 0, output_field=DecimalField()))
+        .select_related("categoria", "unidad_medida", "sugerencia_stock")
+        .order_by("nombre", "id")[:10]
+    )
+
+
+def _listar_lotes(m):
+    return (
+        InsumoLote.objects.filter(is_active=True)
+        .select_related("insumo", "bodega", "proveedor")
+        .annotate(cant_act=Coalesce(F("cantidad_actual"), 0, output_field=DecimalField()))
+        .order_by("insumo__nombre", "id")[:10]
+    )
+
+
+def _lotes_por_vencer(m):
+    return (
+        InsumoLote.objects.filter(
+            is_active=True, fecha_expiracion__gte=m["hoy"], fecha_expiracion__lte=m["hoy"] + timedelta(days=30),
+        )
+        .select_related("insumo", "bodega", "proveedor")
+        .order_by("fecha_expiracion", "id")[:10]
+    )
+
+
+def _lotes_fefo(m):
+    return (
+        InsumoLote.objects.filter(insumo_id=m["insumo_id"], cantidad_actual__gt=0, is_active=True)
+        .select_related("bodega", "proveedor")
+        .order_by("fecha_expiracion")
+    )
+
+
+def _evaluar_vencimientos(m):
+    return InsumoLote.objects.filter(is_active=True, cantidad_actual__gt=0).select_related("insumo").order_by()
+
+
+def _movimientos_recientes(m):
+    return (
+        MovimientoLedger.objects.select_related("insumo", "insumo_lote", "usuario")
+        .order_by("-fecha", "-id")[:20]
+    )
+
+
+def _movimientos_por_fecha(m):
+    return (
+        MovimientoLedger.objects.filter(is_active=True, fecha__gte=m["hoy"].replace(day=1), fecha__lte=m["hoy"])
+        .order_by("fecha", "id")
+        .values_list("fecha", "tipo", "insumo_id", "cantidad")
+    )
+
+
+def _kardex(m):
+    return movimientos_kardex(insumo_id=m["insumo_id"])[:50]
+
+
+def _alertas_activas(m):
+    return AlertaInsumo.objects.filter(is_active=True).select_related("insumo").order_by("-fecha", "-id")[:20]
+
+
+def _ordenes_activas(m):
+    return (
+        OrdenInsumo.objects.filter(is_active=True)
+        .select_related("usuario", "proveedor")
+        .order_by("-fecha", "-id")[:20]
+    )
+
+
+def _ordenes_pendientes(m):
+    return (
+        OrdenInsumo.objects.filter(is_active=True, estado="PENDIENTE")
+        .select_related("usuario", "proveedor")
+        .order_by("-fecha", "-id")[:20]
+    )
+
+
+def _insumos_recientes(m):
+    return (
+        Insumo.objects.filter(is_active=True)
+        .select_related("categoria", "unidad_medida")
+        .order_by("-created_at")[:5]
+    )
+
+
+def _reporte_nombres(m):
+    return ReporteDisponibilidadSnapshot.objects.filter(visible=True).order_by("nombre").values_list("nombre", flat=True)
+
+
+def _tendencia_stock(m):
+    return (
+        StockDiario.objects.filter(insumo_id=m["insumo_id"], fecha__gte=m["hoy"] - timedelta(days=90), fecha__lte=m["hoy"])
+        .order_by("fecha")
+        .values_list("fecha", "bodega_id", "cantidad", "valor")
+    )
+
+
+def _activo(nombre, *campos):
+    return models.Index(fields=list(campos), condition=Q(is_active=True), name=nombre)
+
+
+CONSULTAS = [
+    Consulta("listar_insumos", "listar_insumos", _listar_insumos, models.Index(fields=["nombre"])),
+    Consulta("listar_lotes", "listar_insumos_lote", _listar_lotes,
+             nota="Ordena por una columna de otra tabla (insumo__nombre): ningún índice de lotes evita el orden."),
+    Consulta("lotes_por_vencer", "listar_insumos_lote?vencimiento=proximos&sort=fexpira", _lotes_por_vencer,
+             models.Index(fields=["fecha_expiracion"])),
+    Consulta("lotes_fefo", "api_obtener_lotes_por_insumo", _lotes_fefo,
+             _activo("lote_activo_fefo_idx", "insumo", "fecha_expiracion")),
+    Consulta("evaluar_vencimientos", "check_lote_vencimiento", _evaluar_vencimientos,
+             nota="Lee todos los lotes activos con stock; sin ORDER BY para no recorrer el índice de fecha_ingreso."),
+    Consulta("movimientos_recientes", "listar_movimientos", _movimientos_recientes,
+             models.Index(fields=["fecha", "id"])),
+    Consulta("movimientos_por_fecha", "exportar_movimientos", _movimientos_por_fecha,
+             models.Index(fields=["fecha", "id"])),
+    Consulta("kardex", "api_kardex", _kardex, models.Index(fields=["insumo", "fecha", "id"])),
+    Consulta("alertas_activas", "listar_alertas", _alertas_activas, _activo("alerta_activa_fecha_idx", "fecha")),
+    Consulta("ordenes_activas", "listar_ordenes", _ordenes_activas, _activo("orden_activa_fecha_idx", "fecha")),
+    Consulta("ordenes_pendientes", "listar_ordenes?estado=PENDIENTE", _ordenes_pendientes,
+             _activo("orden_activa_estado_idx", "estado", "fecha")),
+    Consulta("insumos_recientes", "dashboard", _insumos_recientes, _activo("insumo_activo_creado_idx", "created_at")),
+    Consulta("reporte_nombres", "reporte_disponibilidad", _reporte_nombres,
+             models.Index(fields=["nombre"], condition=Q(visible=True), name="reporte_visible_nombre_idx")),
+    Consulta("tendencia_stock", "api_stock_tendencia", _tendencia_stock, models.Index(fields=["insumo", "fecha"])),
+]
+
+
+def datos_muestra():
+    """Valores reales para los filtros: el insumo con más movimientos y la fecha de hoy."""
+    insumo_id = (
+        MovimientoLedger.objects.values("insumo_id").annotate(n=Count("id"))
+        .order_by("-n").values_list("insumo_id", flat=True).first()
+    )
+    return {"insumo_id": insumo_id or 0, "hoy": date.today()}
+
+
+# --- Planes ---
+
+def _plan_sqlite(cursor, sql, params):
+    # Leer una subconsulta (CO-ROUTINE / MATERIALIZE, ej. el SUM() OVER del kárdex sobre
+    # la página ya recortada) no es recorrer una tabla, y ordenar su resultado no se
+    # arregla con un índice: el acceso a la tabla se revisa en las líneas de la subconsulta.
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+    plan, hallazgos, subconsultas, sobre_subconsulta = [], [], set(), set()
+    for _, padre, _, detalle in cursor.fetchall():
+        plan.append(detalle)
+        subconsulta = _SUBCONSULTA_SQLITE.match(detalle)
+        if subconsulta:
+            subconsultas.add(subconsulta["nombre"])
+            continue
+        scan = _SCAN_SQLITE.match(detalle)
+        temp = _TEMP_SQLITE.search(detalle)
+        if scan and scan["tabla"] in subconsultas:
+            sobre_subconsulta.add(padre)
+        elif scan and scan["tabla"] != "CONSTANT":
+            hallazgos.append(Hallazgo(RECORRIDO_COMPLETO, detalle))
+        elif temp and padre in sobre_subconsulta:
+            continue
+        elif temp and "ORDER BY" in temp["para"]:
+            hallazgos.append(Hallazgo(ORDEN_SIN_INDICE, detalle))
+        elif temp:
+            hallazgos.append(Hallazgo(TABLA_TEMPORAL, detalle))
+    return plan, hallazgos
+
+
+def _plan_mysql(cursor, sql, params):
+    cursor.execute(f"EXPLAIN {sql}", params)
+    columnas = [c[0].lower() for c in cursor.description]
+    plan, hallazgos = [], []
+    for fila in cursor.fetchall():
+        fila = dict(zip(columnas, fila))
+        extra = fila.get("extra") or ""
+        linea = f"{fila.get('table')}: type={fila.get('type')} key={fila.get('key')} rows={fila.get('rows')} {extra}".strip()
+        plan.append(linea)
+        if fila.get("type") == "ALL":
+            hallazgos.append(Hallazgo(RECORRIDO_COMPLETO, linea))
+        if "Using filesort" in extra:
+            hallazgos.append(Hallazgo(ORDEN_SIN_INDICE, linea))
+        if "Using temporary" in extra:
+            hallazgos.append(Hallazgo(TABLA_TEMPORAL, linea))
+    return plan, hallazgos
+
+
+def explicar_sql(sql, params=None, using="default"):
+    """
+    (líneas del plan, hallazgos) de una sentencia SQL en la base `using`; sirve
+    también para SQL capturado de una vista (CaptureQueriesContext, sin parámetros).
+    """
+    connection = connections[using]
+    with connection.cursor() as cursor:
+        if connection.vendor == "sqlite":
+            return _plan_sqlite(cursor, sql, params)
+        if connection.vendor == "mysql":
+            return _plan_mysql(cursor, sql, params)
+    raise NotImplementedError(f"Sin análisis de planes para {connection.vendor}")
+
+
+def explicar(qs, using="default"):
+    """(líneas del plan, hallazgos) de un queryset en la base `using`."""
+    sql, params = qs.query.sql_with_params()
+    plan, hallazgos = explicar_sql(sql, params, using)
+    if not qs.query.order_by and qs.query.default_ordering and qs.model._meta.ordering:
+        hallazgos.append(Hallazgo(ORDEN_POR_DEFECTO, f"ORDER BY {', '.join(qs.model._meta.ordering)}"))
+    return plan, hallazgos
+
+
+def analizar(nombres=None, using="default"):
+    """Resultado de cada consulta de CONSULTAS (o solo de las nombradas en `nombres`)."""
+    muestra = datos_muestra()
+    resultados = []
+    for consulta in CONSULTAS:
+        if nombres and consulta.nombre not in nombres:
+            continue
+        qs = consulta.armar(muestra).using(using)
+        plan, hallazgos = explicar(qs, using)
+        resultados.append(Resultado(consulta, qs.model, str(qs.query), plan, hallazgos))
+    return resultados
+
+
+def indice_declarado(modelo, indice):
+    """True si el modelo ya tiene un índice con esos campos y condición (Meta.indexes o db_index)."""
+    campos = list(indice.fields)
+    if indice.condition is None and len(campos) == 1 and modelo._meta.get_field(campos[0]).db_index:
+        return True
+    return any(list(i.fields) == campos and i.condition == indice.condition for i in modelo._meta.indexes)
+
+
+def indice_sugerido(resultado):
+    """Índice a proponer: el de la consulta si el plan tiene hallazgos y el modelo no lo declara."""
+    indice = resultado.consulta.indice
+    if not resultado.hallazgos or indice is None or indice_declarado(resultado.modelo, indice):
+        return None
+    return indice
+
+
+def como_codigo(indice):
+    """Línea para pegar en Meta.indexes."""
+    partes = [f"fields={list(indice.fields)!r}"]
+    if indice.condition is not None:
+        partes.append("condition=Q({})".format(", ".join(f"{k}={v!r}" for k, v in indice.condition.children)))
+    if indice.name:
+        partes.append(f"name={indice.name!r}")
+    return f"models.Index({', '.join(partes)})"
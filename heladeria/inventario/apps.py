@@ -8,3 +8,5 @@ class InventarioConfig(AppConfig):
     def ready(self): 
         # Importa el módulo de señales para que se conecten los listeners.
         import inventario.signals
+        # Conecta el envoltorio que cuenta consultas SQL en cada conexión nueva
+        import inventario.metricas
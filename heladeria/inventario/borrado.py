@@ -0,0 +1,46 @@
+"""
+Borrado y recorrido de tablas grandes por rangos de PK.
+
+`queryset.delete()` carga los objetos en el Collector de Django (y dispara una
+señal por fila) antes de borrar; en tablas con cientos de miles de filas eso
+significa mucha memoria y una sola transacción enorme. Aquí la tabla se recorre
+en rangos fijos [inicio, fin) de la clave primaria y cada rango se borra con un
+DELETE directo en su propia transacción corta.
+
+Como no pasan por el Collector ni por las señales, quien llame a estas
+funciones es responsable de los efectos derivados (versiones, ledger,
+proyecciones) y de que ninguna FK con CASCADE apunte a las filas borradas.
+"""
+from django.db import transaction
+from django.db.models import Max, Min
+
+
+def rangos_pk(queryset, chunk_size, desde=None):
+    """
+    Genera tuplas (inicio, fin) que cubren los PK de `queryset` en rangos de
+    `chunk_size` (fin excluido). `desde` permite retomar desde un PK dado.
+    """
+    limites = queryset.order_by().aggregate(minimo=Min("pk"), maximo=Max("pk"))
+    if limites["minimo"] is None:
+        return
+    inicio = max(limites["minimo"], desde or limites["minimo"])
+    while inicio <= limites["maximo"]:
+        yield inicio, inicio + chunk_size
+        inicio += chunk_size
+
+
+def borrar_por_rangos(queryset, chunk_size=5000, progreso=None):
+    """
+    Borra las filas de `queryset` rango por rango sin pasar por el Collector.
+    `progreso(borradas, hasta_pk)` se llama después de cada rango.
+    Retorna la cantidad de filas borradas.
+    """
+    queryset = queryset.order_by()
+    borradas = 0
+    for inicio, fin in rangos_pk(queryset, chunk_size):
+        with transaction.atomic(using=queryset.db):
+            rango = queryset.filter(pk__gte=inicio, pk__lt=fin)
+            borradas += rango._raw_delete(rango.db)
+        if progreso:
+            progreso(borradas, fin)
+    return borradas
@@ -0,0 +1,94 @@
+"""
+Cache de fragmentos HTML para los parciales de listados (respuestas AJAX).
+
+La clave combina template, ruta, GET normalizado, estado resuelto de la lista
+(per_page, order, flags como read_only) y las versiones de datos de los
+modelos involucrados (ver versiones.py). Como cualquier escritura cambia la
+versión, un fragmento guardado nunca queda desactualizado: solo deja de usarse.
+
+El fragmento se guarda sin el token CSRF del usuario: se renderiza con un
+marcador que se reemplaza por el token de cada petición al servirlo.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+
+from .metricas import contar_cache
+from .versiones import query_normalizada
+
+FRAGMENTO_KEY_PREFIX = "fragmento:"
+STATS_KEY_PREFIX = "fragmento_stats:"
+STATS_TEMPLATES_KEY = "fragmento_stats_templates"
+FRAGMENTO_TIMEOUT = 60 * 10  # 10 minutos; acota memoria, no frescura
+
+CSRF_MARCADOR = "__csrf_token_fragmento__"
+
+
+def clave_fragmento(request, template, estado, versiones):
+    partes = [
+        template,
+        request.path,
+        query_normalizada(request.GET),
+        *(str(e) for e in estado),
+        *(str(v) for v in versiones),
+    ]
+    return FRAGMENTO_KEY_PREFIX + hashlib.sha1("|".join(partes).encode("utf-8")).hexdigest()
+
+
+def _contar(template, resultado):
+    clave = f"{STATS_KEY_PREFIX}{template}:{resultado}"
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.set(clave, 1, timeout=None)
+        templates = cache.get(STATS_TEMPLATES_KEY) or set()
+        if template not in templates:
+            cache.set(STATS_TEMPLATES_KEY, templates | {template}, timeout=None)
+
+
+def obtener_fragmento(request, template, clave):
+    """Devuelve el HTML cacheado (con el token CSRF de esta petición) o None."""
+    html = cache.get(clave)
+    contar_cache("fragmento", html is not None)
+    if html is None:
+        _contar(template, "misses")
+        return None
+    _contar(template, "hits")
+    return html.replace(CSRF_MARCADOR, get_token(request))
+
+
+def renderizar_fragmento(request, template, context, clave):
+    """Renderiza el parcial, lo guarda en cache y lo devuelve listo para la petición."""
+    html = render_to_string(template, {**context, "csrf_token": CSRF_MARCADOR}, request=request)
+    cache.set(clave, html, FRAGMENTO_TIMEOUT)
+    return html.replace(CSRF_MARCADOR, get_token(request))
+
+
+def estadisticas_fragmentos():
+    """
+    Aciertos/fallos por template desde que se inició el cache.
+    Retorna lista de dicts: template, hits, misses, hit_rate (0-100).
+    """
+    templates = sorted(cache.get(STATS_TEMPLATES_KEY) or ())
+    claves = [f"{STATS_KEY_PREFIX}{t}:{r}" for t in templates for r in ("hits", "misses")]
+    valores = cache.get_many(claves)
+    resultado = []
+    for t in templates:
+        hits = valores.get(f"{STATS_KEY_PREFIX}{t}:hits", 0)
+        misses = valores.get(f"{STATS_KEY_PREFIX}{t}:misses", 0)
+        total = hits + misses
+        resultado.append({
+            "template": t,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits * 100 / total, 1) if total else 0.0,
+        })
+    return resultado
+
+
+def reiniciar_estadisticas():
+    templates = cache.get(STATS_TEMPLATES_KEY) or ()
+    cache.delete_many([f"{STATS_KEY_PREFIX}{t}:{r}" for t in templates for r in ("hits", "misses")])
+    cache.delete(STATS_TEMPLATES_KEY)
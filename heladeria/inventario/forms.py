@@ -4,8 +4,13 @@ from django.db.models import Sum, Q, DecimalField
 from decimal import Decimal
 from django.db.models.functions import Coalesce
 from django import forms
+from django.core.exceptions import ValidationError
+from django.utils.functional import cached_property
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.forms import inlineformset_factory, BaseInlineFormSet, formset_factory
+from django.forms.models import ModelChoiceIterator, ModelChoiceIteratorValue
+from . import referencias
+from .rut import RutInvalido, separar_rut, validar_rut, variantes_rut
 from .models import (
     Bodega,
     Categoria,
@@ -20,6 +25,7 @@ from .models import (
     UnidadMedida,
     AlertaInsumo,
     TIPO_ORDEN_CHOICES,
+    normalizar_nombre,
     TIPO_ALERTA_CHOICES,
 )
 
@@ -33,51 +39,206 @@ class UbicacionSelectWidget(forms.Select):
     
     def create_option(self, name, value, label, selected, index, subindex=None, attrs=None):
         option = super().create_option(name, value, label, selected, index, subindex, attrs)
-        
-        if value:
+        # La bodega sale del mapa en memoria (referencias.py): sin consulta por opción
+        ref = referencias.ubicacion(getattr(value, 'value', value)) if value else None
+        if ref is not None:
+            option['attrs']['data-bodega-id'] = str(ref.bodega_id)
+        return option
+
+
+class SeleccionAjaxWidget(forms.Select):
+    """
+    Select que solo renderiza la opción vacía y la(s) seleccionada(s); el resto de
+    las opciones las carga el navegador por AJAX (Select2 o fetch). Así cada línea
+    de un formset no trae el catálogo completo en el HTML.
+    """
+
+    def optgroups(self, name, value, attrs=None):
+        campo = self.choices.field
+        seleccion = {str(v) for v in value if v not in (None, "")}
+        resueltos = getattr(campo, "resueltos", None) or {}
+        objetos = [resueltos[v] for v in seleccion if v in resueltos]
+        faltantes = seleccion.difference(resueltos)
+        if faltantes:
+            key = campo.to_field_name or "pk"
             try:
-                # Extraer el valor real si es un ModelChoiceIteratorValue
-                if hasattr(value, 'value'):
-                    value = value.value
-                
-                ubicacion = Ubicacion.objects.select_related('bodega').get(pk=value)
-                option['attrs']['data-bodega-id'] = str(ubicacion.bodega.id)
-            except (Ubicacion.DoesNotExist, ValueError, TypeError):
+                objetos += list(campo.queryset.model._default_manager.filter(**{f"{key}__in": faltantes}))
+            except (ValueError, TypeError, ValidationError):
                 pass
-        
-        return option
 
+        opciones = []
+        if campo.empty_label is not None:
+            opciones.append(self.create_option(name, "", campo.empty_label, not objetos, 0))
+        for indice, obj in enumerate(objetos, start=len(opciones)):
+            opciones.append(
+                self.create_option(name, campo.prepare_value(obj), campo.label_from_instance(obj), True, indice)
+            )
+        return [(None, opciones, 0)]
 
-# Campo personalizado para usar con Select2 AJAX
-class AjaxModelChoiceField(forms.ModelChoiceField):
+
+# Campos cuyos valores resuelve el formset en lote (ver ResolucionEnLoteMixin)
+class ValorEnLoteMixin:
     """
-    ModelChoiceField personalizado que permite selecciones fuera del queryset inicial.
-    Útil cuando se usa con Select2 AJAX donde el queryset está vacío inicialmente.
+    Para ModelChoiceField cuyos valores puede resolver el formset en lote: dentro de un
+    formset con ResolucionEnLoteMixin los valores enviados ya vienen resueltos
+    (`resueltos`, {str(valor): objeto}) y no se consulta la base por línea: lo que no
+    está en el mapa es una opción inválida. Fuera de un formset se hace una sola
+    consulta por valor.
     """
-    def validate(self, value):
-        # Si el queryset está vacío (para AJAX), omitir la validación de pertenencia
-        if not self.queryset.exists() and value:
-            return
-        # De lo contrario, usar la validación normal
-        return super().validate(value)
-    
+    resueltos = None
+
+    def queryset_busqueda(self):
+        """Queryset donde se buscan los valores: con queryset vacío (AJAX), todo el modelo."""
+        if self.queryset.query.is_empty():
+            return self.queryset.model._default_manager.all()
+        return self.queryset
+
+    def campo_clave(self):
+        """Campo del modelo con que se identifican los valores enviados (pk o to_field_name)."""
+        opts = self.queryset.model._meta
+        return opts.get_field(self.to_field_name or opts.pk.name)
+
     def to_python(self, value):
         """Convierte el ID recibido en una instancia del modelo."""
         if value in self.empty_values:
             return None
-        try:
-            # Si el queryset está vacío, buscar directamente en el modelo
-            if not self.queryset.exists():
-                key = self.to_field_name or 'pk'
-                value = self.queryset.model.objects.get(**{key: value})
-            else:
-                value = super().to_python(value)
-        except (ValueError, TypeError, self.queryset.model.DoesNotExist):
+        if self.resueltos is not None:
+            try:
+                objeto = self.resueltos.get(str(self.campo_clave().to_python(value)))
+            except ValidationError:
+                objeto = None
+        else:
+            key = self.to_field_name or 'pk'
+            try:
+                objeto = self.queryset_busqueda().get(**{key: value})
+            except (ValueError, TypeError, ValidationError, self.queryset.model.DoesNotExist):
+                objeto = None
+        if objeto is None:
             raise forms.ValidationError(
                 self.error_messages['invalid_choice'],
                 code='invalid_choice',
             )
-        return value
+        return objeto
+
+
+# Campo personalizado para usar con Select2 AJAX
+class AjaxModelChoiceField(ValorEnLoteMixin, forms.ModelChoiceField):
+    """
+    ModelChoiceField personalizado que permite selecciones fuera del queryset inicial.
+    Útil cuando se usa con Select2 AJAX donde el queryset está vacío inicialmente.
+    Solo renderiza la opción seleccionada (ver SeleccionAjaxWidget).
+    """
+    widget = SeleccionAjaxWidget
+
+
+class ReferenciaChoiceIterator(ModelChoiceIterator):
+    """Opciones desde el catálogo en memoria del campo (referencias.py): sin consulta ni __str__ por línea."""
+
+    def refs(self):
+        catalogo = self.field.catalogo
+        return catalogo.activos() if self.field.solo_activos else list(catalogo().values())
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ("", self.field.empty_label)
+        for ref in self.refs():
+            yield (ModelChoiceIteratorValue(ref.id, None), ref.etiqueta)
+
+    def __len__(self):
+        return len(self.refs()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(self.refs())
+
+
+class ReferenciaChoiceField(ValorEnLoteMixin, forms.ModelChoiceField):
+    """
+    ModelChoiceField de un catálogo de referencia: las opciones salen de `catalogo`
+    (referencias.py) y el valor elegido se resuelve contra el queryset como siempre
+    (en lote dentro de un formset). Con `solo_activos` se omiten los inactivos.
+    """
+    iterator = ReferenciaChoiceIterator
+    catalogo = None
+    solo_activos = False
+
+    def __init__(self, **kwargs):
+        self.solo_activos = kwargs.pop("solo_activos", self.solo_activos)
+        kwargs.setdefault("queryset", self.catalogo.modelos[0]._default_manager.all())
+        super().__init__(**kwargs)
+
+
+class CategoriaChoiceField(ReferenciaChoiceField):
+    catalogo = referencias.categorias
+
+
+class UnidadMedidaChoiceField(ReferenciaChoiceField):
+    catalogo = referencias.unidades
+
+
+class ProveedorChoiceField(ReferenciaChoiceField):
+    catalogo = referencias.proveedores_activos
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("queryset", Proveedor.objects.filter(estado="ACTIVO"))
+        super().__init__(**kwargs)
+
+
+class UbicacionChoiceField(ReferenciaChoiceField):
+    """Select de ubicaciones con data-bodega-id por opción."""
+    catalogo = referencias.ubicaciones
+    widget = UbicacionSelectWidget
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("queryset", Ubicacion.objects.select_related("bodega"))
+        kwargs.setdefault("label", "Ubicación")
+        super().__init__(**kwargs)
+
+
+class ResolucionEnLoteMixin:
+    """
+    Para formsets con campos ValorEnLoteMixin (AjaxModelChoiceField, ReferenciaChoiceField):
+    antes de limpiar, junta los valores enviados de cada campo en todas las líneas y
+    los resuelve con un solo in_bulk por campo
+    (uno por modelo en la práctica). Cada línea lee del mapa compartido, así un formset
+    de 50 líneas cuesta lo mismo que uno de una para estos campos.
+    """
+
+    def _campos_en_lote(self):
+        return [
+            nombre for nombre, campo in self.form.base_fields.items()
+            if isinstance(campo, ValorEnLoteMixin)
+        ]
+
+    @cached_property
+    def objetos_resueltos(self):
+        """{nombre del campo: {str(valor): objeto}} con los valores enviados en todas las líneas."""
+        resueltos = {}
+        for nombre in self._campos_en_lote():
+            campo = self.form.base_fields[nombre]
+            clave = campo.campo_clave()
+            valores = set()
+            for i in range(self.total_form_count()):
+                valor = self.data.get(f"{self.add_prefix(i)}-{nombre}")
+                if valor in campo.empty_values:
+                    continue
+                try:
+                    valores.add(clave.to_python(valor))
+                except ValidationError:
+                    pass  # queda fuera del mapa: la línea lo reporta como opción inválida
+            objetos = campo.queryset_busqueda().in_bulk(valores, field_name=clave.name) if valores else {}
+            resueltos[nombre] = {str(valor): obj for valor, obj in objetos.items()}
+        return resueltos
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        if self.is_bound:
+            for nombre, mapa in self.objetos_resueltos.items():
+                form.fields[nombre].resueltos = mapa
+        return form
+
+
+class LineaMovimientoFormSet(ResolucionEnLoteMixin, forms.BaseFormSet):
+    """Formset base de las líneas de entrada/salida."""
 
 
 class OrdenInsumoForm(forms.ModelForm): 
@@ -101,12 +262,17 @@ class InsumoLoteMetadataForm(forms.ModelForm):
     Formulario diseñado para editar solo los metadatos de un lote existente.
     Excluye campos de stock inicial, actual e insumo.
     """
+    proveedor = ProveedorChoiceField(
+        required=False,
+        label="Proveedor",
+        widget=forms.Select(attrs={"class": "form-select"})
+    )
+
     class Meta:
         model = InsumoLote
         # Solo permite editar proveedor y fecha de expiración.
         fields = ("proveedor", "fecha_expiracion")
         widgets = {
-            "proveedor": forms.Select(attrs={"class": "form-select"}),
             "fecha_expiracion": forms.DateInput(attrs={"type": "date", "class": "form-control"}),
         }
 
@@ -133,7 +299,7 @@ class CategoriaForm(forms.ModelForm):
         if not re.match(r"^[A-Za-zÁÉÍÓÚñÑáéíóú\s]+$", nombre):
             raise forms.ValidationError("El nombre solo puede contener letras y espacios.")
 
-        qs = Categoria.objects.filter(nombre__iexact=nombre)
+        qs = Categoria.objects.filter(clave=normalizar_nombre(nombre))
         if self.instance.pk:
             qs = qs.exclude(pk=self.instance.pk)
 
@@ -157,6 +323,8 @@ class InsumoForm(forms.ModelForm):
             "unidad_medida",
             "precio_unitario",
         ]
+        # Opciones desde los catálogos en memoria (referencias.py)
+        field_classes = {"categoria": CategoriaChoiceField, "unidad_medida": UnidadMedidaChoiceField}
         widgets = {
             "nombre": forms.TextInput(attrs={"class": "form-control"}),
             "categoria": forms.Select(attrs={"class": "form-select"}),
@@ -171,9 +339,9 @@ class InsumoForm(forms.ModelForm):
         }
     
     def clean_nombre(self):
-        """Asegura que no existan insumos con el mismo nombre (case-insensitive)."""
+        """Asegura que no existan insumos con el mismo nombre (sin distinguir mayúsculas ni espacios extra)."""
         nombre = self.cleaned_data["nombre"].strip()
-        qs = Insumo.objects.filter(nombre__iexact=nombre)
+        qs = Insumo.objects.filter(clave=normalizar_nombre(nombre))
 
         if self.instance.pk:
             qs = qs.exclude(pk=self.instance.pk)
@@ -250,7 +418,7 @@ class OrdenInsumoDetalleForm(forms.ModelForm):
     insumo = AjaxModelChoiceField(
         queryset=Insumo.objects.none(),
         label="Insumo",
-        widget=forms.Select(attrs={"class": "form-select"})
+        widget=SeleccionAjaxWidget(attrs={"class": "form-select"})
     )
     
     class Meta:
@@ -262,15 +430,6 @@ class OrdenInsumoDetalleForm(forms.ModelForm):
             ),
         }
     
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        # Si ya hay un insumo seleccionado (edición), cargar ese
-        if self.instance and self.instance.pk and self.instance.insumo:
-            self.fields['insumo'].queryset = Insumo.objects.filter(
-                id=self.instance.insumo.id
-            )
-        # Para creación, el queryset vacío ya está definido en el campo
-
     def clean_insumo(self):
         """Validación adicional: verificar que el insumo esté activo"""
         insumo = self.cleaned_data.get('insumo')
@@ -284,7 +443,7 @@ class OrdenInsumoDetalleForm(forms.ModelForm):
             raise forms.ValidationError("La cantidad debe ser mayor a 0.")
         return v
 
-class BaseOrdenDetalleFormSet(BaseInlineFormSet):
+class BaseOrdenDetalleFormSet(ResolucionEnLoteMixin, BaseInlineFormSet):
     def clean(self):
         super().clean()
 
@@ -351,13 +510,13 @@ OrdenInsumoDetalleEditFormSet = inlineformset_factory(
 # ==========================================
 class EntradaLineaForm(forms.Form):
     # Campos base
-    # Precarga todos los insumos activos para control estricto de entrada
-    insumo = forms.ModelChoiceField(
-        queryset=Insumo.objects.filter(is_active=True).select_related('categoria', 'unidad_medida').order_by('nombre'),
+    # Solo insumos activos; las opciones se cargan por AJAX y el formset resuelve los ids en lote
+    insumo = AjaxModelChoiceField(
+        queryset=Insumo.objects.filter(is_active=True),
         label="Insumo", 
-        widget=forms.Select(attrs={"class": "form-select"})
+        widget=SeleccionAjaxWidget(attrs={"class": "form-select"})
     )
-    ubicacion = forms.ModelChoiceField(queryset=Ubicacion.objects.select_related("bodega"), label="Ubicación", widget=forms.Select(attrs={"class": "form-select"}))
+    ubicacion = UbicacionChoiceField(widget=UbicacionSelectWidget(attrs={"class": "form-select"}))
     fecha = forms.DateField(widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}), label="Fecha de Entrada")
     
     # MODIFICADO: CONVERTIDO A INTEGERFIELD
@@ -380,8 +539,7 @@ class EntradaLineaForm(forms.Form):
 
     # Lote y Expiración (Específicos de ENTRADA)
     # ⚠️ CORRECCIÓN CLAVE: Proveedor ahora es obligatorio (required=True)
-    proveedor = forms.ModelChoiceField(
-        queryset=Proveedor.objects.filter(estado='ACTIVO'), 
+    proveedor = ProveedorChoiceField(
         required=True, # ⬅️ OBLIGATORIO
         label="Proveedor", 
         widget=forms.Select(attrs={"class": "form-select"})
@@ -425,17 +583,13 @@ class EntradaLineaForm(forms.Form):
 
 # --- FORMULARIO DE LÍNEA PARA SALIDA ---
 class SalidaLineaForm(forms.Form):
-    # Precarga todos los insumos activos para control estricto de salida
-    insumo = forms.ModelChoiceField(
-        queryset=Insumo.objects.filter(is_active=True).select_related('categoria', 'unidad_medida').order_by('nombre'),
+    # Solo insumos activos; las opciones se cargan por AJAX y el formset resuelve los ids en lote
+    insumo = AjaxModelChoiceField(
+        queryset=Insumo.objects.filter(is_active=True),
         label="Insumo",
-        widget=forms.Select(attrs={"class": "form-select"})
-    )
-    ubicacion = forms.ModelChoiceField(
-        queryset=Ubicacion.objects.select_related("bodega"), 
-        label="Ubicación", 
-        widget=UbicacionSelectWidget(attrs={"class": "form-select"})
+        widget=SeleccionAjaxWidget(attrs={"class": "form-select"})
     )
+    ubicacion = UbicacionChoiceField(widget=UbicacionSelectWidget(attrs={"class": "form-select"}))
     fecha = forms.DateField(widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}), label="Fecha de Salida")
     
     # MODIFICADO: CONVERTIDO A INTEGERFIELD
@@ -461,7 +615,7 @@ class SalidaLineaForm(forms.Form):
         queryset=InsumoLote.objects.none(),  # Inicia vacío, se carga por JavaScript
         required=True, # Obligatorio para una salida
         label="Lote de Origen",
-        widget=forms.Select(attrs={"class": "form-select"})
+        widget=SeleccionAjaxWidget(attrs={"class": "form-select"})
     )
     
     def clean_insumo_lote(self):
@@ -492,13 +646,13 @@ class SalidaLineaForm(forms.Form):
 
 # --- DEFINICIÓN DE LOS NUEVOS FORMSETS ---
 # extra=1: Siempre muestra al menos una línea en blanco para que el usuario pueda llenar
-EntradaLineaFormSet = formset_factory(EntradaLineaForm, extra=1, can_delete=True)
-SalidaLineaFormSet = formset_factory(SalidaLineaForm, extra=1, can_delete=True)
+EntradaLineaFormSet = formset_factory(EntradaLineaForm, formset=LineaMovimientoFormSet, extra=1, can_delete=True)
+SalidaLineaFormSet = formset_factory(SalidaLineaForm, formset=LineaMovimientoFormSet, extra=1, can_delete=True)
 
 # --- FORMSETS PARA MOVIMIENTOS (con extra=1 para agregar automáticamente línea) ---
 # Igual que los anteriores, siempre muestran una línea en blanco
-EntradaLineaFormSetMovimiento = formset_factory(EntradaLineaForm, extra=1, can_delete=True)
-SalidaLineaFormSetMovimiento = formset_factory(SalidaLineaForm, extra=1, can_delete=True)
+EntradaLineaFormSetMovimiento = formset_factory(EntradaLineaForm, formset=LineaMovimientoFormSet, extra=1, can_delete=True)
+SalidaLineaFormSetMovimiento = formset_factory(SalidaLineaForm, formset=LineaMovimientoFormSet, extra=1, can_delete=True)
 
 # ==========================================
 #  FORMULARIOS CON AJAX PARA MOVIMIENTOS
@@ -509,14 +663,10 @@ class EntradaLineaFormAjax(forms.Form):
     insumo = AjaxModelChoiceField(
         queryset=Insumo.objects.none(),
         label="Insumo",
-        widget=forms.Select(attrs={"class": "form-select"})
+        widget=SeleccionAjaxWidget(attrs={"class": "form-select"})
     )
     
-    ubicacion = forms.ModelChoiceField(
-        queryset=Ubicacion.objects.select_related("bodega"), 
-        label="Ubicación", 
-        widget=forms.Select(attrs={"class": "form-select"})
-    )
+    ubicacion = UbicacionChoiceField(widget=UbicacionSelectWidget(attrs={"class": "form-select"}))
     fecha = forms.DateField(
         widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}), 
         label="Fecha de Entrada"
@@ -539,8 +689,7 @@ class EntradaLineaFormAjax(forms.Form):
         }),
     )
 
-    proveedor = forms.ModelChoiceField(
-        queryset=Proveedor.objects.filter(estado='ACTIVO'), 
+    proveedor = ProveedorChoiceField(
         required=True,
         label="Proveedor", 
         widget=forms.Select(attrs={"class": "form-select"})
@@ -600,14 +749,10 @@ class SalidaLineaFormAjax(forms.Form):
     insumo = AjaxModelChoiceField(
         queryset=Insumo.objects.none(),
         label="Insumo",
-        widget=forms.Select(attrs={"class": "form-select"})
+        widget=SeleccionAjaxWidget(attrs={"class": "form-select"})
     )
     
-    ubicacion = forms.ModelChoiceField(
-        queryset=Ubicacion.objects.select_related("bodega"), 
-        label="Ubicación", 
-        widget=UbicacionSelectWidget(attrs={"class": "form-select"})
-    )
+    ubicacion = UbicacionChoiceField(widget=UbicacionSelectWidget(attrs={"class": "form-select"}))
     fecha = forms.DateField(
         widget=forms.DateInput(attrs={"type": "date", "class": "form-control"}), 
         label="Fecha de Salida"
@@ -634,7 +779,7 @@ class SalidaLineaFormAjax(forms.Form):
         queryset=InsumoLote.objects.none(),  # Inicia vacío, se carga por JavaScript
         required=True,
         label="Lote de Origen",
-        widget=forms.Select(attrs={"class": "form-select"})
+        widget=SeleccionAjaxWidget(attrs={"class": "form-select"})
     )
     
     def clean_insumo_lote(self):
@@ -673,8 +818,8 @@ class SalidaLineaFormAjax(forms.Form):
         return cd
 
 # Formsets para movimientos con AJAX
-EntradaLineaFormSetMovimientoAjax = formset_factory(EntradaLineaFormAjax, extra=1, can_delete=True)
-SalidaLineaFormSetMovimientoAjax = formset_factory(SalidaLineaFormAjax, extra=1, can_delete=True)
+EntradaLineaFormSetMovimientoAjax = formset_factory(EntradaLineaFormAjax, formset=LineaMovimientoFormSet, extra=1, can_delete=True)
+SalidaLineaFormSetMovimientoAjax = formset_factory(SalidaLineaFormAjax, formset=LineaMovimientoFormSet, extra=1, can_delete=True)
 
 
 class EntradaForm(forms.ModelForm):
@@ -698,12 +843,14 @@ class EntradaForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Ubicación sí se puede cambiar, pero optimizamos la carga
+        # Ubicación sí se puede cambiar: solo activas, opciones desde el mapa en memoria
         self.fields['ubicacion'].queryset = Ubicacion.objects.filter(is_active=True).select_related('bodega')
+        self.fields['ubicacion'].solo_activos = True
 
     class Meta:
         model = Entrada
         # Solo campos editables (insumo, insumo_lote y tipo no son editables)
+        field_classes = {"ubicacion": UbicacionChoiceField}
         fields = ["ubicacion", "cantidad", "fecha", "observaciones"]
         exclude = ["usuario", "orden", "detalle", "insumo", "insumo_lote", "tipo"]
         widgets = {
@@ -733,12 +880,14 @@ class SalidaForm(forms.ModelForm):
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Ubicación sí se puede cambiar, pero optimizamos la carga
+        # Ubicación sí se puede cambiar: solo activas, opciones desde el mapa en memoria
         self.fields['ubicacion'].queryset = Ubicacion.objects.filter(is_active=True).select_related('bodega')
+        self.fields['ubicacion'].solo_activos = True
 
     class Meta:
         model = Salida
         # Solo campos editables (insumo, insumo_lote y tipo no son editables)
+        field_classes = {"ubicacion": UbicacionChoiceField}
         fields = ["ubicacion", "cantidad", "fecha_generada", "observaciones"]
         exclude = ["usuario", "orden", "detalle", "insumo", "insumo_lote", "tipo"]
         widgets = {
@@ -786,7 +935,7 @@ class AlertaForm(forms.ModelForm):
     insumo = AjaxModelChoiceField(
         queryset=Insumo.objects.none(),
         label="Insumo",
-        widget=forms.Select(attrs={"class": "form-select"})
+        widget=SeleccionAjaxWidget(attrs={"class": "form-select"})
     )
     
     class Meta:
@@ -850,59 +999,27 @@ class ProveedorForm(forms.ModelForm):
 
     def clean_rut_empresa(self):
         rut_input = self.cleaned_data["rut_empresa"].strip()
-        
-        # 1. Limpiar y Normalizar el RUT
-        rut_clean = re.sub(r'[.-]', '', rut_input).upper()
-        if not rut_clean:
-            # Si está vacío, Django debería haberlo marcado como error requerido,
-            # pero lo chequeamos por si acaso
-            raise forms.ValidationError("El RUT no puede estar vacío.")
-
-        # Separar el cuerpo (números) del dígito verificador (DV)
-        if len(rut_clean) < 2:
-            raise forms.ValidationError("El formato del RUT es inválido.")
-            
-        cuerpo = rut_clean[:-1]
-        dv_input = rut_clean[-1]
-        
-        # Verificar que el cuerpo sean solo dígitos
-        if not cuerpo.isdigit():
-            raise forms.ValidationError("El cuerpo del RUT debe contener solo números.")
 
-        # 2. Validación de Unicidad (mantenemos la validación existente)
-        qs = Proveedor.objects.filter(rut_empresa__iexact=rut_input)
+        # 1. Formato: cuerpo numérico + dígito verificador
+        try:
+            cuerpo, dv = separar_rut(rut_input)
+        except RutInvalido as exc:
+            raise forms.ValidationError(str(exc))
+
+        # 2. Unicidad, sin importar con qué formato (puntos/guion) se guardó el RUT
+        qs = Proveedor.objects.filter(rut_empresa__in=variantes_rut(cuerpo, dv))
         if self.instance.pk:
             qs = qs.exclude(pk=self.instance.pk)
         if qs.exists():
             raise forms.ValidationError("⚠ Ya existe un proveedor con este RUT/NIT.")
-        
-        # 3. Validación Matemática (Módulo 11)
-        
-        reverso = cuerpo[::-1]
-        multiplicador = 2
-        suma = 0
-        
-        for digito in reverso:
-            suma += int(digito) * multiplicador
-            multiplicador += 1
-            if multiplicador > 7:
-                multiplicador = 2
-        
-        resto = suma % 11
-        dv_calculado_int = 11 - resto
-        
-        if dv_calculado_int == 11:
-            dv_calculado = '0'
-        elif dv_calculado_int == 10:
-            dv_calculado = 'K'
-        else:
-            dv_calculado = str(dv_calculado_int)
-            
-        # 4. Comparación del DV
-        if dv_calculado != dv_input:
-            raise forms.ValidationError(f"El RUT es inválido. El dígito verificador correcto es '{dv_calculado}'.")
-            
-        # 5. Si todo es correcto, retornamos el RUT limpio o el original (original por unicidad)
+
+        # 3. Validación matemática (módulo 11)
+        try:
+            validar_rut(rut_input)
+        except RutInvalido as exc:
+            raise forms.ValidationError(str(exc))
+
+        # Se retorna el original (tal como lo ingresó el usuario)
         return rut_input
         
     def clean_email(self):
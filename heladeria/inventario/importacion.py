@@ -0,0 +1,371 @@
+"""
+Importación masiva de movimientos (entradas y salidas) desde CSV o XLSX.
+
+Columnas (encabezado en la primera fila, sin importar mayúsculas ni tildes):
+
+    tipo              ENTRADA | SALIDA
+    fecha             YYYY-MM-DD (o celda de fecha en XLSX)
+    insumo            id o nombre
+    ubicacion         id o nombre (si el nombre se repite entre bodegas, usar id)
+    cantidad          entero entre 1 y 99.999
+    proveedor         id, RUT o nombre de empresa           (solo ENTRADA)
+    fecha_expiracion  YYYY-MM-DD                             (solo ENTRADA)
+    lote              id del lote a descontar                (solo SALIDA)
+    observaciones     opcional
+
+El proceso tiene dos pasadas:
+1. Validación por bloques: los nombres/ids de cada bloque se resuelven con una
+   consulta por tipo de entidad (con cache entre bloques) y se aplican las
+   mismas reglas que los formularios de movimiento, llevando el stock
+   proyectado por insumo y por lote a medida que avanzan las filas.
+2. Escritura (solo si no hubo errores, o con `omitir_errores`): lotes,
+   entradas y salidas con bulk_create por lotes y descuentos de stock con un
+   UPDATE ... CASE por lote de filas; luego ledger, versiones, snapshot y una sola
+   evaluación de alertas para todos los insumos afectados.
+"""
+import csv
+import io
+import unicodedata
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, F, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Lower
+from openpyxl import load_workbook
+
+from .ledger import sincronizar_movimientos
+from .models import Entrada, Insumo, InsumoLote, Proveedor, Salida, Ubicacion
+from .reporte_snapshot import programar_refresco
+from .services import check_stock_alerts_batch
+from .versiones import incrementar_version_al_confirmar
+
+COLUMNAS = ["tipo", "fecha", "insumo", "ubicacion", "cantidad", "proveedor", "fecha_expiracion", "lote", "observaciones"]
+OBLIGATORIAS = ("tipo", "fecha", "insumo", "ubicacion", "cantidad")
+CHUNK_SIZE = 2000
+MAX_ERRORES = 1000
+CANTIDAD_MAXIMA = 99999
+TIPO_SALIDA = "USO_PRODUCCION"  # mismo tipo que registra el formulario de salidas
+DECIMAL = DecimalField(max_digits=10, decimal_places=2)
+_AMBIGUO = object()
+
+
+class ErrorArchivo(Exception):
+    """El archivo no se puede leer o le faltan columnas obligatorias."""
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize("NFKD", str(texto or "")).encode("ascii", "ignore").decode()
+    return texto.strip().lower().replace(" ", "_")
+
+
+def _texto(valor):
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _encabezado(celdas, obligatorias):
+    columnas = [_normalizar(c) for c in celdas]
+    faltantes = [c for c in obligatorias if c not in columnas]
+    if faltantes:
+        raise ErrorArchivo(f"Faltan columnas obligatorias: {', '.join(faltantes)}.")
+    return columnas
+
+
+def leer_filas(archivo, nombre, obligatorias=OBLIGATORIAS):
+    """Genera dicts {columna: valor} desde un archivo binario CSV o XLSX (sin cargarlo completo)."""
+    if nombre.lower().endswith((".xlsx", ".xlsm")):
+        try:
+            libro = load_workbook(archivo, read_only=True, data_only=True)
+        except Exception as exc:
+            raise ErrorArchivo(f"No se pudo abrir el XLSX: {exc}") from exc
+        try:
+            filas = libro.active.iter_rows(values_only=True)
+            columnas = _encabezado(next(filas, None) or [], obligatorias)
+            for celdas in filas:
+                if any(c not in (None, "") for c in celdas):
+                    yield dict(zip(columnas, celdas))
+        finally:
+            libro.close()
+        return
+
+    texto = io.TextIOWrapper(archivo, encoding="utf-8-sig", newline="")
+    try:
+        muestra = texto.read(4096)
+        texto.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+        lector = csv.reader(texto, dialecto)
+        columnas = _encabezado(next(lector, None) or [], obligatorias)
+        for celdas in lector:
+            if any(c.strip() for c in celdas):
+                yield dict(zip(columnas, celdas))
+    except UnicodeDecodeError as exc:
+        raise ErrorArchivo("El CSV debe estar codificado en UTF-8.") from exc
+    finally:
+        texto.detach()
+
+
+def _fecha(valor):
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    return date.fromisoformat(_texto(valor)[:10])
+
+
+def _cantidad(valor):
+    cantidad = Decimal(_texto(valor).replace(",", "."))
+    if cantidad != cantidad.to_integral_value() or not 1 <= cantidad <= CANTIDAD_MAXIMA:
+        raise ValueError
+    return cantidad
+
+
+class _Catalogo:
+    """Resuelve insumos, ubicaciones, proveedores y lotes con una consulta por entidad y bloque."""
+
+    def __init__(self):
+        self.insumos, self.ubicaciones, self.proveedores, self.lotes = {}, {}, {}, {}
+        self.stock_insumo = {}   # stock proyectado por insumo
+        self.stock_lote = {}     # stock restante por lote
+
+    @staticmethod
+    def _clave(valor):
+        texto = _texto(valor)
+        return int(texto) if texto.isdigit() else texto.lower()
+
+    def _resolver(self, cache, claves, qs, campo_nombre, valores, extra_texto=None):
+        nuevas = {c for c in claves if c != "" and c not in cache}
+        if not nuevas:
+            return
+        ids = [c for c in nuevas if isinstance(c, int)]
+        nombres = [c for c in nuevas if isinstance(c, str)]
+        filtro = Q(id__in=ids) | Q(_nombre__in=nombres)
+        qs = qs.annotate(_nombre=Lower(campo_nombre), _extra=Lower(extra_texto or campo_nombre))
+        if extra_texto:
+            filtro |= Q(_extra__in=nombres)
+        for fila in qs.filter(filtro).values(*valores, "_nombre", "_extra"):
+            if fila["id"] in nuevas:
+                cache[fila["id"]] = fila
+            for clave in {fila["_nombre"], fila["_extra"]}:
+                if clave not in nuevas:
+                    continue
+                # Un nombre repetido no identifica la fila: se exige el id
+                actual = cache.get(clave)
+                if actual is _AMBIGUO:
+                    continue
+                cache[clave] = _AMBIGUO if actual is not None and actual["id"] != fila["id"] else fila
+        for clave in nuevas:
+            cache.setdefault(clave, None)
+
+    def cargar(self, filas):
+        claves = {col: {self._clave(f.get(col)) for f in filas} for col in ("insumo", "ubicacion", "proveedor")}
+        self._resolver(self.insumos, claves["insumo"], Insumo.objects.all(), "nombre",
+                       ("id", "nombre", "is_active", "stock_maximo"))
+        self._resolver(self.ubicaciones, claves["ubicacion"], Ubicacion.objects.all(), "nombre", ("id", "bodega_id"))
+        self._resolver(self.proveedores, claves["proveedor"], Proveedor.objects.all(), "nombre_empresa",
+                       ("id", "estado", "rut_empresa"), extra_texto="rut_empresa")
+
+        lote_ids = {c for c in (self._clave(f.get("lote")) for f in filas) if isinstance(c, int)} - set(self.lotes)
+        for lote in InsumoLote.objects.filter(id__in=lote_ids).values("id", "insumo_id", "is_active", "cantidad_actual"):
+            self.lotes[lote["id"]] = lote
+            self.stock_lote[lote["id"]] = lote["cantidad_actual"]
+        for lote_id in lote_ids:
+            self.lotes.setdefault(lote_id, None)
+
+        insumo_ids = {i["id"] for i in self.insumos.values() if i and i is not _AMBIGUO} - set(self.stock_insumo)
+        stock = dict(
+            InsumoLote.objects.filter(insumo_id__in=insumo_ids, is_active=True)
+            .order_by()
+            .values("insumo_id")
+            .annotate(total=Coalesce(Sum("cantidad_actual"), Decimal("0.00"), output_field=DECIMAL))
+            .values_list("insumo_id", "total")
+        )
+        for insumo_id in insumo_ids:
+            self.stock_insumo[insumo_id] = stock.get(insumo_id, Decimal("0.00"))
+
+    def buscar(self, cache, valor, entidad):
+        clave = self._clave(valor)
+        if clave == "":
+            raise ValueError(f"falta {entidad}")
+        encontrado = cache.get(clave)
+        if encontrado is _AMBIGUO:
+            raise ValueError(f"{entidad} '{_texto(valor)}' es ambiguo, usa el id")
+        if encontrado is None:
+            raise ValueError(f"{entidad} '{_texto(valor)}' no existe")
+        return encontrado
+
+
+def _validar_fila(fila, catalogo):
+    """Retorna la tupla normalizada de la fila o lanza ValueError con los motivos."""
+    tipo = _texto(fila.get("tipo")).upper()
+    if tipo not in ("ENTRADA", "SALIDA"):
+        raise ValueError("tipo debe ser ENTRADA o SALIDA")
+    errores = []
+
+    def campo(funcion, *args, mensaje=None):
+        try:
+            return funcion(*args)
+        except (ValueError, InvalidOperation, TypeError) as exc:
+            errores.append(mensaje or str(exc))
+            return None
+
+    insumo = campo(catalogo.buscar, catalogo.insumos, fila.get("insumo"), "insumo")
+    ubicacion = campo(catalogo.buscar, catalogo.ubicaciones, fila.get("ubicacion"), "ubicación")
+    fecha = campo(_fecha, fila.get("fecha"), mensaje="fecha inválida (YYYY-MM-DD)")
+    cantidad = campo(_cantidad, fila.get("cantidad"), mensaje=f"cantidad debe ser un entero entre 1 y {CANTIDAD_MAXIMA}")
+    observaciones = _texto(fila.get("observaciones"))
+    if insumo and not insumo["is_active"]:
+        errores.append("el insumo no está activo")
+
+    if tipo == "ENTRADA":
+        proveedor = campo(catalogo.buscar, catalogo.proveedores, fila.get("proveedor"), "proveedor")
+        fexp = campo(_fecha, fila.get("fecha_expiracion"), mensaje="fecha_expiracion inválida (YYYY-MM-DD)")
+        if proveedor and proveedor["estado"] != "ACTIVO":
+            errores.append("el proveedor no está activo")
+        if fexp and fecha and fexp < fecha:
+            errores.append("la fecha de expiración no puede ser anterior a la fecha de entrada")
+        if insumo and cantidad and not errores:
+            proyectado = catalogo.stock_insumo[insumo["id"]] + cantidad
+            if proyectado > insumo["stock_maximo"]:
+                errores.append(f"excede el stock máximo ({int(insumo['stock_maximo'])}) del insumo")
+        if errores:
+            raise ValueError("; ".join(errores))
+        catalogo.stock_insumo[insumo["id"]] += cantidad
+        return ("ENTRADA", insumo["id"], ubicacion["id"], ubicacion["bodega_id"], proveedor["id"],
+                fecha, fexp, cantidad, observaciones)
+
+    lote = campo(catalogo.buscar, catalogo.lotes, fila.get("lote"), "lote")
+    if lote and insumo and lote["insumo_id"] != insumo["id"]:
+        errores.append("el lote no corresponde al insumo")
+    if lote and not lote["is_active"]:
+        errores.append("el lote no está activo")
+    if lote and cantidad and not errores and cantidad > catalogo.stock_lote[lote["id"]]:
+        errores.append(f"stock insuficiente en el lote (disponible {catalogo.stock_lote[lote['id']]:.0f})")
+    if errores:
+        raise ValueError("; ".join(errores))
+    catalogo.stock_lote[lote["id"]] -= cantidad
+    catalogo.stock_insumo[insumo["id"]] -= cantidad
+    return ("SALIDA", insumo["id"], ubicacion["id"], lote["id"], fecha, cantidad, observaciones)
+
+
+def validar_archivo(filas, chunk_size=CHUNK_SIZE, progreso=None):
+    """
+    Primera pasada. Retorna (movimientos_validos, errores, total_filas), donde
+    errores es una lista de (número de fila en el archivo, mensaje).
+    """
+    catalogo = _Catalogo()
+    validos, errores, total = [], [], 0
+    bloque = []
+
+    def procesar():
+        catalogo.cargar(bloque)
+        for numero, fila in enumerate(bloque, start=total - len(bloque) + 2):  # +1 encabezado, +1 base 1
+            try:
+                validos.append(_validar_fila(fila, catalogo))
+            except ValueError as exc:
+                if len(errores) < MAX_ERRORES:
+                    errores.append((numero, str(exc)))
+        if progreso:
+            progreso(total, len(errores))
+
+    for fila in filas:
+        bloque.append(fila)
+        total += 1
+        if len(bloque) >= chunk_size:
+            procesar()
+            bloque = []
+    if bloque:
+        procesar()
+    return validos, errores, total
+
+
+def _guardar(objetos, modelo):
+    if connection.features.can_return_rows_from_bulk_insert:
+        modelo.objects.bulk_create(objetos)
+        return True
+    # Sin RETURNING (MySQL) no hay pk tras bulk_create: se guarda uno a uno (las señales sincronizan el ledger)
+    for objeto in objetos:
+        objeto.save()
+    return False
+
+
+def _escribir_entradas(filas, usuario):
+    lotes = [
+        InsumoLote(
+            insumo_id=insumo_id, bodega_id=bodega_id, proveedor_id=proveedor_id,
+            fecha_ingreso=fecha, fecha_expiracion=fexp,
+            cantidad_inicial=cantidad, cantidad_actual=cantidad, usuario=usuario,
+        )
+        for _, insumo_id, _, bodega_id, proveedor_id, fecha, fexp, cantidad, _ in filas
+    ]
+    _guardar(lotes, InsumoLote)
+    entradas = [
+        Entrada(
+            insumo_id=insumo_id, insumo_lote=lote, ubicacion_id=ubicacion_id,
+            cantidad=cantidad, fecha=fecha, usuario=usuario, observaciones=observaciones,
+        )
+        for lote, (_, insumo_id, ubicacion_id, _, _, fecha, _, cantidad, observaciones) in zip(lotes, filas)
+    ]
+    if _guardar(entradas, Entrada):
+        sincronizar_movimientos(Entrada, [e.pk for e in entradas])
+
+
+def _escribir_salidas(filas, usuario):
+    salidas = [
+        Salida(
+            insumo_id=insumo_id, insumo_lote_id=lote_id, ubicacion_id=ubicacion_id,
+            cantidad=cantidad, fecha_generada=fecha, usuario=usuario,
+            tipo=TIPO_SALIDA, observaciones=observaciones,
+        )
+        for _, insumo_id, ubicacion_id, lote_id, fecha, cantidad, observaciones in filas
+    ]
+    if _guardar(salidas, Salida):
+        sincronizar_movimientos(Salida, [s.pk for s in salidas])
+
+    descuentos = {}
+    for _, _, _, lote_id, _, cantidad, _ in filas:
+        descuentos[lote_id] = descuentos.get(lote_id, Decimal("0")) + cantidad
+    # Un solo UPDATE por bloque, relativo al valor actual de cada lote
+    InsumoLote.objects.filter(pk__in=descuentos).update(
+        cantidad_actual=F("cantidad_actual") - Case(
+            *(When(pk=lote_id, then=Value(total)) for lote_id, total in descuentos.items()),
+            output_field=DECIMAL,
+        )
+    )
+
+
+def importar_movimientos(movimientos, usuario, chunk_size=1000, progreso=None):
+    """
+    Segunda pasada: escribe los movimientos validados en una transacción.
+    Retorna dict {"entradas": n, "salidas": n}.
+    """
+    escritos = {"entradas": 0, "salidas": 0}
+    insumos = set()
+    with transaction.atomic():
+        for inicio in range(0, len(movimientos), chunk_size):
+            bloque = movimientos[inicio:inicio + chunk_size]
+            entradas = [m for m in bloque if m[0] == "ENTRADA"]
+            salidas = [m for m in bloque if m[0] == "SALIDA"]
+            if entradas:
+                _escribir_entradas(entradas, usuario)
+            if salidas:
+                _escribir_salidas(salidas, usuario)
+            escritos["entradas"] += len(entradas)
+            escritos["salidas"] += len(salidas)
+            insumos.update(m[1] for m in bloque)
+            if progreso:
+                progreso(escritos["entradas"] + escritos["salidas"])
+
+        # bulk_create/update() no disparan señales
+        incrementar_version_al_confirmar(InsumoLote, Entrada, Salida)
+        programar_refresco(insumos)
+
+    # Una sola evaluación de alertas para los insumos afectados (no por fila)
+    check_stock_alerts_batch(insumos)
+    return escritos
@@ -0,0 +1,214 @@
+"""
+Importación masiva del catálogo: insumos con sus categorías y unidades de medida.
+
+Columnas (CSV o XLSX, mismo lector que la importación de movimientos):
+
+    nombre                 nombre del insumo
+    categoria              nombre de la categoría (se crea si no existe)
+    unidad_medida          código corto (KG, LT...)
+    unidad_medida_nombre   nombre completo; obligatorio si la unidad no existe
+    stock_minimo, stock_maximo, precio_unitario
+
+Cada entidad se inserta o actualiza con bulk_create(update_conflicts=True) sobre
+su clave única: `clave` (nombre normalizado) para insumos y categorías, y
+`nombre_corto` para unidades. Toda la validación (mínimo/máximo, precio,
+duplicados dentro del archivo) se hace en Python antes de escribir. Una fila
+cuya clave coincide con un registro eliminado (is_active=False) lo reactiva. Como
+bulk_create no dispara post_save, no corre la evaluación de alertas por insumo
+(insumo_post_save_check_alerts): se hace una sola pasada al final.
+"""
+import re
+from decimal import Decimal, InvalidOperation
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .importacion import _texto, leer_filas
+from .models import Categoria, Insumo, UnidadMedida, normalizar_nombre
+from .reporte_snapshot import programar_refresco
+from .services import check_stock_alerts_batch
+from .versiones import incrementar_version_al_confirmar
+
+COLUMNAS = ["nombre", "categoria", "unidad_medida", "unidad_medida_nombre", "stock_minimo", "stock_maximo", "precio_unitario"]
+OBLIGATORIAS = ("nombre", "categoria", "unidad_medida", "stock_minimo", "stock_maximo", "precio_unitario")
+BATCH_SIZE = 1000
+PRECIO_MAXIMO = 99999
+STOCK_MAXIMO_VALOR = Decimal("99999999.99")  # DecimalField(max_digits=10, decimal_places=2)
+CAMPOS_INSUMO = [
+    "nombre", "categoria", "unidad_medida", "stock_minimo", "stock_maximo", "precio_unitario", "is_active", "updated_at",
+]
+# Mismo criterio que CategoriaForm.clean_nombre
+PATRON_CATEGORIA = re.compile(r"^[A-Za-zÁÉÍÓÚñÑáéíóú\s]+$")
+
+
+def leer_catalogo(archivo, nombre):
+    return leer_filas(archivo, nombre, obligatorias=OBLIGATORIAS)
+
+
+def _decimal(valor, campo):
+    try:
+        numero = Decimal(_texto(valor).replace(",", "."))
+    except InvalidOperation:
+        raise ValueError(f"{campo} no es un número")
+    if not 0 <= numero <= STOCK_MAXIMO_VALOR or numero != numero.quantize(Decimal("0.01")):
+        raise ValueError(f"{campo} debe estar entre 0 y {STOCK_MAXIMO_VALOR} con hasta 2 decimales")
+    return numero
+
+
+def _validar_fila(fila, unidades):
+    errores = []
+    nombre = " ".join(_texto(fila.get("nombre")).split())
+    categoria = " ".join(_texto(fila.get("categoria")).split())
+    unidad = _texto(fila.get("unidad_medida")).upper()
+    unidad = unidades.get(unidad, (unidad, None))[0]  # se respeta el código tal como existe
+    unidad_nombre = _texto(fila.get("unidad_medida_nombre"))
+
+    if not nombre or len(nombre) > 35:
+        errores.append("nombre obligatorio (máx. 35 caracteres)")
+    if not categoria or len(categoria) > 40 or not PATRON_CATEGORIA.match(categoria):
+        errores.append("categoría obligatoria, solo letras y espacios (máx. 40)")
+    if not unidad or len(unidad) > 5:
+        errores.append("unidad_medida obligatoria (código de máx. 5 caracteres)")
+    elif unidad.upper() not in unidades and not unidad_nombre:
+        errores.append(f"la unidad '{unidad}' no existe: indica unidad_medida_nombre para crearla")
+    if len(unidad_nombre) > 50:
+        errores.append("unidad_medida_nombre admite máx. 50 caracteres")
+
+    valores = {}
+    for campo in ("stock_minimo", "stock_maximo"):
+        try:
+            valores[campo] = _decimal(fila.get(campo), campo)
+        except ValueError as exc:
+            errores.append(str(exc))
+    if len(valores) == 2 and valores["stock_minimo"] > valores["stock_maximo"]:
+        errores.append("el stock mínimo no puede ser mayor que el stock máximo")
+    try:
+        precio = int(_texto(fila.get("precio_unitario")))
+        if not 0 <= precio <= PRECIO_MAXIMO:
+            raise ValueError
+    except ValueError:
+        errores.append(f"precio_unitario debe ser un entero entre 0 y {PRECIO_MAXIMO}")
+
+    if errores:
+        raise ValueError("; ".join(errores))
+    return {
+        "nombre": nombre, "clave": normalizar_nombre(nombre),
+        "categoria": categoria, "categoria_clave": normalizar_nombre(categoria),
+        "unidad": unidad, "unidad_nombre": unidad_nombre,
+        "precio_unitario": precio, **valores,
+    }
+
+
+def validar_catalogo(filas):
+    """Retorna (filas_validas, errores, total) con errores como [(fila, mensaje)]."""
+    # {código en mayúsculas: (código tal como está guardado, nombre largo)}
+    unidades = {
+        codigo.upper(): (codigo, largo)
+        for codigo, largo in UnidadMedida.objects.values_list("nombre_corto", "nombre_largo")
+    }
+    largos_en_uso = {largo.casefold(): codigo for codigo, largo in unidades.values()}
+
+    validas, errores, vistas, total = [], [], {}, 0
+    for numero, fila in enumerate(filas, start=2):
+        total += 1
+        try:
+            datos = _validar_fila(fila, unidades)
+            if datos["clave"] in vistas:
+                raise ValueError(f"insumo repetido en el archivo (fila {vistas[datos['clave']]})")
+            largo = datos["unidad_nombre"].casefold()
+            if largo and largos_en_uso.setdefault(largo, datos["unidad"]) != datos["unidad"]:
+                raise ValueError(f"el nombre de unidad '{datos['unidad_nombre']}' ya pertenece a otra unidad")
+        except ValueError as exc:
+            errores.append((numero, str(exc)))
+            continue
+        vistas[datos["clave"]] = numero
+        validas.append(datos)
+    return validas, errores, total
+
+
+def _upsert(modelo, objetos, unique_fields, update_fields):
+    if not objetos:
+        return
+    # MySQL resuelve el conflicto con cualquier índice único (ON DUPLICATE KEY) y no acepta unique_fields
+    if not connection.features.supports_update_conflicts_with_target:
+        unique_fields = None
+    modelo.objects.bulk_create(
+        objetos, batch_size=BATCH_SIZE,
+        update_conflicts=True, unique_fields=unique_fields, update_fields=update_fields,
+    )
+
+
+def _en_bloques(valores):
+    valores = list(valores)
+    for inicio in range(0, len(valores), BATCH_SIZE):
+        yield valores[inicio:inicio + BATCH_SIZE]
+
+
+def importar_catalogo(filas):
+    """
+    Inserta o actualiza unidades, categorías e insumos validados.
+    Los insumos, categorías y unidades eliminados que vuelven en el archivo se reactivan.
+    Retorna dict {"insumos_creados", "insumos_actualizados", "insumos_reactivados",
+    "categorias", "unidades"}; los reactivados también cuentan como actualizados.
+    """
+    claves = [f["clave"] for f in filas]
+    existentes = {}
+    for bloque in _en_bloques(claves):
+        existentes.update(Insumo.objects.filter(clave__in=bloque).values_list("clave", "is_active"))
+
+    unidades = {f["unidad"]: f["unidad_nombre"] for f in filas if f["unidad_nombre"]}
+    categorias = {f["categoria_clave"]: f["categoria"] for f in filas}
+
+    with transaction.atomic():
+        _upsert(
+            UnidadMedida,
+            [UnidadMedida(nombre_corto=codigo, nombre_largo=largo) for codigo, largo in unidades.items()],
+            ["nombre_corto"], ["nombre_largo", "is_active", "updated_at"],
+        )
+        _upsert(
+            Categoria,
+            [Categoria(nombre=nombre, clave=clave) for clave, nombre in categorias.items()],
+            ["clave"], ["nombre", "is_active", "updated_at"],
+        )
+        ids_unidad = dict(
+            UnidadMedida.objects.filter(nombre_corto__in={f["unidad"] for f in filas}).values_list("nombre_corto", "id")
+        )
+        ids_categoria = {}
+        for bloque in _en_bloques(categorias):
+            ids_categoria.update(Categoria.objects.filter(clave__in=bloque).values_list("clave", "id"))
+
+        _upsert(
+            Insumo,
+            [
+                Insumo(
+                    nombre=f["nombre"], clave=f["clave"],
+                    categoria_id=ids_categoria[f["categoria_clave"]], unidad_medida_id=ids_unidad[f["unidad"]],
+                    stock_minimo=f["stock_minimo"], stock_maximo=f["stock_maximo"],
+                    precio_unitario=f["precio_unitario"],
+                )
+                for f in filas
+            ],
+            ["clave"], CAMPOS_INSUMO,
+        )
+        insumo_ids = []
+        for bloque in _en_bloques(claves):
+            insumo_ids.extend(Insumo.objects.filter(clave__in=bloque).values_list("id", flat=True))
+
+        # bulk_create no dispara señales: versiones y snapshot a mano. Los nombres de
+        # categoría y unidad se copian en la proyección, así que se refrescan todos sus insumos.
+        incrementar_version_al_confirmar(UnidadMedida, Categoria, Insumo)
+        programar_refresco(set(insumo_ids).union(
+            Insumo.objects.filter(
+                Q(categoria_id__in=ids_categoria.values())
+                | Q(unidad_medida__nombre_corto__in=unidades)
+            ).values_list("id", flat=True)
+        ))
+
+    check_stock_alerts_batch(insumo_ids)
+    return {
+        "insumos_creados": len(claves) - len(existentes),
+        "insumos_actualizados": len(existentes),
+        "insumos_reactivados": sum(1 for activo in existentes.values() if not activo),
+        "categorias": len(categorias),
+        "unidades": len(unidades),
+    }
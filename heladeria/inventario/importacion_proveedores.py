@@ -0,0 +1,225 @@
+"""
+Importación y sincronización masiva de proveedores desde CSV o XLSX.
+
+Columnas: las del modelo Proveedor (rut_empresa, nombre_empresa, email,
+telefono, direccion, ciudad y region son obligatorias). El RUT identifica al
+proveedor: si ya existe (con cualquier formato de puntos/guion) se actualiza,
+si no se crea con el formato 76086428-5. Las columnas opcionales que no vienen
+en el archivo no se tocan en los proveedores existentes.
+
+Validación en una pasada por archivo: formato y campos fila a fila, dígitos
+verificadores de todos los RUT con una operación vectorizada, duplicados dentro
+del archivo, y unicidad de RUT y email contra la base con un solo IN por bloque.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .importacion import _texto, leer_filas
+from .models import Proveedor
+from .rut import RutInvalido, calcular_dvs, formatear_rut, separar_rut, variantes_rut
+from .versiones import incrementar_version_al_confirmar
+
+OBLIGATORIAS = ("rut_empresa", "nombre_empresa", "email", "telefono", "direccion", "ciudad", "region")
+OPCIONALES = ("telefono_alternativo", "estado", "condiciones_pago", "dias_credito", "monto_credito", "observaciones")
+COLUMNAS = [*OBLIGATORIAS, *OPCIONALES]
+LARGOS = {
+    "nombre_empresa": 100, "email": 150, "telefono": 20, "telefono_alternativo": 20,
+    "direccion": 200, "ciudad": 50, "region": 50, "condiciones_pago": 100,
+}
+ESTADOS = {codigo for codigo, _ in Proveedor.ESTADO_CHOICES}
+CHUNK_SIZE = 1000
+# bulk_update arma un CASE por campo con una rama por fila: lotes chicos rinden más
+BATCH_UPDATE = 200
+
+
+def leer_proveedores(archivo, nombre):
+    return leer_filas(archivo, nombre, obligatorias=OBLIGATORIAS)
+
+
+def _validar_campos(fila):
+    """Campos del proveedor normalizados (sin el RUT) o ValueError con todos los motivos."""
+    errores, datos = [], {}
+    for campo in OBLIGATORIAS[1:]:
+        datos[campo] = _texto(fila.get(campo))
+        if not datos[campo]:
+            errores.append(f"falta {campo}")
+    for campo in ("telefono_alternativo", "condiciones_pago", "observaciones"):
+        if campo in fila:
+            datos[campo] = _texto(fila.get(campo)) or None
+    for campo, largo in LARGOS.items():
+        if datos.get(campo) and len(datos[campo]) > largo:
+            errores.append(f"{campo} admite máx. {largo} caracteres")
+    if datos["email"]:
+        try:
+            validate_email(datos["email"])
+        except ValidationError:
+            errores.append(f"email '{datos['email']}' inválido")
+
+    if "estado" in fila:
+        datos["estado"] = _texto(fila.get("estado")).upper() or "ACTIVO"
+        if datos["estado"] not in ESTADOS:
+            errores.append(f"estado debe ser uno de {', '.join(sorted(ESTADOS))}")
+    if "dias_credito" in fila:
+        try:
+            datos["dias_credito"] = int(_texto(fila.get("dias_credito")) or 0)
+            if datos["dias_credito"] < 0:
+                raise ValueError
+        except ValueError:
+            errores.append("dias_credito debe ser un entero >= 0")
+    if "monto_credito" in fila:
+        try:
+            datos["monto_credito"] = Decimal(_texto(fila.get("monto_credito")).replace(",", ".") or "0")
+            if not Decimal("0") <= datos["monto_credito"] <= Decimal("99999999.99"):
+                raise InvalidOperation
+        except InvalidOperation:
+            errores.append("monto_credito debe ser un número entre 0 y 99999999.99")
+
+    if errores:
+        raise ValueError("; ".join(errores))
+    return datos
+
+
+def _precheck_existentes(bloque):
+    """
+    Un solo IN por bloque: asigna el id del proveedor con ese RUT y detecta emails de otros proveedores.
+    LOWER(email) es la misma expresión del índice proveedor_email_lower_idx, así el OR
+    se resuelve con dos búsquedas por índice en vez de recorrer la tabla.
+    """
+    variantes = set().union(*(variantes_rut(f["cuerpo"], f["dv"]) for _, f in bloque))
+    emails = {f["email"].lower() for _, f in bloque}
+    por_rut, por_email = {}, {}
+    existentes = (
+        Proveedor.objects.annotate(_email=Lower("email"))
+        .filter(Q(rut_empresa__in=variantes) | Q(_email__in=emails))
+        .order_by()
+        .values_list("id", "rut_empresa", "_email")
+    )
+    for proveedor_id, rut, email in existentes:
+        try:
+            por_rut[separar_rut(rut)] = proveedor_id
+        except RutInvalido:
+            pass
+        por_email[email] = proveedor_id
+
+    errores = []
+    for numero, fila in bloque:
+        fila["id"] = por_rut.get((fila["cuerpo"], fila["dv"]))
+        dueno_email = por_email.get(fila["email"].lower())
+        if dueno_email and dueno_email != fila["id"]:
+            errores.append((numero, f"el email '{fila['email']}' ya pertenece a otro proveedor"))
+    return errores
+
+
+def validar_proveedores(filas, chunk_size=CHUNK_SIZE):
+    """
+    Retorna (validas, errores, total, columnas). Cada fila válida trae `id` (proveedor
+    existente a actualizar o None) y `rut_empresa` normalizado para los nuevos.
+    """
+    candidatas, errores, columnas, total = [], [], set(), 0
+    for numero, fila in enumerate(filas, start=2):
+        total += 1
+        columnas.update(fila)
+        motivos = []
+        try:
+            cuerpo, dv = separar_rut(fila.get("rut_empresa"))
+        except RutInvalido as exc:
+            cuerpo = dv = None
+            motivos.append(str(exc).rstrip("."))
+        try:
+            datos = _validar_campos(fila)
+        except ValueError as exc:
+            motivos.append(str(exc))
+        if motivos:
+            errores.append((numero, "; ".join(motivos)))
+        else:
+            candidatas.append((numero, {**datos, "cuerpo": cuerpo, "dv": dv}))
+
+    # Dígitos verificadores de todo el archivo en una operación
+    esperados = calcular_dvs([f["cuerpo"] for _, f in candidatas])
+    vistos_rut, vistos_email, unicas = {}, {}, []
+    for (numero, fila), esperado in zip(candidatas, esperados):
+        if fila["dv"] != esperado:
+            errores.append((numero, f"RUT inválido: el dígito verificador correcto es '{esperado}'"))
+            continue
+        rut, email = (fila["cuerpo"], fila["dv"]), fila["email"].lower()
+        if rut in vistos_rut:
+            errores.append((numero, f"RUT repetido en el archivo (fila {vistos_rut[rut]})"))
+            continue
+        if email in vistos_email:
+            errores.append((numero, f"email repetido en el archivo (fila {vistos_email[email]})"))
+            continue
+        vistos_rut[rut], vistos_email[email] = numero, numero
+        fila["rut_empresa"] = formatear_rut(*rut)
+        unicas.append((numero, fila))
+
+    validas, con_error = [], set()
+    for inicio in range(0, len(unicas), chunk_size):
+        bloque = unicas[inicio:inicio + chunk_size]
+        errores_bloque = _precheck_existentes(bloque)
+        errores.extend(errores_bloque)
+        con_error.update(numero for numero, _ in errores_bloque)
+        validas.extend(fila for numero, fila in bloque if numero not in con_error)
+
+    errores.sort()
+    return validas, errores, total, columnas
+
+
+def _con_cambios(existentes, campos, chunk_size):
+    """Solo las filas cuyo proveedor difiere en algún campo del archivo (una consulta por bloque)."""
+    cambiadas = []
+    for inicio in range(0, len(existentes), chunk_size):
+        bloque = existentes[inicio:inicio + chunk_size]
+        actuales = {
+            fila["id"]: fila
+            for fila in Proveedor.objects.filter(id__in=[f["id"] for f in bloque]).values("id", *campos)
+        }
+        cambiadas.extend(f for f in bloque if any(actuales[f["id"]][c] != f[c] for c in campos))
+    return cambiadas
+
+
+def importar_proveedores(filas, columnas, chunk_size=CHUNK_SIZE, desactivar_ausentes=False):
+    """
+    Crea (bulk_create) y actualiza (bulk_update, solo los que cambian) por lotes. Con
+    `desactivar_ausentes` los proveedores activos que no vienen en el archivo pasan a INACTIVO.
+    Retorna dict {"creados", "actualizados", "sin_cambios", "desactivados"}.
+    """
+    campos = [c for c in (*OBLIGATORIAS[1:], *OPCIONALES) if c in columnas]
+    nuevos = [f for f in filas if f["id"] is None]
+    existentes = [f for f in filas if f["id"] is not None]
+    cambiados = _con_cambios(existentes, campos, chunk_size)
+    desactivados = 0
+
+    with transaction.atomic():
+        if desactivar_ausentes:
+            # Antes de crear los nuevos: los únicos que deben seguir activos son los del archivo
+            desactivados = (
+                Proveedor.objects.filter(estado="ACTIVO")
+                .exclude(id__in=[f["id"] for f in existentes])
+                .update(estado="INACTIVO")
+            )
+        Proveedor.objects.bulk_create(
+            [Proveedor(rut_empresa=f["rut_empresa"], **{c: f[c] for c in campos}) for f in nuevos],
+            batch_size=chunk_size,
+        )
+        ahora = timezone.now()  # bulk_update no aplica auto_now
+        Proveedor.objects.bulk_update(
+            [Proveedor(id=f["id"], updated_at=ahora, **{c: f[c] for c in campos}) for f in cambiados],
+            [*campos, "updated_at"],
+            batch_size=BATCH_UPDATE,
+        )
+        if nuevos or cambiados or desactivados:
+            # Operaciones en lote: sin señales, los ETags se invalidan a mano
+            incrementar_version_al_confirmar(Proveedor)
+
+    return {
+        "creados": len(nuevos),
+        "actualizados": len(cambiados),
+        "sin_cambios": len(existentes) - len(cambiados),
+        "desactivados": desactivados,
+    }
@@ -0,0 +1,172 @@
+"""
+Kardex (libro de existencias) de un insumo o de un lote.
+
+Lee el ledger único de movimientos (MovimientoLedger), ordenado por (fecha, id),
+y calcula el saldo acumulado:
+- Con funciones de ventana (SUM() OVER) cuando la base de datos las soporta,
+  aplicadas solo sobre la página pedida.
+- Si no, acumulando en Python mientras se recorren las filas.
+
+La paginación es por cursor (keyset): se filtra (fecha, id) > cursor usando los
+índices (insumo, fecha, id) / (insumo_lote, fecha, id), así que pedir la página
+N no recorre las anteriores. El cursor va firmado y lleva el saldo al final de
+la página previa, de modo que la página siguiente no necesita volver a sumar
+el historial.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.core import signing
+from django.db import connections
+from django.db.models import CharField, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import MovimientoLedger
+
+CURSOR_SALT = "inventario.kardex"
+LIMIT_DEFAULT = 50
+LIMIT_MAX = 500
+
+# Orden de las columnas en el SELECT: campos propios y luego anotaciones
+CAMPOS = ["fecha", "id", "origen_id", "tipo", "subtipo", "cantidad", "insumo_lote_id", "observaciones"]
+ANOTACIONES = {
+    "mov_ubicacion": F("ubicacion__nombre"),
+    "mov_bodega": F("bodega__nombre"),
+    "mov_usuario": Coalesce("usuario__name", "usuario__email", output_field=CharField()),
+}
+COLUMNAS = CAMPOS + list(ANOTACIONES)
+
+
+def _filtro(insumo_id=None, lote_id=None):
+    qs = MovimientoLedger.objects.filter(is_active=True)
+    if lote_id:
+        return qs.filter(insumo_lote_id=lote_id)
+    return qs.filter(insumo_id=insumo_id)
+
+
+def _movimientos(insumo_id=None, lote_id=None, cursor=None, desde=None):
+    qs = _filtro(insumo_id, lote_id)
+    if cursor:
+        fecha, pk = cursor
+        qs = qs.filter(Q(fecha__gt=fecha) | Q(fecha=fecha, id__gt=pk))
+    elif desde:
+        qs = qs.filter(fecha__gte=desde)
+    return qs.annotate(**ANOTACIONES).order_by("fecha", "id").values(*COLUMNAS)
+
+
+def saldo_antes_de(fecha, insumo_id=None, lote_id=None):
+    """Saldo acumulado de todos los movimientos con fecha < `fecha` (un agregado indexado)."""
+    saldo = _filtro(insumo_id, lote_id).filter(fecha__lt=fecha).aggregate(s=Sum("cantidad"))["s"]
+    return saldo or Decimal("0")
+
+
+def _a_decimal(valor):
+    if valor is None:
+        return Decimal("0.00")
+    if not isinstance(valor, Decimal):
+        valor = Decimal(str(valor))
+    return valor.quantize(Decimal("0.01"))
+
+
+def _a_fecha(valor):
+    return valor if isinstance(valor, date) else date.fromisoformat(str(valor)[:10])
+
+
+def _fila(fila, saldo):
+    cantidad = _a_decimal(fila["cantidad"])
+    return {
+        "fecha": _a_fecha(fila["fecha"]),
+        "pk": fila["id"],
+        "id": fila["origen_id"],
+        "tipo": fila["tipo"],
+        "subtipo": fila["subtipo"],
+        "entrada": cantidad if cantidad > 0 else Decimal("0.00"),
+        "salida": -cantidad if cantidad < 0 else Decimal("0.00"),
+        "cantidad": cantidad,
+        "saldo": _a_decimal(saldo),
+        "lote_id": fila["insumo_lote_id"],
+        "ubicacion": fila["mov_ubicacion"],
+        "bodega": fila["mov_bodega"],
+        "usuario": fila["mov_usuario"],
+        "observaciones": fila["observaciones"] or "",
+    }
+
+
+def _pagina_ventana(movimientos, limit, saldo_inicial):
+    """Saldo con SUM() OVER sobre la página (limit+1 filas) ya recortada en SQL."""
+    qs = movimientos[:limit + 1]
+    sql, params = qs.query.get_compiler(using=qs.db).as_sql(with_col_aliases=True)
+    sql = (
+        f"SELECT k.*, SUM(k.cantidad) OVER "
+        f"(ORDER BY k.fecha, k.id ROWS UNBOUNDED PRECEDING) "
+        f"FROM ({sql}) k ORDER BY k.fecha, k.id"
+    )
+    with connections[qs.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            _fila(dict(zip(COLUMNAS, fila)), saldo_inicial + _a_decimal(fila[-1]))
+            for fila in cursor.fetchall()
+        ]
+
+
+def _pagina_python(movimientos, limit, saldo_inicial):
+    filas = []
+    saldo = saldo_inicial
+    for valores in movimientos[:limit + 1]:
+        saldo += _a_decimal(valores["cantidad"])
+        filas.append(_fila(valores, saldo))
+    return filas
+
+
+def codificar_cursor(fila):
+    return signing.dumps(
+        [fila["fecha"].isoformat(), fila["pk"], str(fila["saldo"])],
+        salt=CURSOR_SALT,
+        compress=True,
+    )
+
+
+def decodificar_cursor(token):
+    """Retorna ((fecha, id), saldo) o lanza ValueError si el cursor es inválido."""
+    try:
+        fecha, pk, saldo = signing.loads(token, salt=CURSOR_SALT)
+        return (date.fromisoformat(fecha), int(pk)), Decimal(saldo)
+    except (signing.BadSignature, TypeError, ValueError) as exc:
+        raise ValueError("Cursor inválido") from exc
+
+
+def pagina_kardex(insumo_id=None, lote_id=None, cursor=None, desde=None, limit=LIMIT_DEFAULT):
+    """
+    Una página del kardex. Retorna dict con `filas`, `saldo_inicial` y
+    `siguiente` (cursor firmado o None si no hay más).
+    """
+    limit = max(1, min(int(limit or LIMIT_DEFAULT), LIMIT_MAX))
+    posicion = None
+    if cursor:
+        posicion, saldo_inicial = decodificar_cursor(cursor)
+    elif desde:
+        saldo_inicial = saldo_antes_de(desde, insumo_id, lote_id)
+    else:
+        saldo_inicial = Decimal("0.00")
+
+    movimientos = _movimientos(insumo_id, lote_id, cursor=posicion, desde=desde)
+    if connections[movimientos.db].features.supports_over_clause:
+        filas = _pagina_ventana(movimientos, limit, saldo_inicial)
+    else:
+        filas = _pagina_python(movimientos, limit, saldo_inicial)
+
+    hay_mas = len(filas) > limit
+    filas = filas[:limit]
+    return {
+        "filas": filas,
+        "saldo_inicial": _a_decimal(saldo_inicial),
+        "siguiente": codificar_cursor(filas[-1]) if hay_mas and filas else None,
+    }
+
+
+def iterar_kardex(insumo_id=None, lote_id=None, desde=None, chunk_size=2000):
+    """Todas las filas del kardex en streaming, acumulando el saldo en Python (para exportar)."""
+    saldo = saldo_antes_de(desde, insumo_id, lote_id) if desde else Decimal("0.00")
+    for valores in _movimientos(insumo_id, lote_id, desde=desde).iterator(chunk_size=chunk_size):
+        saldo += _a_decimal(valores["cantidad"])
+        yield _fila(valores, saldo)
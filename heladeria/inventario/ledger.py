@@ -0,0 +1,105 @@
+"""
+Mantenimiento de la tabla `movimiento_ledger` (MovimientoLedger).
+
+Cada Entrada/Salida guardada o eliminada se replica en el ledger desde las
+señales (signals.py), dentro de la misma transacción. Las cargas masivas que
+usan bulk_create no disparan señales: después de ellas hay que llamar a
+`reconstruir_ledger()` (o al comando `reconstruir_ledger_movimientos`).
+"""
+from django.db import connection, transaction
+from django.db.models.functions import Coalesce
+
+from .models import Entrada, Salida, MovimientoLedger
+from .versiones import incrementar_version_al_confirmar
+
+# Por modelo origen: tipo en el ledger, campo de fecha y signo de la cantidad
+ORIGENES = {
+    Entrada: ("ENTRADA", "fecha", 1),
+    Salida: ("SALIDA", "fecha_generada", -1),
+}
+
+CAMPOS_ACTUALIZABLES = [
+    "subtipo", "fecha", "insumo", "insumo_lote", "ubicacion", "bodega",
+    "cantidad", "usuario", "orden", "observaciones", "is_active",
+]
+
+
+def _filas_ledger(modelo, qs, chunk_size=2000):
+    """Genera instancias de MovimientoLedger (sin guardar) para el queryset de origen."""
+    tipo, campo_fecha, signo = ORIGENES[modelo]
+    valores = (
+        qs.order_by()
+        .annotate(bodega_mov=Coalesce("insumo_lote__bodega_id", "ubicacion__bodega_id"))
+        .values_list(
+            "id", campo_fecha, "tipo", "insumo_id", "insumo_lote_id", "ubicacion_id", "bodega_mov",
+            "cantidad", "usuario_id", "orden_id", "observaciones", "is_active",
+        )
+    )
+    for (pk, fecha, subtipo, insumo_id, lote_id, ubicacion_id, bodega_id,
+         cantidad, usuario_id, orden_id, observaciones, is_active) in valores.iterator(chunk_size=chunk_size):
+        yield MovimientoLedger(
+            tipo=tipo,
+            origen_id=pk,
+            subtipo=subtipo or "",
+            fecha=fecha,
+            insumo_id=insumo_id,
+            insumo_lote_id=lote_id,
+            ubicacion_id=ubicacion_id,
+            bodega_id=bodega_id,
+            cantidad=cantidad * signo,
+            usuario_id=usuario_id,
+            orden_id=orden_id,
+            observaciones=observaciones or "",
+            is_active=is_active,
+        )
+
+
+def _upsert():
+    opciones = {"update_conflicts": True, "update_fields": CAMPOS_ACTUALIZABLES}
+    if connection.features.supports_update_conflicts_with_target:
+        opciones["unique_fields"] = ["tipo", "origen_id"]
+    return opciones
+
+
+def sincronizar_movimientos(modelo, ids):
+    """Inserta o actualiza en el ledger los movimientos `ids` de `modelo` (Entrada o Salida)."""
+    filas = list(_filas_ledger(modelo, modelo.objects.filter(pk__in=list(ids))))
+    if filas:
+        MovimientoLedger.objects.bulk_create(filas, **_upsert())
+    return len(filas)
+
+
+def eliminar_movimientos(modelo, ids):
+    tipo = ORIGENES[modelo][0]
+    return MovimientoLedger.objects.filter(tipo=tipo, origen_id__in=list(ids)).delete()[0]
+
+
+def reconstruir_ledger(chunk_size=2000, progreso=None):
+    """
+    Vacía y vuelve a poblar el ledger desde Entrada y Salida.
+    `progreso(tipo, filas)` se llama después de cada bloque escrito.
+    bulk_create no dispara señales: al confirmar cambia la versión de los movimientos
+    para que los listados y el kárdex cacheados no sigan mostrando el ledger anterior.
+    Retorna dict {tipo: filas escritas}.
+    """
+    escritas = {}
+    with transaction.atomic():
+        MovimientoLedger.objects.all().delete()
+        for modelo, (tipo, _, _) in ORIGENES.items():
+            escritas[tipo] = 0
+            batch = []
+            for fila in _filas_ledger(modelo, modelo.objects.all(), chunk_size):
+                batch.append(fila)
+                if len(batch) >= chunk_size:
+                    MovimientoLedger.objects.bulk_create(batch)
+                    escritas[tipo] += len(batch)
+                    batch = []
+                    if progreso:
+                        progreso(tipo, escritas[tipo])
+            if batch:
+                MovimientoLedger.objects.bulk_create(batch)
+                escritas[tipo] += len(batch)
+                if progreso:
+                    progreso(tipo, escritas[tipo])
+        incrementar_version_al_confirmar(Entrada, Salida, MovimientoLedger)
+    return escritas
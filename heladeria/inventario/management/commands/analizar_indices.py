@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from inventario import analisis_indices
+
+
+class Command(BaseCommand):
+    help = (
+        "Arma los querysets de las vistas más usadas, los pasa por EXPLAIN (MySQL) o "
+        "EXPLAIN QUERY PLAN (SQLite) y marca recorridos completos, órdenes sin índice y "
+        "tablas temporales. Propone los índices que faltan como líneas de Meta.indexes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--consulta',
+            action='append',
+            choices=[c.nombre for c in analisis_indices.CONSULTAS],
+            help='Analiza solo esta consulta (se puede repetir)'
+        )
+        parser.add_argument(
+            '--database',
+            default='default',
+            help='Alias de la base a analizar (default: default)'
+        )
+        parser.add_argument(
+            '--sql',
+            action='store_true',
+            help='Muestra también el SQL de cada consulta'
+        )
+        parser.add_argument(
+            '--solo-hallazgos',
+            action='store_true',
+            help='Omite las consultas cuyo plan no tiene hallazgos'
+        )
+
+    def handle(self, *args, **options):
+        using = options['database']
+        if using not in connections:
+            raise CommandError(f"No existe la base '{using}'")
+        vendor = connections[using].vendor
+        try:
+            resultados = analisis_indices.analizar(options['consulta'], using=using)
+        except NotImplementedError as exc:
+            raise CommandError(str(exc))
+
+        self.stdout.write(f"📋 Planes de {len(resultados)} consultas en '{using}' ({vendor})")
+        sugerencias = []
+        for resultado in resultados:
+            consulta = resultado.consulta
+            if options['solo_hallazgos'] and not resultado.hallazgos:
+                continue
+
+            self.stdout.write("")
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{consulta.nombre}  ({consulta.vista})"))
+            if options['sql']:
+                self.stdout.write(f"   {resultado.sql}")
+            for linea in resultado.plan:
+                self.stdout.write(f"   | {linea}")
+            if consulta.nota:
+                self.stdout.write(f"   Nota: {consulta.nota}")
+
+            if not resultado.hallazgos:
+                self.stdout.write(self.style.SUCCESS("   ✓ Sin hallazgos"))
+                continue
+            for hallazgo in resultado.hallazgos:
+                self.stdout.write(self.style.WARNING(f"   ⚠ {hallazgo.tipo}: {hallazgo.detalle}"))
+            indice = analisis_indices.indice_sugerido(resultado)
+            if indice is not None:
+                linea = analisis_indices.como_codigo(indice)
+                sugerencias.append((resultado.modelo, linea))
+                self.stdout.write(self.style.NOTICE(f"   → {resultado.modelo.__name__}.Meta.indexes: {linea}"))
+            elif consulta.indice is not None:
+                self.stdout.write(f"   Índice esperado ya declarado: {analisis_indices.como_codigo(consulta.indice)}")
+
+        self.stdout.write("")
+        con_hallazgos = sum(1 for r in resultados if r.hallazgos)
+        if not sugerencias:
+            self.stdout.write(self.style.SUCCESS(
+                f"✓ {con_hallazgos} consultas con hallazgos, ninguna con índice pendiente de declarar"
+            ))
+            return
+        self.stdout.write(self.style.WARNING(f"⚠ {len(sugerencias)} índices sugeridos:"))
+        for modelo, linea in sugerencias:
+            self.stdout.write(f"   {modelo.__name__}: {linea}")
+        self.stdout.write("   Agregarlos a Meta.indexes y ejecutar: python manage.py makemigrations inventario")
@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand
+from inventario.models import CheckpointProceso
+from inventario.retencion_alertas import CHECKPOINT, alertas_archivables, archivar_alertas
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve las alertas resueltas (inactivas) más antiguas que N días a la tabla "
+        "alerta_archivada, por rangos de PK. Si se interrumpe, la siguiente corrida "
+        "continúa desde el último rango procesado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=90,
+            help='Antigüedad mínima (días desde que se resolvió) para archivar (default: 90)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=1000,
+            help='Tamaño del rango de PK procesado por transacción (default: 1000)'
+        )
+        parser.add_argument(
+            '--reiniciar',
+            action='store_true',
+            help='Ignora el checkpoint y recorre la tabla desde el inicio'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo informa cuántas alertas se archivarían'
+        )
+
+    def handle(self, *args, **options):
+        dias = options['dias']
+        pendientes = alertas_archivables(dias).count()
+
+        if options['dry_run']:
+            self.stdout.write(
+                self.style.WARNING(f"[dry-run] {pendientes} alerta(s) resueltas hace más de {dias} días por archivar")
+            )
+            return
+
+        if pendientes == 0:
+            self.stdout.write(self.style.WARNING(f"No hay alertas resueltas hace más de {dias} días"))
+            return
+
+        checkpoint = CheckpointProceso.objects.filter(nombre=CHECKPOINT).values_list('ultimo_pk', flat=True).first()
+        if checkpoint and not options['reiniciar']:
+            self.stdout.write(self.style.NOTICE(f"Reanudando desde el PK {checkpoint}"))
+        self.stdout.write(self.style.NOTICE(f"Archivando {pendientes} alerta(s)..."))
+
+        def progreso(archivadas, hasta_pk):
+            self.stdout.write(f"   PK < {hasta_pk}: {archivadas}/{pendientes} archivada(s)")
+
+        archivadas = archivar_alertas(
+            dias=dias,
+            chunk_size=options['chunk_size'],
+            reiniciar=options['reiniciar'],
+            progreso=progreso,
+        )
+        self.stdout.write(self.style.SUCCESS(f"\n✓ {archivadas} alerta(s) movida(s) a alerta_archivada\n"))
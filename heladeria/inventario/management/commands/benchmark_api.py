@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from accounts.models import UsuarioApp
+from inventario.models import Insumo
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el throughput de las APIs JSON de solo lectura atendidas por el handler "
+        "WSGI (un hilo por petición, como gunicorn con --threads) y por el handler ASGI "
+        "(vistas async en un event loop), ambos en proceso contra la base de datos configurada. "
+        "Es una aproximación a nivel de handler: los clientes de prueba no pasan por sockets, "
+        "parseo HTTP ni workers de un servidor, así que la razón ASGI/WSGI no equivale a la de "
+        "producción. Para medir detrás de un servidor real, levantar `gunicorn heladeria.wsgi` y "
+        "`uvicorn heladeria.asgi:application` y apuntarles un generador de carga externo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--url',
+            action='append',
+            help='Ruta a consultar (repetible). Default: buscar insumos, lotes, stock-info y movimientos'
+        )
+        parser.add_argument(
+            '--peticiones',
+            type=int,
+            default=500,
+            help='Peticiones totales por modo (default: 500)'
+        )
+        parser.add_argument(
+            '--concurrencia',
+            type=int,
+            default=20,
+            help='Peticiones simultáneas: hilos en WSGI, tareas en ASGI (default: 20)'
+        )
+        parser.add_argument(
+            '--usuario',
+            type=str,
+            help='Email del usuario con que se autentican las peticiones (default: primer superusuario)'
+        )
+
+    def handle(self, *args, **options):
+        if options['usuario']:
+            usuario = UsuarioApp.objects.filter(email=options['usuario']).first()
+        else:
+            usuario = UsuarioApp.objects.filter(is_superuser=True).first()
+        if not usuario:
+            raise CommandError("No se encontró el usuario. Usa --usuario o crea un superusuario.")
+
+        urls = options['url'] or self._urls_por_defecto()
+        total = options['peticiones']
+        concurrencia = options['concurrencia']
+        rutas = [urls[i % len(urls)] for i in range(total)]
+
+        self.stdout.write(self.style.NOTICE(
+            f"{total} peticiones, concurrencia {concurrencia}, {len(urls)} URL(s):"
+        ))
+        for url in urls:
+            self.stdout.write(f"   {url}")
+
+        # Los clientes de prueba usan el host "testserver"; misma sesión para ambos modos
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            resultados = self._medir(usuario, rutas, concurrencia)
+
+        self.stdout.write("")
+        for modo, (segundos, latencias, errores) in resultados.items():
+            p50, p95 = self._percentiles(latencias)
+            linea = (
+                f"{modo}: {total / segundos:8.1f} req/s · p50 {p50 * 1000:6.1f} ms · "
+                f"p95 {p95 * 1000:6.1f} ms · errores {errores}"
+            )
+            self.stdout.write(self.style.ERROR(linea) if errores else linea)
+
+        wsgi, asgi = resultados["WSGI"][0], resultados["ASGI"][0]
+        self.stdout.write(self.style.SUCCESS(f"\nASGI/WSGI: {wsgi / asgi:.2f}x throughput (handlers en proceso, sin servidor HTTP)"))
+
+    def _medir(self, usuario, rutas, concurrencia):
+        cliente = Client()
+        cliente.force_login(usuario)
+        return {
+            "WSGI": self._medir_wsgi(rutas, concurrencia, cliente.cookies),
+            "ASGI": async_to_sync(self._medir_asgi)(rutas, concurrencia, cliente.cookies),
+        }
+
+    def _urls_por_defecto(self):
+        insumo_id = Insumo.objects.filter(is_active=True).values_list('id', flat=True).first()
+        urls = ['/inventario/api/buscar-insumos/?q=a', '/inventario/api/movimientos/']
+        if insumo_id:
+            urls += [
+                f'/inventario/api/obtener-lotes-por-insumo/?insumo_id={insumo_id}',
+                f'/inventario/ajax/insumo/{insumo_id}/stock-info/',
+            ]
+        return urls
+
+    def _medir_wsgi(self, rutas, concurrencia, cookies):
+        local = threading.local()
+
+        def pedir(ruta):
+            if not hasattr(local, 'cliente'):
+                local.cliente = Client()
+                local.cliente.cookies = cookies
+            inicio = time.perf_counter()
+            respuesta = local.cliente.get(ruta)
+            return time.perf_counter() - inicio, respuesta.status_code
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            filas = list(pool.map(pedir, rutas))
+        return self._resumen(time.perf_counter() - inicio, filas)
+
+    async def _medir_asgi(self, rutas, concurrencia, cookies):
+        limite = asyncio.Semaphore(concurrencia)
+        cliente = AsyncClient()
+        cliente.cookies = cookies
+
+        async def pedir(ruta):
+            async with limite:
+                inicio = time.perf_counter()
+                respuesta = await cliente.get(ruta)
+                return time.perf_counter() - inicio, respuesta.status_code
+
+        inicio = time.perf_counter()
+        filas = await asyncio.gather(*(pedir(ruta) for ruta in rutas))
+        return self._resumen(time.perf_counter() - inicio, filas)
+
+    def _resumen(self, segundos, filas):
+        latencias = [latencia for latencia, _ in filas]
+        errores = sum(1 for _, estado in filas if estado != 200)
+        return segundos, latencias, errores
+
+    def _percentiles(self, latencias):
+        if len(latencias) < 2:
+            valor = latencias[0] if latencias else 0
+            return valor, valor
+        cortes = quantiles(latencias, n=20)
+        return cortes[9], cortes[18]
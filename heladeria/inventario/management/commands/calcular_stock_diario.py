@@ -0,0 +1,66 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from inventario.stock_historico import (
+    fecha_inicio_incremental,
+    recalcular_stock_diario,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcula el stock histórico diario por insumo y bodega (tabla StockDiario). "
+        "Por defecto es incremental: solo recalcula desde el último día calculado "
+        "(o antes, si hay movimientos con fecha pasada registrados después)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='Recalcula toda la historia en una pasada sobre los movimientos ordenados por fecha'
+        )
+        parser.add_argument(
+            '--desde',
+            type=str,
+            help='Recalcula desde esta fecha (YYYY-MM-DD), ej. después de eliminar movimientos'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Movimientos leídos / filas escritas por bloque (default: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        if options['backfill'] and options['desde']:
+            raise CommandError("Usa --backfill o --desde, no ambos.")
+
+        if options['desde']:
+            try:
+                desde = date.fromisoformat(options['desde'])
+            except ValueError:
+                raise CommandError("Formato de --desde inválido. Usa YYYY-MM-DD.")
+            modo = f"desde {desde}"
+        elif options['backfill']:
+            desde = None
+            modo = "backfill completo"
+        else:
+            desde = fecha_inicio_incremental()
+            modo = f"incremental desde {desde}" if desde else "backfill completo (sin historia previa)"
+
+        self.stdout.write(self.style.NOTICE(f"Calculando stock diario ({modo})..."))
+
+        def progreso(movimientos, filas):
+            self.stdout.write(f"  -> {movimientos} movimientos procesados, {filas} filas escritas...")
+
+        resultado = recalcular_stock_diario(desde, chunk_size=options['chunk_size'], progreso=progreso)
+
+        if resultado['desde'] is None:
+            self.stdout.write(self.style.WARNING("No hay movimientos registrados; historial vacío."))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Stock diario calculado desde {resultado['desde']}: "
+            f"{resultado['movimientos']} movimientos, {resultado['filas']} filas."
+        ))
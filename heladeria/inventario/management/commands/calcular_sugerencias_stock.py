@@ -0,0 +1,69 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from inventario.pronostico import (
+    METODO_EXPONENCIAL,
+    METODO_MEDIA_MOVIL,
+    recalcular_sugerencias,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Pronostica el consumo diario de cada insumo a partir de las Salidas y guarda "
+        "mínimo, máximo y punto de reorden sugeridos (tabla SugerenciaStock). "
+        "Pensado para correr cada noche."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--metodo',
+            choices=['media', 'exponencial'],
+            default='media',
+            help='Media móvil sobre la ventana o suavizamiento exponencial (default: media)'
+        )
+        parser.add_argument('--hasta', type=str, help='Último día de historia (YYYY-MM-DD). Default: hoy')
+        parser.add_argument('--dias-historia', type=int, default=730, help='Días de historia a cargar (default: 730)')
+        parser.add_argument('--ventana', type=int, default=56, help='Días de la media móvil / desviación (default: 56)')
+        parser.add_argument('--alpha', type=float, default=0.2, help='Factor del suavizamiento exponencial (default: 0.2)')
+        parser.add_argument('--lead-time', type=int, default=7, help='Días de reposición del proveedor (default: 7)')
+        parser.add_argument('--nivel-servicio', type=float, default=0.95, help='Nivel de servicio para el stock de seguridad (default: 0.95)')
+        parser.add_argument('--cobertura', type=int, default=30, help='Días de consumo que cubre el máximo sobre el punto de reorden (default: 30)')
+
+    def handle(self, *args, **options):
+        if not 0 < options['alpha'] <= 1:
+            raise CommandError("--alpha debe estar en (0, 1].")
+        if not 0.5 <= options['nivel_servicio'] < 1:
+            raise CommandError("--nivel-servicio debe estar en [0.5, 1).")
+        if options['dias_historia'] < 2:
+            raise CommandError("--dias-historia debe ser al menos 2.")
+
+        hasta = date.today()
+        if options['hasta']:
+            try:
+                hasta = date.fromisoformat(options['hasta'])
+            except ValueError:
+                raise CommandError("Formato de --hasta inválido. Usa YYYY-MM-DD.")
+
+        metodo = METODO_EXPONENCIAL if options['metodo'] == 'exponencial' else METODO_MEDIA_MOVIL
+        self.stdout.write(self.style.NOTICE(
+            f"Calculando sugerencias ({metodo.lower()}, {options['dias_historia']} días hasta {hasta})..."
+        ))
+
+        inicio = time.perf_counter()
+        escritas = recalcular_sugerencias(
+            hasta=hasta,
+            dias_historia=options['dias_historia'],
+            metodo=metodo,
+            ventana=options['ventana'],
+            alpha=options['alpha'],
+            lead_time=options['lead_time'],
+            nivel_servicio=options['nivel_servicio'],
+            cobertura=options['cobertura'],
+        )
+        segundos = time.perf_counter() - inicio
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {escritas} insumo(s) con sugerencia de stock en {segundos:.2f}s"
+        ))
@@ -1,7 +1,9 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db.models import Sum, DecimalField, F, Q
 from django.db.models.functions import Coalesce
-from inventario.models import Insumo, InsumoLote
+from accounts.models import UsuarioApp
+from inventario.models import Insumo
+from inventario.sobrestock import corregir_sobrestock
 
 
 class Command(BaseCommand):
@@ -11,7 +13,12 @@ class Command(BaseCommand):
         parser.add_argument(
             '--fix',
             action='store_true',
-            help='Intenta corregir el sobrestock eliminando lotes más antiguos'
+            help='Corrige el sobrestock descontando de los lotes más antiguos (FIFO) con salidas de AJUSTE'
+        )
+        parser.add_argument(
+            '--usuario',
+            type=str,
+            help='Email del usuario que figura en las salidas de ajuste (default: primer superusuario)'
         )
 
     def handle(self, *args, **options):
@@ -55,7 +62,7 @@ class Command(BaseCommand):
 
         if options['fix']:
             self.stdout.write(self.style.NOTICE("\n🔧 Intentando corregir el sobrestock...\n"))
-            self._fix_sobrestock(insumos_sobrestock)
+            self._fix_sobrestock(options['usuario'])
         else:
             self.stdout.write(
                 self.style.NOTICE(
@@ -64,51 +71,41 @@ class Command(BaseCommand):
                 )
             )
 
-    def _fix_sobrestock(self, insumos_sobrestock):
+    def _fix_sobrestock(self, email_usuario):
         """
-        Intenta corregir el sobrestock reduciendo la cantidad_actual de lotes antiguos
+        Descuenta el exceso de los lotes más antiguos de cada insumo y registra
+        una Salida de tipo AJUSTE por lote (ver inventario/sobrestock.py).
         """
-        for insumo in insumos_sobrestock:
-            # Calcular exceso
-            exceso = insumo.stock_actual - insumo.stock_maximo
-
-            # Obtener lotes activos, ordenados por fecha_ingreso (más antiguos primero)
-            lotes = InsumoLote.objects.filter(
-                insumo=insumo,
-                is_active=True
-            ).order_by('fecha_ingreso')
-
-            reduccion_realizada = 0
-
-            for lote in lotes:
-                if exceso <= 0:
-                    break
-
-                # Reducir la cantidad_actual del lote
-                reduccion = min(lote.cantidad_actual, exceso)
-                lote.cantidad_actual -= reduccion
-                lote.save(update_fields=['cantidad_actual'])
+        if email_usuario:
+            usuario = UsuarioApp.objects.filter(email=email_usuario).first()
+            if not usuario:
+                raise CommandError(f"No existe el usuario '{email_usuario}'.")
+        else:
+            usuario = UsuarioApp.objects.filter(is_superuser=True).first()
+            if not usuario:
+                raise CommandError("No se encontró un superusuario. Usa --usuario o crea uno con 'createsuperuser'.")
 
-                reduccion_realizada += reduccion
-                exceso -= reduccion
+        aplicadas, omitidas = corregir_sobrestock(usuario)
 
-                self.stdout.write(
-                    f"  ✓ Lote #{lote.id} ({insumo.nombre}): "
-                    f"reducido en {reduccion:.2f} "
-                    f"(nuevo stock: {lote.cantidad_actual:.2f})"
+        for r in aplicadas:
+            self.stdout.write(
+                f"  ✓ Lote #{r['lote_id']} (insumo #{r['insumo_id']}): "
+                f"reducido en {r['reduccion']:.2f} "
+                f"(nuevo stock: {r['cantidad_actual'] - r['reduccion']:.2f})"
+            )
+        for r in omitidas:
+            self.stdout.write(
+                self.style.ERROR(
+                    f"  ✗ Lote #{r['lote_id']} (insumo #{r['insumo_id']}): "
+                    f"sin ubicación en su bodega para registrar el ajuste"
                 )
+            )
 
-            if reduccion_realizada > 0:
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f"\n✓ {insumo.nombre}: "
-                        f"sobrestock corregido en {reduccion_realizada:.2f}\n"
-                    )
-                )
-            else:
-                self.stdout.write(
-                    self.style.ERROR(
-                        f"\n✗ {insumo.nombre}: "
-                        f"no se pudo corregir (insuficiente stock en lotes)\n"
-                    )
-                )
+        total = sum(r['reduccion'] for r in aplicadas)
+        insumos = len({r['insumo_id'] for r in aplicadas})
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"\n✓ Sobrestock corregido en {total:.2f} ({insumos} insumo(s), "
+                f"{len(aplicadas)} salida(s) de AJUSTE registradas)\n"
+            )
+        )
@@ -1,33 +1,111 @@
-from django.core.management.base import BaseCommand
-from django.db import transaction
-from inventario.models import Entrada, Salida, InsumoLote
-from django.db import connection
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from inventario.borrado import borrar_por_rangos
+from inventario.models import (
+    Entrada, Salida, InsumoLote, MovimientoLedger, OrdenInsumo, OrdenInsumoDetalle,
+    StockDiario, SugerenciaStock,
+)
+from inventario.reporte_snapshot import refrescar_snapshot
+from inventario.versiones import incrementar_version
+
+# Orden de borrado: primero las tablas que referencian a las siguientes
+TABLAS = [
+    ("MovimientoLedger", MovimientoLedger),
+    ("Salida", Salida),
+    ("Entrada", Entrada),
+    ("InsumoLote", InsumoLote),
+]
+
+# Motores donde el vaciado completo con sql_flush (DELETE sin WHERE / TRUNCATE) es seguro y rápido
+MOTORES_TRUNCATE = ("sqlite", "mysql")
+
 
 class Command(BaseCommand):
-    help = 'Elimina todos los registros de Entradas, Salidas e InsumoLotes.'
+    help = (
+        'Elimina todos los registros de Entradas, Salidas e InsumoLotes y reinicia el '
+        'estado derivado (ledger, historial de stock, sugerencias, avance de órdenes).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modo',
+            choices=['auto', 'truncar', 'rangos'],
+            default='auto',
+            help=(
+                "truncar: vaciado directo de las tablas (solo SQLite/MySQL); "
+                "rangos: DELETE por rangos de PK sin cargar filas en memoria; "
+                "auto (default): truncar si el motor lo permite, si no rangos"
+            )
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Tamaño del rango de PK borrado por transacción en modo rangos (default: 10000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo muestra cuántas filas se eliminarían'
+        )
+
+    def handle(self, *args, **options):
+        modo = options['modo']
+        if modo == 'auto':
+            modo = 'truncar' if connection.vendor in MOTORES_TRUNCATE else 'rangos'
+        elif modo == 'truncar' and connection.vendor not in MOTORES_TRUNCATE:
+            raise CommandError(f"El modo truncar no está disponible para {connection.vendor}; usa --modo rangos.")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'[dry-run] Modo {modo}. Se eliminarían:'))
+            for nombre, modelo in TABLAS:
+                self.stdout.write(f'   {nombre}: {modelo.objects.count()} fila(s)')
+            return
 
-    def handle(self, *args, **kwargs):
         self.stdout.write(self.style.WARNING('⚠️ Iniciando la ELIMINACIÓN de datos masivos (Entradas, Salidas y Lotes)...'))
 
         try:
-            with transaction.atomic():
-                
-                # 1. Eliminar Salidas
-                count_salidas = Salida.objects.all().count()
-                Salida.objects.all().delete()
-                self.stdout.write(self.style.SUCCESS(f'   ✅ Eliminadas {count_salidas} filas de Salida.'))
-
-                # 2. Eliminar Entradas
-                count_entradas = Entrada.objects.all().count()
-                Entrada.objects.all().delete()
-                self.stdout.write(self.style.SUCCESS(f'   ✅ Eliminadas {count_entradas} filas de Entrada.'))
-
-                # 3. Eliminar InsumoLote (Deben eliminarse después de Entradas/Salidas)
-                count_lotes = InsumoLote.objects.all().count()
-                InsumoLote.objects.all().delete()
-                self.stdout.write(self.style.SUCCESS(f'   ✅ Eliminados {count_lotes} registros de InsumoLote.'))
-
-            self.stdout.write(self.style.SUCCESS('\n🎉 Eliminación completada. Las tablas de movimientos están limpias.'))
-        
+            if modo == 'truncar':
+                self._truncar()
+            else:
+                self._borrar_por_rangos(options['chunk_size'])
+            self._reiniciar_derivados()
         except Exception as e:
-            self.stdout.write(self.style.ERROR(f'❌ Error crítico durante la eliminación: {e}'))
\ No newline at end of file
+            self.stdout.write(self.style.ERROR(f'❌ Error crítico durante la eliminación: {e}'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('\n🎉 Eliminación completada. Las tablas de movimientos están limpias.'))
+        self.stdout.write('   Ejecuta check_stock_alerts para regenerar las alertas de stock.')
+
+    def _truncar(self):
+        conteos = [(nombre, modelo.objects.count()) for nombre, modelo in TABLAS]
+        tablas = [modelo._meta.db_table for _, modelo in TABLAS]
+        sql = connection.ops.sql_flush(no_style(), tablas, reset_sequences=True)
+        connection.ops.execute_sql_flush(sql)
+        for nombre, count in conteos:
+            self.stdout.write(self.style.SUCCESS(f'   ✅ Eliminadas {count} filas de {nombre}.'))
+
+    def _borrar_por_rangos(self, chunk_size):
+        for nombre, modelo in TABLAS:
+            def progreso(borradas, hasta_pk, nombre=nombre):
+                self.stdout.write(f'   {nombre}: {borradas} fila(s) (PK < {hasta_pk})')
+
+            borradas = borrar_por_rangos(modelo.objects.all(), chunk_size=chunk_size, progreso=progreso)
+            self.stdout.write(self.style.SUCCESS(f'   ✅ Eliminadas {borradas} filas de {nombre}.'))
+
+    def _reiniciar_derivados(self):
+        """Sin movimientos ni lotes, todo lo calculado a partir de ellos vuelve a cero."""
+        with transaction.atomic():
+            StockDiario.objects.all()._raw_delete(connection.alias)
+            SugerenciaStock.objects.all()._raw_delete(connection.alias)
+            OrdenInsumoDetalle.objects.exclude(cantidad_atendida=0).update(cantidad_atendida=0)
+            ordenes = OrdenInsumo.objects.filter(estado__in=["EN_CURSO", "CERRADA"]).update(estado="PENDIENTE")
+        refrescar_snapshot()
+        incrementar_version(
+            Entrada, Salida, InsumoLote, MovimientoLedger, OrdenInsumo, OrdenInsumoDetalle,
+            StockDiario, SugerenciaStock,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'   ✅ Estado derivado reiniciado (historial de stock, sugerencias, snapshot y {ordenes} orden(es) a PENDIENTE).'
+        ))
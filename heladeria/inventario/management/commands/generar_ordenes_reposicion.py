@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import UsuarioApp
+from inventario.models import Proveedor
+from inventario.reposicion import generar_ordenes_reposicion
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera órdenes de ENTRADA para todos los insumos bajo su stock mínimo, "
+        "pidiendo hasta el stock máximo menos lo pendiente en órdenes abiertas. "
+        "Crea una orden por proveedor preferido."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario',
+            type=str,
+            help='Email del usuario que figura como creador (default: primer superusuario)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Muestra lo que se pediría sin crear órdenes'
+        )
+
+    def handle(self, *args, **options):
+        if options['usuario']:
+            usuario = UsuarioApp.objects.filter(email=options['usuario']).first()
+            if not usuario:
+                raise CommandError(f"No existe el usuario '{options['usuario']}'.")
+        else:
+            usuario = UsuarioApp.objects.filter(is_superuser=True).first()
+            if not usuario:
+                raise CommandError("No se encontró un superusuario. Usa --usuario o crea uno con 'createsuperuser'.")
+
+        grupos = generar_ordenes_reposicion(usuario, dry_run=options['dry_run'])
+        if not grupos:
+            self.stdout.write(self.style.SUCCESS("✓ No hay insumos bajo el mínimo que requieran reposición."))
+            return
+
+        proveedores = Proveedor.objects.in_bulk([p for p in grupos if p])
+        for proveedor_id, filas in grupos.items():
+            nombre = proveedores[proveedor_id].nombre_empresa if proveedor_id else "Sin proveedor"
+            orden = f" → Orden #{filas[0]['orden_id']}" if not options['dry_run'] else ""
+            self.stdout.write(self.style.NOTICE(f"{nombre}: {len(filas)} insumo(s){orden}"))
+            for f in filas:
+                self.stdout.write(
+                    f"   - {f['nombre']}: pedir {f['a_pedir']} (stock {f['stock']}, pendiente {f['pendiente']})"
+                )
+
+        total = sum(len(f) for f in grupos.values())
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f"Dry-run: se generarían {len(grupos)} orden(es) con {total} línea(s)."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"✓ {len(grupos)} orden(es) de reposición creadas con {total} línea(s)."))
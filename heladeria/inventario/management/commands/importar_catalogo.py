@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from inventario.importacion import ErrorArchivo
+from inventario.importacion_catalogo import COLUMNAS, importar_catalogo, leer_catalogo, validar_catalogo
+
+
+class Command(BaseCommand):
+    help = (
+        "Inserta o actualiza insumos, categorías y unidades de medida desde un CSV o XLSX. "
+        "Columnas: " + ", ".join(COLUMNAS) + ". Los insumos y categorías se identifican por "
+        "nombre (sin distinguir mayúsculas ni espacios extra) y las unidades por código."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', type=str, help='Ruta del archivo .csv o .xlsx')
+        parser.add_argument(
+            '--omitir-errores',
+            action='store_true',
+            help='Importa las filas válidas aunque otras tengan errores'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo valida el archivo y muestra los errores'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                filas, errores, total = validar_catalogo(leer_catalogo(archivo, options['archivo']))
+        except OSError as e:
+            raise CommandError(f"No se pudo abrir el archivo: {e}")
+        except ErrorArchivo as e:
+            raise CommandError(str(e))
+
+        for fila, mensaje in errores:
+            self.stdout.write(self.style.ERROR(f'   Fila {fila}: {mensaje}'))
+        self.stdout.write(
+            f'{total} fila(s) leídas, {len(filas)} válida(s), {len(errores)} con error '
+            f'({time.perf_counter() - inicio:.1f}s)'
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('[dry-run] No se modificó el catálogo.'))
+            return
+        if errores and not options['omitir_errores']:
+            raise CommandError('El archivo tiene errores; corrígelos o usa --omitir-errores.')
+        if not filas:
+            self.stdout.write(self.style.WARNING('No hay insumos para importar.'))
+            return
+
+        inicio = time.perf_counter()
+        resultado = importar_catalogo(filas)
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Insumos: {resultado['insumos_creados']} creado(s), {resultado['insumos_actualizados']} "
+            f"actualizado(s) ({resultado['insumos_reactivados']} reactivado(s)) · {resultado['categorias']} categoría(s) y {resultado['unidades']} unidad(es) "
+            f"sincronizadas en {time.perf_counter() - inicio:.1f}s."
+        ))
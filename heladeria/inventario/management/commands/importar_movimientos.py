@@ -0,0 +1,92 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from accounts.models import UsuarioApp
+from inventario.importacion import (
+    CHUNK_SIZE, COLUMNAS, ErrorArchivo, importar_movimientos, leer_filas, validar_archivo,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa entradas y salidas desde un archivo CSV o XLSX. Columnas: "
+        + ", ".join(COLUMNAS)
+        + ". Valida todo el archivo antes de escribir; con errores no importa nada "
+        "salvo que se indique --omitir-errores."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', type=str, help='Ruta del archivo .csv o .xlsx')
+        parser.add_argument(
+            '--usuario',
+            type=str,
+            help='Email del usuario que registra los movimientos (default: primer superusuario)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Filas por bloque de validación y escritura (default: {CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '--omitir-errores',
+            action='store_true',
+            help='Importa las filas válidas aunque otras tengan errores'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo valida el archivo y muestra los errores'
+        )
+
+    def handle(self, *args, **options):
+        if options['usuario']:
+            usuario = UsuarioApp.objects.filter(email=options['usuario']).first()
+        else:
+            usuario = UsuarioApp.objects.filter(is_superuser=True).first()
+        if not usuario:
+            raise CommandError("No se encontró el usuario. Usa --usuario o crea un superusuario.")
+
+        def progreso_validacion(filas, errores):
+            self.stdout.write(f'   Validadas {filas} fila(s), {errores} con error')
+
+        inicio = time.perf_counter()
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                validos, errores, total = validar_archivo(
+                    leer_filas(archivo, options['archivo']),
+                    chunk_size=options['chunk_size'],
+                    progreso=progreso_validacion,
+                )
+        except OSError as e:
+            raise CommandError(f"No se pudo abrir el archivo: {e}")
+        except ErrorArchivo as e:
+            raise CommandError(str(e))
+
+        for fila, mensaje in errores:
+            self.stdout.write(self.style.ERROR(f'   Fila {fila}: {mensaje}'))
+        self.stdout.write(
+            f'{total} fila(s) leídas, {len(validos)} válida(s), {total - len(validos)} con error '
+            f'({time.perf_counter() - inicio:.1f}s)'
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('[dry-run] No se importó ningún movimiento.'))
+            return
+        if errores and not options['omitir_errores']:
+            raise CommandError('El archivo tiene errores; corrígelos o usa --omitir-errores.')
+        if not validos:
+            self.stdout.write(self.style.WARNING('No hay movimientos para importar.'))
+            return
+
+        def progreso_escritura(escritas):
+            self.stdout.write(f'   Escritas {escritas} fila(s)')
+
+        inicio = time.perf_counter()
+        escritos = importar_movimientos(
+            validos, usuario, chunk_size=options['chunk_size'], progreso=progreso_escritura,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Importadas {escritos['entradas']} entrada(s) y {escritos['salidas']} salida(s) "
+            f"en {time.perf_counter() - inicio:.1f}s."
+        ))
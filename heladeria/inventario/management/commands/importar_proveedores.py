@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from inventario.importacion import ErrorArchivo
+from inventario.importacion_proveedores import (
+    CHUNK_SIZE, COLUMNAS, importar_proveedores, leer_proveedores, validar_proveedores,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Crea o actualiza proveedores desde un CSV o XLSX, identificándolos por RUT. "
+        "Columnas: " + ", ".join(COLUMNAS) + "."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', type=str, help='Ruta del archivo .csv o .xlsx')
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=CHUNK_SIZE,
+            help=f'Filas por consulta de unicidad y por lote de escritura (default: {CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '--desactivar-ausentes',
+            action='store_true',
+            help='Sincroniza: los proveedores activos que no están en el archivo pasan a INACTIVO'
+        )
+        parser.add_argument(
+            '--omitir-errores',
+            action='store_true',
+            help='Importa las filas válidas aunque otras tengan errores'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Solo valida el archivo y muestra los errores'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                filas, errores, total, columnas = validar_proveedores(
+                    leer_proveedores(archivo, options['archivo']), chunk_size=options['chunk_size'],
+                )
+        except OSError as e:
+            raise CommandError(f"No se pudo abrir el archivo: {e}")
+        except ErrorArchivo as e:
+            raise CommandError(str(e))
+
+        for fila, mensaje in errores:
+            self.stdout.write(self.style.ERROR(f'   Fila {fila}: {mensaje}'))
+        self.stdout.write(
+            f'{total} fila(s) leídas, {len(filas)} válida(s), {len(errores)} con error '
+            f'({time.perf_counter() - inicio:.1f}s)'
+        )
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING('[dry-run] No se modificaron proveedores.'))
+            return
+        if errores and not options['omitir_errores']:
+            raise CommandError('El archivo tiene errores; corrígelos o usa --omitir-errores.')
+        if options['desactivar_ausentes'] and errores:
+            # Con filas omitidas, sus proveedores quedarían desactivados por error
+            raise CommandError('--desactivar-ausentes requiere un archivo sin errores.')
+        if not filas:
+            self.stdout.write(self.style.WARNING('No hay proveedores para importar.'))
+            return
+
+        inicio = time.perf_counter()
+        resultado = importar_proveedores(
+            filas, columnas, chunk_size=options['chunk_size'], desactivar_ausentes=options['desactivar_ausentes'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Proveedores: {resultado['creados']} creado(s), {resultado['actualizados']} actualizado(s), "
+            f"{resultado['sin_cambios']} sin cambios"
+            + (f", {resultado['desactivados']} desactivado(s)" if options['desactivar_ausentes'] else "")
+            + f" en {time.perf_counter() - inicio:.1f}s."
+        ))
@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
+from inventario.borrado import borrar_por_rangos
 from inventario.models import AlertaInsumo
+from inventario.versiones import incrementar_version
 
 
 class Command(BaseCommand):
@@ -16,6 +18,12 @@ class Command(BaseCommand):
             type=str,
             help='Elimina solo alertas de un tipo específico (SIN_STOCK, BAJO_STOCK, STOCK_EXCESIVO)'
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Tamaño del rango de PK borrado por transacción (default: 5000)'
+        )
 
     def handle(self, *args, **options):
         queryset = AlertaInsumo.objects.all()
@@ -56,8 +64,9 @@ class Command(BaseCommand):
                 self.stdout.write(self.style.ERROR("Operación cancelada"))
                 return
         
-        # Eliminar
-        eliminadas = queryset.delete()[0]
+        # Eliminar por rangos de PK (sin cargar las alertas en memoria)
+        eliminadas = borrar_por_rangos(queryset, chunk_size=options['chunk_size'])
+        incrementar_version(AlertaInsumo)
         
         self.stdout.write(
             self.style.SUCCESS(
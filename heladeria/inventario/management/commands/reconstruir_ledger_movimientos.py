@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from inventario.ledger import reconstruir_ledger
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruye la tabla movimiento_ledger desde Entrada y Salida. "
+        "Útil después de cargas masivas (bulk_create) que no disparan señales."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Filas por bloque de inserción (default: 2000)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE("Reconstruyendo ledger de movimientos..."))
+
+        def progreso(tipo, filas):
+            self.stdout.write(f"   {tipo}: {filas} fila(s)")
+
+        escritas = reconstruir_ledger(chunk_size=options['chunk_size'], progreso=progreso)
+
+        total = sum(escritas.values())
+        detalle = ", ".join(f"{tipo.lower()}: {n}" for tipo, n in escritas.items())
+        self.stdout.write(self.style.SUCCESS(f"✓ {total} movimiento(s) en movimiento_ledger ({detalle})"))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from inventario.models import Insumo
+from inventario.reporte_snapshot import refrescar_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula la proyección reporte_disponibilidad_snapshot desde los lotes. "
+        "Útil después de cargas masivas (bulk_create) que no disparan señales."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--insumo',
+            type=int,
+            action='append',
+            help='ID de insumo a recalcular (se puede repetir). Por defecto: todos.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Insumos por consulta agregada (default: 500)'
+        )
+
+    def handle(self, *args, **options):
+        insumo_ids = options['insumo']
+        total = len(insumo_ids) if insumo_ids else Insumo.objects.count()
+        self.stdout.write(self.style.NOTICE(f"Recalculando disponibilidad de {total} insumo(s)..."))
+
+        escritas = refrescar_snapshot(insumo_ids, chunk_size=options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"✓ {escritas} fila(s) de reporte_disponibilidad_snapshot actualizadas"))
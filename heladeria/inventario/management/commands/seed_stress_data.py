@@ -19,7 +19,12 @@ from inventario.models import (
     Ubicacion,
     OrdenInsumo,
     OrdenInsumoDetalle,
+    normalizar_nombre,
 )
+from inventario.rut import calcular_dv
+from inventario.versiones import incrementar_version
+from inventario.reporte_snapshot import refrescar_snapshot
+from inventario.ledger import reconstruir_ledger
 from accounts.models import UsuarioApp
 
 
@@ -79,33 +84,6 @@ class Command(BaseCommand):
             help="Cantidad de alertas a crear (default: 10000)",
         )
 
-    # ---------------------------
-    #   RUT helper
-    # ---------------------------
-    def _calcular_dv(self, cuerpo: str) -> str:
-        """
-        Calcula el dígito verificador (DV) para un RUT chileno dado el cuerpo numérico.
-        Misma lógica que usas en el formulario de Proveedor. :contentReference[oaicite:2]{index=2}
-        """
-        reverso = cuerpo[::-1]
-        multiplicador = 2
-        suma = 0
-
-        for digito in reverso:
-            suma += int(digito) * multiplicador
-            multiplicador += 1
-            if multiplicador > 7:
-                multiplicador = 2
-
-        resto = suma % 11
-        dv_int = 11 - resto
-
-        if dv_int == 11:
-            return "0"
-        elif dv_int == 10:
-            return "K"
-        return str(dv_int)
-
     def handle(self, *args, **options):
         num_categorias = options["categorias"]
         num_bodegas = options["bodegas"]
@@ -202,6 +180,14 @@ class Command(BaseCommand):
         # ---------------------------------------------------------
         self._crear_movimientos_stress(num_movs, lotes, usuario)
 
+        # bulk_create no dispara señales: invalidar ETags y recalcular proyecciones
+        incrementar_version(
+            Categoria, Bodega, Ubicacion, Insumo, InsumoLote, OrdenInsumo,
+            OrdenInsumoDetalle, Proveedor, AlertaInsumo, Entrada, Salida,
+        )
+        refrescar_snapshot()
+        reconstruir_ledger()
+
         self.stdout.write(self.style.SUCCESS("=== SEED DE STRESS TERMINADO CON ÉXITO ==="))
 
     # =========================================================
@@ -219,6 +205,7 @@ class Command(BaseCommand):
             nombre = f"Categoría Stress {start_index + i:04d}"
             cat = Categoria(
                 nombre=nombre,
+                clave=normalizar_nombre(nombre),
                 descripcion=f"Categoría generada automáticamente para pruebas de stress #{start_index + i}",
             )
             batch.append(cat)
@@ -320,6 +307,7 @@ class Command(BaseCommand):
 
             insumo = Insumo(
                 nombre=nombre,
+                clave=normalizar_nombre(nombre),
                 categoria=categoria,
                 unidad_medida=unidad,
                 stock_minimo=Decimal(random.randint(5, 50)),
@@ -476,7 +464,7 @@ class Command(BaseCommand):
         for i in range(cantidad):
             idx = start_index + i
             cuerpo = str(76000000 + idx)
-            dv = self._calcular_dv(cuerpo)
+            dv = calcular_dv(cuerpo)
             rut = f"{cuerpo}-{dv}"
 
             prov = Proveedor(
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from inventario import replica
+
+
+class Command(BaseCommand):
+    help = (
+        "Escribe en la primaria el latido de la réplica de lectura (marca de tiempo y "
+        "versiones de datos) y, si la réplica es un archivo SQLite, copia la primaria "
+        "sobre ella. Con una réplica MySQL real la replicación lleva el latido."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--cada',
+            type=int,
+            default=0,
+            help='Repite la sincronización cada N segundos (default: una sola vez)'
+        )
+        parser.add_argument(
+            '--solo-latido',
+            action='store_true',
+            help='Solo escribe el latido, sin copiar el archivo SQLite'
+        )
+
+    def handle(self, *args, **options):
+        if not replica.hay_replica():
+            raise CommandError("No hay base 'replica' configurada (DB_REPLICA_NAME o DB_REPLICA_HOST)")
+        copiar = not options['solo_latido'] and connections[replica.REPLICA].vendor == "sqlite"
+        cada = options['cada']
+
+        while True:
+            inicio = time.monotonic()
+            latido = replica.leer_latido()
+            if latido is None:
+                self.stdout.write(self.style.WARNING("La réplica no tiene latido legible: se lee de la primaria"))
+            else:
+                retraso = (timezone.now() - latido[0]).total_seconds()
+                self.stdout.write(f"   Retraso de la réplica: {retraso:.1f} s")
+
+            replica.escribir_latido()
+            if copiar:
+                replica.copiar_a_replica_sqlite()
+            duracion = time.monotonic() - inicio
+            accion = "Latido escrito y réplica SQLite copiada" if copiar else "Latido escrito"
+            self.stdout.write(self.style.SUCCESS(f"✓ {accion} ({duracion * 1000:.0f} ms)"))
+
+            if not cada:
+                break
+            time.sleep(max(cada - duracion, 0))
@@ -0,0 +1,357 @@
+"""
+Métricas de la aplicación en formato de texto de Prometheus (GET /metrics).
+
+Registro en memoria del proceso con contadores e histogramas:
+- latencia de peticiones por nombre de URL (MetricasMiddleware),
+- consultas a la base y su tiempo por vista (envoltorio de ejecución instalado
+  en cada conexión; lo de fuera de una petición queda como "fuera_de_peticion"),
+- aciertos y fallos de cache por familia de claves (fragmento, data_version,
+  referencias, alertas_config, etag),
+- duración de exportaciones (@medir_exportacion) y de evaluaciones de alertas
+  (@medir_evaluacion_alertas: stock, stock_masivo, vencimiento).
+
+Con varios procesos (gunicorn, uvicorn --workers) cada uno tiene su propio
+registro: si METRICAS_DIR está configurado, cada proceso vuelca el suyo a
+`<METRICAS_DIR>/<pid>.json` (a lo sumo cada METRICAS_ESCRITURA_SEGUNDOS y al
+salir) y /metrics suma los archivos de todos. Los archivos de procesos que ya
+terminaron se conservan para que los contadores no retrocedan; el directorio
+se vacía al desplegar.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+FUERA_DE_PETICION = "fuera_de_peticion"
+SIN_RUTA = "sin_ruta"
+
+BUCKETS_PETICION = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+BUCKETS_PROCESO = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+# nombre: (tipo, ayuda, etiquetas, buckets)
+METRICAS = {
+    "heladeria_peticiones_total": (
+        "counter", "Peticiones HTTP atendidas.", ("vista", "metodo", "estado"), None),
+    "heladeria_peticion_segundos": (
+        "histogram", "Latencia de las peticiones HTTP por nombre de URL.", ("vista", "metodo"), BUCKETS_PETICION),
+    "heladeria_db_consultas_total": (
+        "counter", "Consultas SQL ejecutadas.", ("vista",), None),
+    "heladeria_db_segundos_total": (
+        "counter", "Tiempo total en consultas SQL.", ("vista",), None),
+    "heladeria_db_consultas_por_peticion": (
+        "histogram", "Consultas SQL por petición.", ("vista",), BUCKETS_CONSULTAS),
+    "heladeria_cache_total": (
+        "counter", "Lecturas de cache por familia de claves.", ("familia", "resultado"), None),
+    "heladeria_exportacion_segundos": (
+        "histogram", "Duración de las exportaciones, hasta el último byte enviado.", ("exportacion",), BUCKETS_PROCESO),
+    "heladeria_evaluacion_alertas_segundos": (
+        "histogram", "Duración de las evaluaciones de alertas.", ("evaluacion",), BUCKETS_PROCESO),
+}
+
+
+class Registro:
+    """
+    Valores de un proceso: {(métrica, etiquetas): valor} para contadores y
+    {(métrica, etiquetas): [conteos por bucket..., +Inf, suma]} para histogramas
+    (conteos no acumulados; se acumulan al exportar).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.contadores = {}
+        self.histogramas = {}
+
+    def sumar(self, nombre, etiquetas, valor=1):
+        clave = (nombre, tuple(etiquetas))
+        with self._lock:
+            self.contadores[clave] = self.contadores.get(clave, 0) + valor
+
+    def observar(self, nombre, etiquetas, valor):
+        buckets = METRICAS[nombre][3]
+        clave = (nombre, tuple(etiquetas))
+        indice = next((i for i, limite in enumerate(buckets) if valor <= limite), len(buckets))
+        with self._lock:
+            serie = self.histogramas.get(clave)
+            if serie is None:
+                serie = self.histogramas[clave] = [0] * (len(buckets) + 2)
+            serie[indice] += 1
+            serie[-1] += valor
+
+    def volcar(self):
+        """Copia serializable en JSON."""
+        with self._lock:
+            return {
+                "contadores": [[n, list(e), v] for (n, e), v in self.contadores.items()],
+                "histogramas": [[n, list(e), list(s)] for (n, e), s in self.histogramas.items()],
+            }
+
+    def combinar(self, volcado):
+        """Suma un volcado de otro proceso (los histogramas deben tener los mismos buckets)."""
+        for nombre, etiquetas, valor in volcado.get("contadores", ()):
+            if nombre in METRICAS:
+                self.sumar(nombre, etiquetas, valor)
+        with self._lock:
+            for nombre, etiquetas, serie in volcado.get("histogramas", ()):
+                if nombre not in METRICAS or len(serie) != len(METRICAS[nombre][3]) + 2:
+                    continue
+                clave = (nombre, tuple(etiquetas))
+                actual = self.histogramas.get(clave)
+                self.histogramas[clave] = list(serie) if actual is None else [a + b for a, b in zip(actual, serie)]
+
+
+registro = Registro()
+
+
+# --- Registro de eventos ---
+
+def contar_cache(familia, acierto, cantidad=1):
+    """Suma `cantidad` aciertos (acierto=True) o fallos de cache para una familia de claves."""
+    if cantidad:
+        registro.sumar("heladeria_cache_total", (familia, "hit" if acierto else "miss"), cantidad)
+
+
+def _medir_duracion(metrica, etiqueta):
+    def decorator(func):
+        @wraps(func)
+        def _wrapped(*args, **kwargs):
+            inicio = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registro.observar(metrica, (etiqueta,), time.perf_counter() - inicio)
+        return _wrapped
+    return decorator
+
+
+def medir_evaluacion_alertas(nombre):
+    """Decorador: registra cuánto tarda cada evaluación de alertas `nombre`."""
+    return _medir_duracion("heladeria_evaluacion_alertas_segundos", nombre)
+
+
+# --- Consultas a la base ---
+
+class _Consultas:
+    __slots__ = ("cantidad", "segundos")
+
+    def __init__(self):
+        self.cantidad = 0
+        self.segundos = 0.0
+
+
+# Consultas de la petición (o del streaming) en curso; None fuera de una petición
+_consultas = ContextVar("metricas_consultas", default=None)
+
+
+def _envoltorio_consultas(execute, sql, params, many, context):
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duracion = time.perf_counter() - inicio
+        actual = _consultas.get()
+        if actual is None:
+            registro.sumar("heladeria_db_consultas_total", (FUERA_DE_PETICION,))
+            registro.sumar("heladeria_db_segundos_total", (FUERA_DE_PETICION,), duracion)
+        else:
+            actual.cantidad += 1
+            actual.segundos += duracion
+
+
+@receiver(connection_created)
+def _instalar_envoltorio(sender, connection, **kwargs):
+    if _envoltorio_consultas not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_envoltorio_consultas)
+
+
+@contextmanager
+def _contando_consultas(consultas):
+    token = _consultas.set(consultas)
+    try:
+        yield consultas
+    finally:
+        _consultas.reset(token)
+
+
+def _registrar_consultas(vista, consultas, por_peticion=True):
+    registro.sumar("heladeria_db_consultas_total", (vista,), consultas.cantidad)
+    registro.sumar("heladeria_db_segundos_total", (vista,), consultas.segundos)
+    if por_peticion:
+        registro.observar("heladeria_db_consultas_por_peticion", (vista,), consultas.cantidad)
+
+
+# --- Peticiones ---
+
+def nombre_vista(request):
+    """Nombre de la URL con su namespace (ej. inventario:listar_insumos) o "sin_ruta"."""
+    match = getattr(request, "resolver_match", None)
+    return (match.view_name if match is not None else None) or SIN_RUTA
+
+
+@contextmanager
+def midiendo_peticion(request):
+    """Mide la petición y sus consultas; el resultado se registra con el nombre de URL ya resuelto."""
+    inicio = time.perf_counter()
+    resultado = {}
+    consultas = _Consultas()
+    try:
+        with _contando_consultas(consultas):
+            yield resultado
+    finally:
+        vista = nombre_vista(request)
+        response = resultado.get("response")
+        estado = f"{response.status_code // 100}xx" if response is not None else "5xx"
+        registro.observar("heladeria_peticion_segundos", (vista, request.method), time.perf_counter() - inicio)
+        registro.sumar("heladeria_peticiones_total", (vista, request.method, estado))
+        _registrar_consultas(vista, consultas)
+        volcar_si_corresponde()
+
+
+def _iterar_midiendo(contenido, exportacion, vista, inicio):
+    """Contenido en streaming: la exportación termina cuando se envía la última parte."""
+    consultas = _Consultas()
+    iterador = iter(contenido)
+    try:
+        while True:
+            with _contando_consultas(consultas):
+                try:
+                    parte = next(iterador)
+                except StopIteration:
+                    return
+            yield parte
+    finally:
+        registro.observar("heladeria_exportacion_segundos", (exportacion,), time.perf_counter() - inicio)
+        _registrar_consultas(vista, consultas, por_peticion=False)
+        volcar_si_corresponde()
+
+
+def medir_exportacion(nombre):
+    """
+    Decorador para vistas de exportación: registra la duración hasta el último
+    byte. En respuestas en streaming también cuenta las consultas hechas al
+    generar el contenido. Ubicarlo justo encima de la función.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            inicio = time.perf_counter()
+            response = view_func(request, *args, **kwargs)
+            if response.streaming:
+                response.streaming_content = _iterar_midiendo(
+                    response.streaming_content, nombre, nombre_vista(request), inicio
+                )
+            else:
+                registro.observar("heladeria_exportacion_segundos", (nombre,), time.perf_counter() - inicio)
+            return response
+        return _wrapped
+    return decorator
+
+
+# --- Varios procesos ---
+
+_ultimo_volcado = 0.0
+
+
+def _archivo_proceso():
+    return Path(settings.METRICAS_DIR) / f"{os.getpid()}.json"
+
+
+def volcar():
+    """Escribe el registro de este proceso en METRICAS_DIR (reemplazo atómico)."""
+    global _ultimo_volcado
+    if not settings.METRICAS_DIR:
+        return
+    _ultimo_volcado = time.monotonic()
+    archivo = _archivo_proceso()
+    temporal = archivo.with_suffix(".tmp")
+    try:
+        archivo.parent.mkdir(parents=True, exist_ok=True)
+        temporal.write_text(json.dumps(registro.volcar()), encoding="utf-8")
+        os.replace(temporal, archivo)
+    except OSError as exc:
+        logger.warning("No se pudieron volcar las métricas en %s: %s", archivo, exc)
+
+
+def volcar_si_corresponde():
+    if settings.METRICAS_DIR and time.monotonic() - _ultimo_volcado >= settings.METRICAS_ESCRITURA_SEGUNDOS:
+        volcar()
+
+
+atexit.register(volcar)
+
+
+def registro_combinado():
+    """Este proceso más los volcados de los demás procesos en METRICAS_DIR."""
+    if not settings.METRICAS_DIR:
+        return registro
+    combinado = Registro()
+    combinado.combinar(registro.volcar())
+    propio = _archivo_proceso()
+    for archivo in sorted(Path(settings.METRICAS_DIR).glob("*.json")):
+        if archivo == propio:
+            continue
+        try:
+            combinado.combinar(json.loads(archivo.read_text(encoding="utf-8")))
+        except (OSError, ValueError) as exc:
+            logger.warning("Volcado de métricas ilegible %s: %s", archivo, exc)
+    return combinado
+
+
+# --- Formato de texto de Prometheus ---
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _etiquetas(nombres, valores, extra=()):
+    pares = [*zip(nombres, valores), *extra]
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{n}="{_escapar(v)}"' for n, v in pares) + "}"
+
+
+def _numero(valor):
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exportar_texto(reg=None):
+    """Todas las métricas en formato de texto de Prometheus (versión 0.0.4)."""
+    reg = registro_combinado() if reg is None else reg
+    with reg._lock:
+        contadores = dict(reg.contadores)
+        histogramas = {clave: list(serie) for clave, serie in reg.histogramas.items()}
+
+    lineas = []
+    for nombre, (tipo, ayuda, etiquetas, buckets) in METRICAS.items():
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        if tipo == "counter":
+            for (n, valores), valor in sorted(contadores.items()):
+                if n == nombre:
+                    lineas.append(f"{nombre}{_etiquetas(etiquetas, valores)} {_numero(valor)}")
+            continue
+        for (n, valores), serie in sorted(histogramas.items()):
+            if n != nombre:
+                continue
+            acumulado = 0
+            for limite, conteo in zip((*buckets, float("inf")), serie):
+                acumulado += conteo
+                le = (("le", _numero(float(limite))),)
+                lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas, valores, le)} {acumulado}")
+            lineas.append(f"{nombre}_sum{_etiquetas(etiquetas, valores)} {_numero(float(serie[-1]))}")
+            lineas.append(f"{nombre}_count{_etiquetas(etiquetas, valores)} {acumulado}")
+    return "\n".join(lineas) + "\n"
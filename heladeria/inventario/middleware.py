@@ -0,0 +1,83 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metricas, replica
+from .versiones import memo_por_peticion
+
+
+class VersionesPorPeticionMiddleware:
+    """
+    Abre un memo de versiones de datos por petición: los catálogos de referencia
+    (referencias.py) consultan el cache compartido a lo sumo una vez por modelo.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with memo_por_peticion():
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with memo_por_peticion():
+            return await self.get_response(request)
+
+
+class LecturaReplicaMiddleware:
+    """
+    Estado de réplica por petición (ver replica.py): después de una escritura el
+    resto de la petición, y las siguientes por unos segundos, leen de la primaria.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with replica.estado_peticion(request) as estado:
+            response = self.get_response(request)
+        return replica.marcar_pegado(response, estado)
+
+    async def __acall__(self, request):
+        with replica.estado_peticion(request) as estado:
+            response = await self.get_response(request)
+        return replica.marcar_pegado(response, estado)
+
+
+class MetricasMiddleware:
+    """
+    Latencia, estado y consultas SQL de cada petición por nombre de URL (ver
+    metricas.py). Va primero en MIDDLEWARE para medir también a los demás.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        with metricas.midiendo_peticion(request) as resultado:
+            resultado["response"] = self.get_response(request)
+        return resultado["response"]
+
+    async def __acall__(self, request):
+        with metricas.midiendo_peticion(request) as resultado:
+            resultado["response"] = await self.get_response(request)
+        return resultado["response"]
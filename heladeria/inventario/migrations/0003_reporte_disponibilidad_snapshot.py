@@ -0,0 +1,76 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:42
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, Min, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def poblar_snapshot(apps, schema_editor):
+    """Carga inicial de la proyección (misma agregación que usaba el reporte)."""
+    Insumo = apps.get_model('inventario', 'Insumo')
+    Snapshot = apps.get_model('inventario', 'ReporteDisponibilidadSnapshot')
+    dec = DecimalField(max_digits=12, decimal_places=2)
+    qs = (
+        Insumo.objects.select_related('categoria', 'unidad_medida')
+        .annotate(
+            stock_total=Coalesce(Sum('lotes__cantidad_actual', filter=Q(lotes__is_active=True), output_field=dec), 0, output_field=dec),
+            lotes_con_stock=Count('lotes', filter=Q(lotes__is_active=True, lotes__cantidad_actual__gt=0), distinct=True),
+            prox_vencimiento=Min('lotes__fecha_expiracion', filter=Q(lotes__is_active=True, lotes__cantidad_actual__gt=0)),
+        )
+        .order_by('pk')
+    )
+    batch = []
+    for ins in qs.iterator(chunk_size=1000):
+        stock_total = ins.stock_total or Decimal('0')
+        batch.append(Snapshot(
+            insumo_id=ins.pk,
+            nombre=ins.nombre,
+            categoria_id=ins.categoria_id,
+            categoria_nombre=ins.categoria.nombre,
+            unidad=f"{ins.unidad_medida.nombre_largo} ({ins.unidad_medida.nombre_corto})",
+            precio_unitario=ins.precio_unitario or 0,
+            stock_total=stock_total,
+            lotes_con_stock=ins.lotes_con_stock or 0,
+            prox_vencimiento=ins.prox_vencimiento,
+            valor=stock_total * (ins.precio_unitario or 0),
+            visible=ins.is_active and ins.categoria.is_active,
+        ))
+        if len(batch) >= 1000:
+            Snapshot.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Snapshot.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0002_alter_entrada_options_alter_ordeninsumo_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReporteDisponibilidadSnapshot',
+            fields=[
+                ('insumo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='snapshot_disponibilidad', serialize=False, to='inventario.insumo')),
+                ('nombre', models.CharField(max_length=35)),
+                ('categoria_nombre', models.CharField(max_length=40)),
+                ('unidad', models.CharField(max_length=60)),
+                ('precio_unitario', models.IntegerField(default=0)),
+                ('stock_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12)),
+                ('lotes_con_stock', models.PositiveIntegerField(default=0)),
+                ('prox_vencimiento', models.DateField(blank=True, null=True)),
+                ('valor', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('visible', models.BooleanField(default=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('categoria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventario.categoria')),
+            ],
+            options={
+                'db_table': 'reporte_disponibilidad_snapshot',
+                'indexes': [models.Index(fields=['visible', 'nombre'], name='reporte_dis_visible_aff757_idx'), models.Index(fields=['visible', 'categoria_nombre', 'nombre'], name='reporte_dis_visible_150678_idx')],
+            },
+        ),
+        migrations.RunPython(poblar_snapshot, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:44
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0003_reporte_disponibilidad_snapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('valor', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('calculado_en', models.DateTimeField(auto_now=True)),
+                ('bodega', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_diario', to='inventario.bodega')),
+                ('insumo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_diario', to='inventario.insumo')),
+            ],
+            options={
+                'ordering': ['insumo', 'bodega', 'fecha'],
+                'indexes': [models.Index(fields=['fecha'], name='inventario__fecha_031e44_idx'), models.Index(fields=['insumo', 'fecha'], name='inventario__insumo__527131_idx')],
+                'constraints': [models.UniqueConstraint(fields=('insumo', 'bodega', 'fecha'), name='stock_diario_unico_por_dia')],
+            },
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def poblar_ledger(apps, schema_editor):
+    """Carga inicial del ledger desde Entrada (+) y Salida (-)."""
+    Ledger = apps.get_model('inventario', 'MovimientoLedger')
+    origenes = (
+        (apps.get_model('inventario', 'Entrada'), 'ENTRADA', 'fecha', 1),
+        (apps.get_model('inventario', 'Salida'), 'SALIDA', 'fecha_generada', -1),
+    )
+    for modelo, tipo, campo_fecha, signo in origenes:
+        filas = (
+            modelo.objects.order_by()
+            .annotate(bodega_mov=Coalesce('insumo_lote__bodega_id', 'ubicacion__bodega_id'))
+            .values_list(
+                'id', campo_fecha, 'tipo', 'insumo_id', 'insumo_lote_id', 'ubicacion_id', 'bodega_mov',
+                'cantidad', 'usuario_id', 'orden_id', 'observaciones', 'is_active',
+            )
+        )
+        batch = []
+        for (pk, fecha, subtipo, insumo_id, lote_id, ubicacion_id, bodega_id,
+             cantidad, usuario_id, orden_id, observaciones, is_active) in filas.iterator(chunk_size=2000):
+            batch.append(Ledger(
+                tipo=tipo, origen_id=pk, subtipo=subtipo or '', fecha=fecha,
+                insumo_id=insumo_id, insumo_lote_id=lote_id, ubicacion_id=ubicacion_id, bodega_id=bodega_id,
+                cantidad=cantidad * signo, usuario_id=usuario_id, orden_id=orden_id,
+                observaciones=observaciones or '', is_active=is_active,
+            ))
+            if len(batch) >= 2000:
+                Ledger.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            Ledger.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0004_stock_diario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('ENTRADA', 'Entrada'), ('SALIDA', 'Salida')], max_length=10)),
+                ('origen_id', models.PositiveBigIntegerField()),
+                ('subtipo', models.CharField(max_length=50)),
+                ('fecha', models.DateField()),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('observaciones', models.TextField(blank=True, default='')),
+                ('is_active', models.BooleanField(default=True)),
+                ('bodega', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventario.bodega')),
+                ('insumo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimientos_ledger', to='inventario.insumo')),
+                ('insumo_lote', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventario.insumolote')),
+                ('orden', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='inventario.ordeninsumo')),
+                ('ubicacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='inventario.ubicacion')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'movimiento_ledger',
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['fecha', 'id'], name='movimiento__fecha_63d732_idx'), models.Index(fields=['insumo', 'fecha', 'id'], name='movimiento__insumo__9ff19e_idx'), models.Index(fields=['insumo_lote', 'fecha', 'id'], name='movimiento__insumo__7e16a8_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'origen_id'), name='movimiento_ledger_origen_unico')],
+            },
+        ),
+        migrations.RunPython(poblar_ledger, migrations.RunPython.noop),
+    ]
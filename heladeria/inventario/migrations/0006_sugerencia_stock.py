@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0005_movimiento_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SugerenciaStock',
+            fields=[
+                ('insumo', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sugerencia_stock', serialize=False, to='inventario.insumo')),
+                ('metodo', models.CharField(choices=[('MEDIA_MOVIL', 'Media móvil'), ('EXPONENCIAL', 'Suavizamiento exponencial')], max_length=15)),
+                ('consumo_diario', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('desviacion_diaria', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('stock_seguridad', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('punto_reorden', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('minimo_sugerido', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('maximo_sugerido', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('dias_con_consumo', models.PositiveIntegerField(default=0)),
+                ('calculado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'sugerencia_stock',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0006_sugerencia_stock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordeninsumo',
+            name='proveedor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ordenes', to='inventario.proveedor'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-19 17:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0007_orden_insumo_proveedor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckpointProceso',
+            fields=[
+                ('nombre', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('ultimo_pk', models.BigIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'checkpoint_proceso',
+            },
+        ),
+        migrations.CreateModel(
+            name='AlertaArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('SIN_STOCK', 'Sin Stock (Stock = 0)'), ('BAJO_STOCK', 'Stock Bajo (Stock < Mínimo)'), ('STOCK_EXCESIVO', 'Stock Excesivo (Stock > Máximo)'), ('VENCIMIENTO_PROXIMO', 'Próximo a Vencer')], max_length=50)),
+                ('mensaje', models.TextField()),
+                ('fecha', models.DateField()),
+                ('creada_en', models.DateTimeField()),
+                ('resuelta_en', models.DateTimeField()),
+                ('archivada_en', models.DateTimeField(auto_now_add=True)),
+                ('insumo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas_archivadas', to='inventario.insumo')),
+            ],
+            options={
+                'db_table': 'alerta_archivada',
+                'ordering': ['-fecha', '-id'],
+                'indexes': [models.Index(fields=['insumo', 'fecha'], name='alerta_arch_insumo__a7b48b_idx')],
+            },
+        ),
+    ]
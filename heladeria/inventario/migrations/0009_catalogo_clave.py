@@ -0,0 +1,48 @@
+from django.db import migrations, models
+
+
+def poblar_claves(apps, schema_editor):
+    """Asigna la clave normalizada; si hay nombres repetidos solo el más antiguo la recibe."""
+    for nombre_modelo in ("Categoria", "Insumo"):
+        modelo = apps.get_model("inventario", nombre_modelo)
+        vistas = set()
+        pendientes = []
+        for obj in modelo.objects.order_by("id").only("id", "nombre").iterator(chunk_size=2000):
+            clave = " ".join(str(obj.nombre or "").split()).casefold()
+            if clave in vistas:
+                continue
+            vistas.add(clave)
+            obj.clave = clave
+            pendientes.append(obj)
+        modelo.objects.bulk_update(pendientes, ["clave"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0008_alerta_archivada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='clave',
+            field=models.CharField(editable=False, max_length=60, null=True),
+        ),
+        migrations.AddField(
+            model_name='insumo',
+            name='clave',
+            field=models.CharField(editable=False, max_length=60, null=True),
+        ),
+        migrations.RunPython(poblar_claves, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='categoria',
+            name='clave',
+            field=models.CharField(editable=False, max_length=60, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='insumo',
+            name='clave',
+            field=models.CharField(editable=False, max_length=60, null=True, unique=True),
+        ),
+    ]
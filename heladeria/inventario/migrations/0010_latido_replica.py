@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0009_catalogo_clave'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LatidoReplica',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('marca', models.DateTimeField()),
+                ('versiones', models.JSONField(default=dict)),
+            ],
+            options={
+                'db_table': 'latido_replica',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-19 18:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0010_latido_replica'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alertainsumo',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['fecha'], name='alerta_activa_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='insumo',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['created_at'], name='insumo_activo_creado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='insumolote',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['insumo', 'fecha_expiracion'], name='lote_activo_fefo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordeninsumo',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['fecha'], name='orden_activa_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordeninsumo',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['estado', 'fecha'], name='orden_activa_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reportedisponibilidadsnapshot',
+            index=models.Index(condition=models.Q(('visible', True)), fields=['nombre'], name='reporte_visible_nombre_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+
+def _normalizar(nombre):
+    # Copia de models.normalizar_nombre (las migraciones no importan código de la app)
+    return " ".join(str(nombre or "").split()).casefold()
+
+
+def renombrar_repetidos(apps, schema_editor):
+    """
+    0009 dejó clave=NULL en los nombres repetidos (solo el más antiguo recibió la clave),
+    y como save() recalcula la clave, editarlos fallaba con IntegrityError. Se les agrega
+    un sufijo " (2)", " (3)"... hasta que el nombre sea único y se les asigna la clave.
+    """
+    for nombre_modelo in ("Categoria", "Insumo"):
+        modelo = apps.get_model("inventario", nombre_modelo)
+        largo_maximo = modelo._meta.get_field("nombre").max_length
+        pendientes = list(modelo.objects.filter(clave__isnull=True).order_by("id").only("id", "nombre"))
+        if not pendientes:
+            continue
+        usadas = set(modelo.objects.filter(clave__isnull=False).values_list("clave", flat=True))
+        for obj in pendientes:
+            base = " ".join(str(obj.nombre or "").split())
+            nombre, n = base, 1
+            while _normalizar(nombre) in usadas:
+                n += 1
+                sufijo = f" ({n})"
+                nombre = base[:largo_maximo - len(sufijo)].rstrip() + sufijo
+            obj.nombre = nombre
+            obj.clave = _normalizar(nombre)
+            usadas.add(obj.clave)
+        modelo.objects.bulk_update(pendientes, ["nombre", "clave"], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0011_indices_parciales_activos'),
+    ]
+
+    operations = [
+        migrations.RunPython(renombrar_repetidos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 19:05
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventario', '0012_claves_nombres_repetidos'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='proveedor',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='proveedor_email_lower_idx'),
+        ),
+    ]
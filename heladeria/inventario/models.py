@@ -1,6 +1,7 @@
 from decimal import Decimal
 from django.db import models
-from django.db.models import Sum
+from django.db.models import Q, Sum
+from django.db.models.functions import Lower
 from accounts.models import BaseModel, UsuarioApp
 from django.core.validators import MinValueValidator
 from django.core.exceptions import ValidationError
@@ -34,8 +35,26 @@ TIPO_ALERTA_CHOICES = [
 
 # --- MODELOS DE CATÁLOGO Y ESTRUCTURA ---
 
-class Categoria(BaseModel):
+def normalizar_nombre(nombre):
+    """Clave de unicidad de un nombre de catálogo: sin espacios sobrantes y sin distinguir mayúsculas."""
+    return " ".join(str(nombre or "").split()).casefold()
+
+
+class ClaveNombreMixin:
+    """Mantiene `clave` (nombre normalizado, único) sincronizada con `nombre` en cada save()."""
+
+    def save(self, *args, **kwargs):
+        self.clave = normalizar_nombre(self.nombre)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "nombre" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "clave"}
+        super().save(*args, **kwargs)
+
+
+class Categoria(ClaveNombreMixin, BaseModel):
     nombre = models.CharField(max_length=40)
+    # bulk_create no pasa por save(): quien cree en lote debe asignar clave=normalizar_nombre(nombre)
+    clave = models.CharField(max_length=60, unique=True, null=True, editable=False)
     descripcion = models.TextField(blank=True, null=True)
     def __str__(self):
         return self.nombre
@@ -64,9 +83,10 @@ class UnidadMedida(BaseModel):
         # Aseguramos que el __str__ devuelva el formato que usará el AJAX
         return f"{self.nombre_largo} ({self.nombre_corto})"
 
-class Insumo(BaseModel):
+class Insumo(ClaveNombreMixin, BaseModel):
     categoria = models.ForeignKey(Categoria, on_delete=models.PROTECT, related_name="insumos")
     nombre = models.CharField(max_length=35, db_index=True)  # Índice para búsquedas rápidas
+    clave = models.CharField(max_length=60, unique=True, null=True, editable=False)  # normalizar_nombre(nombre)
     stock_minimo = models.DecimalField(max_digits=10, decimal_places=2)
     stock_maximo = models.DecimalField(max_digits=10, decimal_places=2)
     unidad_medida = models.ForeignKey(UnidadMedida, on_delete=models.PROTECT, related_name="insumos_medidos") 
@@ -77,6 +97,9 @@ class Insumo(BaseModel):
         indexes = [
             models.Index(fields=['nombre', 'categoria']),  # Índice compuesto para filtros frecuentes
             models.Index(fields=['is_active', 'nombre']),  # Para listar insumos activos
+            # Parciales: en SQLite `is_active=True` se compila como `WHERE "is_active"` y no usa
+            # los compuestos que empiezan por is_active (ver `manage.py analizar_indices`)
+            models.Index(fields=['created_at'], condition=Q(is_active=True), name='insumo_activo_creado_idx'),  # Recientes del dashboard
         ]
 
     def __str__(self):
@@ -143,6 +166,10 @@ class Proveedor(BaseModel):
         verbose_name = "Proveedor"
         verbose_name_plural = "Proveedores"
         ordering = ["nombre_empresa"]
+        indexes = [
+            # Búsqueda de emails sin distinguir mayúsculas (importación de proveedores)
+            models.Index(Lower("email"), name="proveedor_email_lower_idx"),
+        ]
 
     def __str__(self):
         return f"{self.nombre_empresa} ({self.rut_empresa})"
@@ -186,6 +213,7 @@ class InsumoLote(BaseModel):
             models.Index(fields=['insumo', 'is_active', 'cantidad_actual']),  # Para listar lotes activos con stock
             models.Index(fields=['fecha_expiracion', 'is_active']),  # Para alertas de vencimiento
             models.Index(fields=['bodega', 'insumo']),  # Para buscar por bodega e insumo
+            models.Index(fields=['insumo', 'fecha_expiracion'], condition=Q(is_active=True), name='lote_activo_fefo_idx'),  # Lotes por insumo en orden FEFO
         ]
 
     def __str__(self):
@@ -205,6 +233,14 @@ class OrdenInsumo(BaseModel):
         default="ENTRADA",
         verbose_name="Tipo de Orden"
     )
+    # Proveedor al que se dirige la orden (lo completan las órdenes de reposición automática)
+    proveedor = models.ForeignKey(
+        Proveedor,
+        on_delete=models.SET_NULL,
+        related_name="ordenes",
+        null=True,
+        blank=True,
+    )
 
     class Meta:
         ordering = ['-fecha', '-id']
@@ -212,6 +248,8 @@ class OrdenInsumo(BaseModel):
             models.Index(fields=['estado', 'is_active']),  # Para filtros por estado
             models.Index(fields=['fecha', 'is_active']),  # Para ordenar por fecha
             models.Index(fields=['is_active', 'estado', 'fecha']),  # Índice compuesto para queries comunes
+            models.Index(fields=['fecha'], condition=Q(is_active=True), name='orden_activa_fecha_idx'),  # Listado de órdenes activas
+            models.Index(fields=['estado', 'fecha'], condition=Q(is_active=True), name='orden_activa_estado_idx'),  # Órdenes activas por estado
         ]
 
     def __str__(self):
@@ -290,6 +328,53 @@ class Salida(BaseModel):
         return f"Salida {self.cantidad} de {self.insumo.nombre}"
 
 
+class MovimientoLedger(models.Model):
+    """
+    Libro único de movimientos: una fila por Entrada (+) o Salida (-), con la
+    cantidad con signo y la bodega ya resuelta. Se escribe junto a cada
+    movimiento desde las señales (ver ledger.py), así los listados combinados,
+    el kardex y las exportaciones leen una sola tabla ordenada por (fecha, id)
+    en lugar de unir Entrada y Salida.
+    """
+    TIPO_CHOICES = [
+        ("ENTRADA", "Entrada"),
+        ("SALIDA", "Salida"),
+    ]
+
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    origen_id = models.PositiveBigIntegerField()  # id de la Entrada o Salida
+    subtipo = models.CharField(max_length=50)  # COMPRA, VENTA, MERMA, ...
+    fecha = models.DateField()
+    insumo = models.ForeignKey(Insumo, on_delete=models.CASCADE, related_name="movimientos_ledger")
+    insumo_lote = models.ForeignKey(InsumoLote, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    ubicacion = models.ForeignKey(Ubicacion, on_delete=models.CASCADE, related_name="+")
+    bodega = models.ForeignKey(Bodega, on_delete=models.CASCADE, related_name="+")
+    cantidad = models.DecimalField(max_digits=12, decimal_places=2)  # positiva en entradas, negativa en salidas
+    usuario = models.ForeignKey(UsuarioApp, on_delete=models.CASCADE, related_name="+")
+    orden = models.ForeignKey(OrdenInsumo, null=True, blank=True, on_delete=models.SET_NULL, related_name="+")
+    observaciones = models.TextField(blank=True, default="")
+    is_active = models.BooleanField(default=True)
+
+    class Meta:
+        db_table = "movimiento_ledger"
+        ordering = ['-fecha', '-id']
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'origen_id'], name='movimiento_ledger_origen_unico'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha', 'id']),  # Línea de tiempo combinada
+            models.Index(fields=['insumo', 'fecha', 'id']),  # Kardex y listados por insumo
+            models.Index(fields=['insumo_lote', 'fecha', 'id']),  # Kardex por lote
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.origen_id} {self.cantidad} de insumo {self.insumo_id}"
+
+    @property
+    def cantidad_absoluta(self):
+        return abs(self.cantidad)
+
+
 # --- ALERTAS DE STOCK ---
 
 
@@ -309,4 +394,156 @@ class AlertaInsumo(BaseModel):
         indexes = [
             models.Index(fields=['insumo', 'is_active', 'tipo']),  # Para filtrar alertas activas por insumo y tipo
             models.Index(fields=['is_active', 'fecha']),  # Para listar alertas activas ordenadas
+            models.Index(fields=['fecha'], condition=Q(is_active=True), name='alerta_activa_fecha_idx'),  # Listado de alertas activas
+        ]
+
+
+class AlertaArchivada(models.Model):
+    """
+    Alertas resueltas (inactivas) movidas fuera de AlertaInsumo por el comando
+    `archivar_alertas`. Conserva el id original; la tabla viva solo guarda
+    alertas activas y resueltas recientes.
+    """
+    id = models.BigIntegerField(primary_key=True)  # mismo id que tenía en AlertaInsumo
+    insumo = models.ForeignKey(Insumo, on_delete=models.CASCADE, related_name="alertas_archivadas")
+    tipo = models.CharField(max_length=50, choices=TIPO_ALERTA_CHOICES)
+    mensaje = models.TextField()
+    fecha = models.DateField()
+    creada_en = models.DateTimeField()
+    resuelta_en = models.DateTimeField()  # updated_at de la alerta al desactivarse
+    archivada_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "alerta_archivada"
+        ordering = ['-fecha', '-id']
+        indexes = [
+            models.Index(fields=['insumo', 'fecha']),
+        ]
+
+    def __str__(self):
+        return f"Alerta archivada #{self.id} ({self.tipo})"
+
+
+class CheckpointProceso(models.Model):
+    """Último PK procesado por un proceso por bloques, para poder reanudarlo si se interrumpe."""
+    nombre = models.CharField(max_length=50, primary_key=True)
+    ultimo_pk = models.BigIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "checkpoint_proceso"
+
+    def __str__(self):
+        return f"{self.nombre}: {self.ultimo_pk}"
+
+
+class LatidoReplica(models.Model):
+    """
+    Fila única escrita en la primaria por `sincronizar_replica` y leída en la réplica:
+    su marca mide el retraso y `versiones` guarda las versiones de datos vigentes al
+    escribirla (ver replica.py).
+    """
+    marca = models.DateTimeField()
+    versiones = models.JSONField(default=dict)
+
+    class Meta:
+        db_table = "latido_replica"
+
+    def __str__(self):
+        return f"Latido {self.marca:%Y-%m-%d %H:%M:%S}"
+
+
+# --- PROYECCIONES PARA REPORTES ---
+
+class ReporteDisponibilidadSnapshot(models.Model):
+    """
+    Proyección por insumo usada por el reporte de disponibilidad.
+    Se mantiene incrementalmente desde las señales de lotes/insumos/categorías
+    (ver reporte_snapshot.py), así el reporte no agrega sobre todos los lotes en cada petición.
+    """
+    insumo = models.OneToOneField(
+        Insumo, on_delete=models.CASCADE, primary_key=True, related_name="snapshot_disponibilidad"
+    )
+    nombre = models.CharField(max_length=35)
+    categoria = models.ForeignKey(Categoria, on_delete=models.CASCADE, related_name="+")
+    categoria_nombre = models.CharField(max_length=40)
+    unidad = models.CharField(max_length=60)
+    precio_unitario = models.IntegerField(default=0)
+    stock_total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))
+    lotes_con_stock = models.PositiveIntegerField(default=0)
+    prox_vencimiento = models.DateField(null=True, blank=True)
+    valor = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0.00"))
+    # insumo activo y con categoría activa (mismo criterio que usaba el reporte)
+    visible = models.BooleanField(default=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "reporte_disponibilidad_snapshot"
+        indexes = [
+            models.Index(fields=['visible', 'nombre']),  # Lista de checkboxes y filtro por nombre
+            # En SQLite `WHERE "visible"` no ordena por el índice anterior; el parcial sí
+            models.Index(fields=['nombre'], condition=Q(visible=True), name='reporte_visible_nombre_idx'),
+            models.Index(fields=['visible', 'categoria_nombre', 'nombre']),  # Orden del reporte
         ]
+
+    def __str__(self):
+        return f"Disponibilidad {self.nombre}: {self.stock_total}"
+
+
+class StockDiario(models.Model):
+    """
+    Stock histórico por (insumo, bodega) al cierre de cada día.
+    Es disperso: solo hay fila en los días en que el stock cambió; el stock en
+    una fecha D es la última fila con fecha <= D (ver stock_historico.py).
+    Lo calcula el comando `calcular_stock_diario`.
+    """
+    fecha = models.DateField()
+    insumo = models.ForeignKey(Insumo, on_delete=models.CASCADE, related_name="stock_diario")
+    bodega = models.ForeignKey(Bodega, on_delete=models.CASCADE, related_name="stock_diario")
+    cantidad = models.DecimalField(max_digits=14, decimal_places=2)
+    valor = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal("0.00"))
+    calculado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['insumo', 'bodega', 'fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['insumo', 'bodega', 'fecha'], name='stock_diario_unico_por_dia'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha']),  # Recalcular desde una fecha / estado al inicio
+            models.Index(fields=['insumo', 'fecha']),  # Tendencias por insumo
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.insumo_id}@{self.bodega_id}: {self.cantidad}"
+
+
+class SugerenciaStock(models.Model):
+    """
+    Mínimo, máximo y punto de reorden sugeridos a partir del consumo histórico
+    (Salidas). Los calcula el comando nocturno `calcular_sugerencias_stock`
+    (ver pronostico.py); el usuario decide si los aplica al insumo.
+    """
+    METODO_CHOICES = [
+        ("MEDIA_MOVIL", "Media móvil"),
+        ("EXPONENCIAL", "Suavizamiento exponencial"),
+    ]
+
+    insumo = models.OneToOneField(
+        Insumo, on_delete=models.CASCADE, primary_key=True, related_name="sugerencia_stock"
+    )
+    metodo = models.CharField(max_length=15, choices=METODO_CHOICES)
+    consumo_diario = models.DecimalField(max_digits=12, decimal_places=3)  # pronóstico de consumo por día
+    desviacion_diaria = models.DecimalField(max_digits=12, decimal_places=3)
+    stock_seguridad = models.DecimalField(max_digits=12, decimal_places=2)
+    punto_reorden = models.DecimalField(max_digits=12, decimal_places=2)
+    minimo_sugerido = models.DecimalField(max_digits=12, decimal_places=2)
+    maximo_sugerido = models.DecimalField(max_digits=12, decimal_places=2)
+    dias_con_consumo = models.PositiveIntegerField(default=0)
+    calculado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "sugerencia_stock"
+
+    def __str__(self):
+        return f"Sugerencia {self.insumo_id}: {self.minimo_sugerido} - {self.maximo_sugerido}"
@@ -0,0 +1,130 @@
+"""
+Pronóstico de consumo y punto de reorden por insumo (tabla SugerenciaStock).
+
+El consumo diario sale de una sola consulta agrupada (insumo, fecha) sobre
+Salida y se carga en una matriz NumPy insumos × días; pronóstico, desviación,
+stock de seguridad y punto de reorden se calculan para todos los insumos en
+una operación vectorizada.
+
+    d   = consumo diario pronosticado (media móvil de `ventana` días o
+          suavizamiento exponencial con `alpha` sobre toda la historia)
+    σ   = desviación estándar del consumo diario en la ventana
+    SS  = z · σ · √lead_time                (z según el nivel de servicio)
+    ROP = d · lead_time + SS                (punto de reorden = mínimo sugerido)
+    máx = ROP + d · cobertura
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+from statistics import NormalDist
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import Salida, SugerenciaStock
+from .versiones import incrementar_version_al_confirmar
+
+METODO_MEDIA_MOVIL = "MEDIA_MOVIL"
+METODO_EXPONENCIAL = "EXPONENCIAL"
+
+
+def cargar_consumo(desde, hasta, chunk_size=5000):
+    """
+    Consumo diario [desde, hasta] como (insumo_ids, matriz) con una fila por
+    insumo que tuvo salidas en el período y una columna por día. Las salidas de
+    AJUSTE (correcciones de inventario, ej. check_sobrestock --fix) no son consumo.
+    """
+    dias = (hasta - desde).days + 1
+    filas = (
+        Salida.objects.filter(is_active=True, fecha_generada__gte=desde, fecha_generada__lte=hasta)
+        .exclude(tipo="AJUSTE")
+        .order_by()
+        .values("insumo_id", "fecha_generada")
+        .annotate(total=Sum("cantidad"))
+        .values_list("insumo_id", "fecha_generada", "total")
+    )
+    insumo_col, dia_col, cantidad_col = [], [], []
+    base = desde.toordinal()
+    for insumo_id, fecha, total in filas.iterator(chunk_size=chunk_size):
+        insumo_col.append(insumo_id)
+        dia_col.append(fecha.toordinal() - base)
+        cantidad_col.append(float(total or 0))
+
+    insumo_ids, fila_idx = np.unique(np.array(insumo_col, dtype=np.int64), return_inverse=True)
+    matriz = np.zeros((len(insumo_ids), dias), dtype=np.float64)
+    if len(insumo_col):
+        np.add.at(matriz, (fila_idx, np.array(dia_col, dtype=np.int64)), np.array(cantidad_col))
+    return insumo_ids, matriz
+
+
+def _pesos_exponenciales(dias, alpha):
+    """Pesos del suavizamiento s_t = α·x_t + (1-α)·s_{t-1} (s_0 = x_0) aplicados a x_0..x_{T-1}."""
+    edades = np.arange(dias - 1, -1, -1)  # 0 = día más reciente
+    pesos = alpha * (1 - alpha) ** edades
+    pesos[0] = (1 - alpha) ** (dias - 1)  # el valor inicial conserva el peso restante
+    return pesos
+
+
+def calcular_sugerencias(matriz, metodo=METODO_MEDIA_MOVIL, ventana=56, alpha=0.2,
+                         lead_time=7, nivel_servicio=0.95, cobertura=30):
+    """Cálculo vectorizado sobre la matriz insumos × días. Retorna dict de arrays."""
+    dias = matriz.shape[1]
+    ventana = max(1, min(ventana, dias))
+    reciente = matriz[:, -ventana:]
+
+    if metodo == METODO_EXPONENCIAL:
+        consumo = matriz @ _pesos_exponenciales(dias, alpha)
+    else:
+        consumo = reciente.mean(axis=1)
+    desviacion = reciente.std(axis=1, ddof=1) if ventana > 1 else np.zeros(len(matriz))
+
+    z = NormalDist().inv_cdf(nivel_servicio)
+    seguridad = z * desviacion * np.sqrt(lead_time)
+    reorden = consumo * lead_time + seguridad
+    return {
+        "consumo": consumo,
+        "desviacion": desviacion,
+        "seguridad": seguridad,
+        "reorden": reorden,
+        "minimo": reorden,
+        "maximo": reorden + consumo * cobertura,
+        "dias_con_consumo": np.count_nonzero(matriz, axis=1),
+    }
+
+
+def _dec(valor, decimales=2):
+    return Decimal(f"{valor:.{decimales}f}")
+
+
+def recalcular_sugerencias(hasta=None, dias_historia=730, metodo=METODO_MEDIA_MOVIL, chunk_size=1000, **parametros):
+    """
+    Recalcula SugerenciaStock para todos los insumos con consumo en los últimos
+    `dias_historia` días (los que no tuvieron salidas quedan sin sugerencia).
+    `parametros` se pasan a `calcular_sugerencias`. Retorna cantidad de filas escritas.
+    """
+    hasta = hasta or date.today()
+    desde = hasta - timedelta(days=dias_historia - 1)
+    insumo_ids, matriz = cargar_consumo(desde, hasta)
+    res = calcular_sugerencias(matriz, metodo=metodo, **parametros) if len(insumo_ids) else None
+
+    # La tabla se reemplaza completa en una transacción: las lecturas ven la corrida anterior o la nueva
+    with transaction.atomic():
+        SugerenciaStock.objects.all().delete()
+        for inicio in range(0, len(insumo_ids), chunk_size):
+            bloque = range(inicio, min(inicio + chunk_size, len(insumo_ids)))
+            SugerenciaStock.objects.bulk_create([
+                SugerenciaStock(
+                    insumo_id=int(insumo_ids[i]),
+                    metodo=metodo,
+                    consumo_diario=_dec(res["consumo"][i], 3),
+                    desviacion_diaria=_dec(res["desviacion"][i], 3),
+                    stock_seguridad=_dec(res["seguridad"][i]),
+                    punto_reorden=_dec(res["reorden"][i]),
+                    minimo_sugerido=_dec(res["minimo"][i]),
+                    maximo_sugerido=_dec(res["maximo"][i]),
+                    dias_con_consumo=int(res["dias_con_consumo"][i]),
+                )
+                for i in bloque
+            ])
+        incrementar_version_al_confirmar(SugerenciaStock)
+    return len(insumo_ids)
@@ -0,0 +1,110 @@
+"""
+Datos de referencia en memoria del proceso.
+
+Categorías, bodegas, ubicaciones, unidades de medida y proveedores activos: tablas
+chicas que casi no cambian pero se leen en casi todas las peticiones (selects de
+formularios, filtros de listados, valores por defecto, exportaciones). Cada
+catálogo se guarda por proceso como {id: tupla} junto con las versiones de datos
+de sus modelos (ver versiones.py) y se recarga cuando alguna cambia. Las
+versiones viven en el cache compartido de settings.CACHES (archivos en una sola
+máquina, Redis con CACHE_URL para varias), así que los demás workers y los
+comandos de manage.py ven el cambio en su próxima petición. Solo cuentan las
+escrituras que cambian la versión: save()/delete() por señales, o
+incrementar_version después de bulk_create/update() (SQL directo no invalida).
+Con VersionesPorPeticionMiddleware cada versión se lee a lo sumo una vez por petición.
+
+Formularios y vistas leen estos catálogos solo desde aquí.
+"""
+from collections import namedtuple
+
+from .metricas import contar_cache
+from .models import Bodega, Categoria, Proveedor, Ubicacion, UnidadMedida
+from .versiones import obtener_versiones_peticion
+
+CategoriaRef = namedtuple("CategoriaRef", "id nombre etiqueta is_active")
+BodegaRef = namedtuple("BodegaRef", "id nombre etiqueta is_active")
+UbicacionRef = namedtuple("UbicacionRef", "id nombre etiqueta bodega_id bodega_nombre is_active")
+UnidadRef = namedtuple("UnidadRef", "id nombre_corto nombre_largo etiqueta is_active")
+ProveedorRef = namedtuple("ProveedorRef", "id nombre_empresa rut_empresa etiqueta")
+
+
+class _Catalogo:
+    """{id: tupla} de un catálogo, recargado cuando cambia la versión de `modelos`."""
+
+    def __init__(self, modelos, cargar):
+        self.modelos = modelos
+        self.cargar = cargar
+        # (versiones con que se cargó, datos); se reemplaza completo, nunca se muta
+        self._estado = (None, {})
+
+    def __call__(self):
+        versiones = obtener_versiones_peticion(*self.modelos)
+        cargadas, datos = self._estado
+        contar_cache("referencias", cargadas == versiones)
+        if cargadas != versiones:
+            # Si alguien escribe durante la carga, la versión guardada queda atrás y se recarga en la próxima lectura
+            datos = {ref.id: ref for ref in self.cargar()}
+            self._estado = (versiones, datos)
+        return datos
+
+    def get(self, pk):
+        """Tupla del registro (id como int o texto) o None si no existe."""
+        try:
+            return self().get(int(pk))
+        except (TypeError, ValueError):
+            return None
+
+    def activos(self):
+        return [ref for ref in self().values() if getattr(ref, "is_active", True)]
+
+
+def _cargar_categorias():
+    for pk, nombre, activa in Categoria.objects.order_by("nombre", "id").values_list("id", "nombre", "is_active"):
+        yield CategoriaRef(pk, nombre, nombre, activa)
+
+
+def _cargar_bodegas():
+    for pk, nombre, activa in Bodega.objects.order_by("nombre", "id").values_list("id", "nombre", "is_active"):
+        yield BodegaRef(pk, nombre, nombre, activa)
+
+
+def _cargar_ubicaciones():
+    filas = Ubicacion.objects.order_by("id").values_list("id", "nombre", "bodega_id", "bodega__nombre", "is_active")
+    for pk, nombre, bodega_id, bodega_nombre, activa in filas:
+        # Misma etiqueta que Ubicacion.__str__
+        yield UbicacionRef(pk, nombre, f"{nombre} ({bodega_nombre})", bodega_id, bodega_nombre, activa)
+
+
+def _cargar_unidades():
+    filas = UnidadMedida.objects.order_by("nombre_largo", "id").values_list("id", "nombre_corto", "nombre_largo", "is_active")
+    for pk, corto, largo, activa in filas:
+        # Misma etiqueta que UnidadMedida.__str__
+        yield UnidadRef(pk, corto, largo, f"{largo} ({corto})", activa)
+
+
+def _cargar_proveedores_activos():
+    filas = (
+        Proveedor.objects.filter(estado="ACTIVO")
+        .order_by("nombre_empresa", "id")
+        .values_list("id", "nombre_empresa", "rut_empresa")
+    )
+    for pk, nombre, rut in filas:
+        yield ProveedorRef(pk, nombre, rut, f"{nombre} ({rut})")
+
+
+categorias = _Catalogo((Categoria,), _cargar_categorias)
+bodegas = _Catalogo((Bodega,), _cargar_bodegas)
+ubicaciones = _Catalogo((Ubicacion, Bodega), _cargar_ubicaciones)
+unidades = _Catalogo((UnidadMedida,), _cargar_unidades)
+proveedores_activos = _Catalogo((Proveedor,), _cargar_proveedores_activos)
+
+
+def ubicacion(pk):
+    """UbicacionRef de una ubicación (id como int o texto) o None si no existe."""
+    return ubicaciones.get(pk)
+
+
+def nombre_ubicacion(pk, defecto="", mapa=None):
+    """Nombre de la ubicación; `mapa` permite reutilizar un ubicaciones() ya leído (ej. en vistas async)."""
+    ref = (ubicaciones() if mapa is None else mapa).get(pk)
+    return ref.nombre if ref else defecto
@@ -0,0 +1,249 @@
+"""
+Réplica de lectura para listados, reportes y exportaciones.
+
+Con DATABASES["replica"] configurada (ver settings: DB_REPLICA_NAME en SQLite,
+DB_REPLICA_HOST en MySQL), ReplicaRouter envía a la réplica las lecturas de la
+app inventario hechas dentro de usar_replica() o de una vista con
+@lectura_en_replica. Escrituras, sesiones, usuarios y transacciones abiertas
+siempre van a la primaria.
+
+Antes de leer de la réplica se revisa su último latido (LatidoReplica, escrito
+en la primaria por `manage.py sincronizar_replica` y leído en la réplica):
+- si no se puede leer o tiene más de REPLICA_LAG_MAXIMO segundos, se usa la primaria;
+- el latido trae las versiones de datos (versiones.py) vigentes al escribirlo:
+  solo se usa la réplica si las de los modelos que lee la vista siguen siendo las
+  actuales, así un ETag o un fragmento cacheado nunca queda asociado a datos viejos.
+
+Pegado a la primaria: después de una escritura, el resto de la petición lee de
+la primaria, y LecturaReplicaMiddleware deja una cookie para que las peticiones
+de los siguientes REPLICA_PEGADO_SEGUNDOS (ej. el redirect después de un POST)
+también lo hagan.
+"""
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+
+from .versiones import obtener_versiones, obtener_versiones_peticion
+
+logger = logging.getLogger(__name__)
+
+REPLICA = "replica"
+APPS_EN_REPLICA = {"inventario"}
+COOKIE_PRIMARIA = "usar_primaria"
+METODOS_LECTURA = ("GET", "HEAD")
+
+
+class EstadoPeticion:
+    """Estado de la petición actual; los hilos de sync_to_async comparten el mismo objeto."""
+    __slots__ = ("en_replica", "pegado", "escribio")
+
+    def __init__(self, pegado=False):
+        self.en_replica = False
+        self.pegado = pegado
+        self.escribio = False
+
+
+_estado = ContextVar("estado_replica", default=None)
+# (time.monotonic() hasta el que vale, (marca, versiones) o None): un latido por proceso cada pocos segundos
+_latido = (0.0, None)
+
+
+def hay_replica():
+    return REPLICA in settings.DATABASES
+
+
+def modelos_versionados():
+    """Modelos cuyas versiones guarda el latido: los de inventario y el usuario."""
+    return [*apps.get_app_config("inventario").get_models(), get_user_model()]
+
+
+def leer_latido():
+    """(marca, versiones) del último latido visible en la réplica, o None si no se puede leer."""
+    from .models import LatidoReplica
+
+    try:
+        return LatidoReplica.objects.using(REPLICA).filter(pk=1).values_list("marca", "versiones").first()
+    except DatabaseError as exc:
+        logger.warning("No se pudo leer el latido de la réplica: %s", exc)
+        return None
+
+
+def escribir_latido():
+    """Escribe el latido en la primaria con las versiones actuales (leídas antes de la marca)."""
+    from .models import LatidoReplica
+
+    modelos = modelos_versionados()
+    versiones = dict(zip((m._meta.label_lower for m in modelos), obtener_versiones(*modelos)))
+    LatidoReplica.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        pk=1, defaults={"marca": timezone.now(), "versiones": versiones}
+    )
+
+
+def copiar_a_replica_sqlite():
+    """
+    Copia la primaria completa sobre el archivo de la réplica con la API de respaldo
+    de SQLite: la copia es consistente aunque haya escrituras en curso.
+    """
+    origen = connections[DEFAULT_DB_ALIAS]
+    origen.ensure_connection()
+    # timeout: espera a que terminen las lecturas en curso sobre la réplica
+    destino = sqlite3.connect(settings.DATABASES[REPLICA]["NAME"], timeout=30)
+    try:
+        origen.connection.backup(destino)
+    finally:
+        destino.close()
+
+
+def _latido_reciente():
+    global _latido
+    vence, latido = _latido
+    ahora = time.monotonic()
+    if ahora >= vence:
+        latido = leer_latido()
+        _latido = (ahora + settings.REPLICA_CHEQUEO_SEGUNDOS, latido)
+    return latido
+
+
+def replica_disponible(*modelos):
+    """True si se puede leer `modelos` de la réplica: latido reciente y mismas versiones de datos."""
+    estado = _estado.get()
+    if not hay_replica() or (estado is not None and estado.pegado):
+        return False
+    latido = _latido_reciente()
+    if latido is None:
+        return False
+    marca, versiones = latido
+    if (timezone.now() - marca).total_seconds() > settings.REPLICA_LAG_MAXIMO:
+        return False
+    actuales = obtener_versiones_peticion(*modelos)
+    return all(versiones.get(m._meta.label_lower) == v for m, v in zip(modelos, actuales))
+
+
+@contextmanager
+def _leyendo_de_replica(disponible):
+    estado = _estado.get()
+    token = None
+    if estado is None:
+        # Fuera de una petición (comandos, respuestas en streaming)
+        estado = EstadoPeticion()
+        token = _estado.set(estado)
+    anterior = estado.en_replica
+    estado.en_replica = disponible
+    try:
+        yield estado
+    finally:
+        estado.en_replica = anterior
+        if token is not None:
+            _estado.reset(token)
+
+
+@contextmanager
+def usar_replica(*modelos):
+    """
+    Dentro del bloque las lecturas de inventario van a la réplica si está al día
+    para `modelos`. Para vistas de solo lectura y procesos de exportación.
+    """
+    with _leyendo_de_replica(replica_disponible(*modelos)) as estado:
+        yield estado
+
+
+def _iterar_en_replica(contenido):
+    """Contenido en streaming: se genera después de que la vista retornó, fuera de su bloque."""
+    iterador = iter(contenido)
+    while True:
+        with _leyendo_de_replica(True):
+            try:
+                parte = next(iterador)
+            except StopIteration:
+                return
+        yield parte
+
+
+def lectura_en_replica(*modelos):
+    """
+    Decorador para vistas de solo lectura (listados, reportes, exportaciones): las
+    peticiones GET leen de la réplica si está al día para `modelos`. Ubicarlo debajo
+    de los decoradores de permisos. Acepta vistas síncronas y async.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_async(request, *args, **kwargs):
+                if request.method not in METODOS_LECTURA:
+                    return await view_func(request, *args, **kwargs)
+                disponible = await sync_to_async(replica_disponible)(*modelos)
+                with _leyendo_de_replica(disponible):
+                    return await view_func(request, *args, **kwargs)
+            return _wrapped_async
+
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            if request.method not in METODOS_LECTURA:
+                return view_func(request, *args, **kwargs)
+            with usar_replica(*modelos) as estado:
+                response = view_func(request, *args, **kwargs)
+                leyo_de_replica = estado.en_replica and not estado.pegado
+            if leyo_de_replica and response.streaming:
+                response.streaming_content = _iterar_en_replica(response.streaming_content)
+            return response
+        return _wrapped
+    return decorator
+
+
+@contextmanager
+def estado_peticion(request):
+    """Estado por petición; pegada a la primaria si trae la cookie de una escritura reciente."""
+    token = _estado.set(EstadoPeticion(pegado=COOKIE_PRIMARIA in request.COOKIES))
+    try:
+        yield _estado.get()
+    finally:
+        _estado.reset(token)
+
+
+def marcar_pegado(response, estado):
+    """Si la petición escribió, las siguientes leen de la primaria por REPLICA_PEGADO_SEGUNDOS."""
+    if estado.escribio and hay_replica():
+        response.set_cookie(
+            COOKIE_PRIMARIA, "1", max_age=settings.REPLICA_PEGADO_SEGUNDOS, httponly=True, samesite="Lax"
+        )
+    return response
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        estado = _estado.get()
+        if (
+            estado is None
+            or not estado.en_replica
+            or estado.pegado
+            or model._meta.app_label not in APPS_EN_REPLICA
+            # Dentro de una transacción se lee lo que la transacción ya escribió
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return None
+        return REPLICA
+
+    def db_for_write(self, model, **hints):
+        estado = _estado.get()
+        if estado is not None and model._meta.app_label in APPS_EN_REPLICA:
+            estado.pegado = estado.escribio = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplica y primaria tienen los mismos datos
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplica es copia de la primaria: nunca se migra por su cuenta
+        return False if db == REPLICA else None
@@ -0,0 +1,114 @@
+"""
+Mantenimiento de la proyección `reporte_disponibilidad_snapshot`.
+
+Las señales (signals.py) solo anotan qué insumos cambiaron; el recálculo se
+hace una vez por transacción confirmada, agrupando todos los insumos tocados
+en una consulta agregada por bloque y un upsert masivo.
+"""
+import threading
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, DecimalField, Min, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .models import Insumo, ReporteDisponibilidadSnapshot
+
+CAMPOS_ACTUALIZABLES = [
+    "nombre", "categoria", "categoria_nombre", "unidad", "precio_unitario",
+    "stock_total", "lotes_con_stock", "prox_vencimiento", "valor", "visible", "actualizado",
+]
+
+_pendientes = threading.local()
+
+
+def _insumos_con_agregados(insumo_ids):
+    return (
+        Insumo.objects.filter(pk__in=insumo_ids)
+        .select_related("categoria", "unidad_medida")
+        .annotate(
+            stock_total=Coalesce(
+                Sum(
+                    "lotes__cantidad_actual",
+                    filter=Q(lotes__is_active=True),
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                ),
+                0,
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+            lotes_con_stock=Count(
+                "lotes",
+                filter=Q(lotes__is_active=True, lotes__cantidad_actual__gt=0),
+                distinct=True,
+            ),
+            prox_vencimiento=Min(
+                "lotes__fecha_expiracion",
+                filter=Q(lotes__is_active=True, lotes__cantidad_actual__gt=0),
+            ),
+        )
+        .order_by()
+    )
+
+
+def _fila_snapshot(ins):
+    stock_total = ins.stock_total or Decimal("0")
+    precio = ins.precio_unitario or 0
+    return ReporteDisponibilidadSnapshot(
+        insumo_id=ins.pk,
+        nombre=ins.nombre,
+        categoria_id=ins.categoria_id,
+        categoria_nombre=ins.categoria.nombre,
+        unidad=str(ins.unidad_medida),
+        precio_unitario=precio,
+        stock_total=stock_total,
+        lotes_con_stock=ins.lotes_con_stock or 0,
+        prox_vencimiento=ins.prox_vencimiento,
+        valor=stock_total * precio,
+        visible=ins.is_active and ins.categoria.is_active,
+    )
+
+
+def refrescar_snapshot(insumo_ids=None, chunk_size=500):
+    """
+    Recalcula la proyección para `insumo_ids` (o para todos si es None).
+    Retorna la cantidad de filas escritas.
+    """
+    if insumo_ids is None:
+        insumo_ids = Insumo.objects.order_by("pk").values_list("pk", flat=True)
+    insumo_ids = list(insumo_ids)
+
+    upsert = {"update_conflicts": True, "update_fields": CAMPOS_ACTUALIZABLES}
+    if connection.features.supports_update_conflicts_with_target:
+        upsert["unique_fields"] = ["insumo"]
+
+    escritas = 0
+    for inicio in range(0, len(insumo_ids), chunk_size):
+        bloque = insumo_ids[inicio:inicio + chunk_size]
+        filas = [_fila_snapshot(ins) for ins in _insumos_con_agregados(bloque)]
+        if filas:
+            ReporteDisponibilidadSnapshot.objects.bulk_create(filas, **upsert)
+            escritas += len(filas)
+    return escritas
+
+
+def _vaciar_pendientes():
+    ids = getattr(_pendientes, "ids", None)
+    if not ids:
+        return
+    _pendientes.ids = set()
+    refrescar_snapshot(sorted(ids))
+
+
+def programar_refresco(insumo_ids):
+    """
+    Marca insumos para recalcular al confirmar la transacción actual.
+    Varios cambios dentro de la misma transacción se recalculan juntos: el primer
+    callback que corre vacía el conjunto y los siguientes no hacen nada. Si la
+    transacción se revierte, los ids quedan para el próximo commit (recalcular
+    desde la BD es idempotente).
+    """
+    ids = getattr(_pendientes, "ids", None)
+    if ids is None:
+        ids = _pendientes.ids = set()
+    ids.update(i for i in insumo_ids if i)
+    transaction.on_commit(_vaciar_pendientes)
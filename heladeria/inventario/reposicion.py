@@ -0,0 +1,100 @@
+"""
+Reposición automática: órdenes de ENTRADA para los insumos bajo su stock mínimo.
+
+Una sola consulta agregada obtiene, por insumo activo, el stock en lotes
+activos, lo pendiente de recibir en órdenes de ENTRADA abiertas y el proveedor
+preferido (el del lote más reciente con proveedor activo). La cantidad a pedir
+es stock_maximo - stock - pendiente. Las líneas se agrupan por proveedor y se
+crean con bulk_create en una sola transacción.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import (
+    DecimalField, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum,
+)
+from django.db.models.functions import Coalesce
+
+from .models import Insumo, InsumoLote, OrdenInsumo, OrdenInsumoDetalle
+from .versiones import incrementar_version_al_confirmar
+
+ESTADOS_ABIERTOS = ("PENDIENTE", "EN_CURSO")
+DECIMAL = DecimalField(max_digits=12, decimal_places=2)
+
+
+def insumos_a_reponer():
+    """Insumos activos bajo mínimo con `stock`, `pendiente`, `a_pedir` y `proveedor_preferido_id`."""
+    pendiente = (
+        OrdenInsumoDetalle.objects.filter(
+            insumo=OuterRef("pk"),
+            is_active=True,
+            orden_insumo__is_active=True,
+            orden_insumo__tipo_orden="ENTRADA",
+            orden_insumo__estado__in=ESTADOS_ABIERTOS,
+        )
+        .order_by()
+        .values("insumo")
+        .annotate(total=Sum(F("cantidad_solicitada") - F("cantidad_atendida"), output_field=DECIMAL))
+        .values("total")
+    )
+    proveedor_preferido = (
+        InsumoLote.objects.filter(insumo=OuterRef("pk"), proveedor__isnull=False, proveedor__is_active=True)
+        .order_by("-fecha_ingreso", "-id")
+        .values("proveedor_id")[:1]
+    )
+    return (
+        Insumo.objects.filter(is_active=True)
+        .annotate(
+            stock=Coalesce(
+                Sum("lotes__cantidad_actual", filter=Q(lotes__is_active=True), output_field=DECIMAL),
+                Decimal("0.00"),
+                output_field=DECIMAL,
+            ),
+            pendiente=Coalesce(Subquery(pendiente, output_field=DECIMAL), Decimal("0.00"), output_field=DECIMAL),
+            proveedor_preferido_id=Subquery(proveedor_preferido),
+        )
+        .filter(stock__lt=F("stock_minimo"))
+        .annotate(a_pedir=ExpressionWrapper(F("stock_maximo") - F("stock") - F("pendiente"), output_field=DECIMAL))
+        .filter(a_pedir__gt=0)
+        .order_by("nombre")
+        .values("id", "nombre", "stock", "pendiente", "a_pedir", "proveedor_preferido_id")
+    )
+
+
+def generar_ordenes_reposicion(usuario, dry_run=False):
+    """
+    Crea una orden de ENTRADA por proveedor preferido (más una sin proveedor si
+    corresponde) con una línea por insumo a reponer.
+    Retorna dict {proveedor_id: [filas]} con lo generado (o lo que se generaría).
+    """
+    grupos = defaultdict(list)
+    for fila in insumos_a_reponer():
+        fila["a_pedir"] = Decimal(fila["a_pedir"]).quantize(Decimal("0.01"))
+        grupos[fila["proveedor_preferido_id"]].append(fila)
+    if dry_run or not grupos:
+        return dict(grupos)
+
+    with transaction.atomic():
+        ordenes = [
+            OrdenInsumo(usuario=usuario, tipo_orden="ENTRADA", estado="PENDIENTE", proveedor_id=proveedor_id)
+            for proveedor_id in grupos
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            OrdenInsumo.objects.bulk_create(ordenes)
+        else:
+            # Sin RETURNING (MySQL) bulk_create no asigna pk: una inserción por proveedor
+            for orden in ordenes:
+                orden.save()
+        OrdenInsumoDetalle.objects.bulk_create([
+            OrdenInsumoDetalle(orden_insumo=orden, insumo_id=fila["id"], cantidad_solicitada=fila["a_pedir"])
+            for orden, filas in zip(ordenes, grupos.values())
+            for fila in filas
+        ])
+        # bulk_create no dispara señales
+        incrementar_version_al_confirmar(OrdenInsumo, OrdenInsumoDetalle)
+
+    for orden, filas in zip(ordenes, grupos.values()):
+        for fila in filas:
+            fila["orden_id"] = orden.pk
+    return dict(grupos)
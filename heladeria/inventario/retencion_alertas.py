@@ -0,0 +1,73 @@
+"""
+Retención de alertas: mueve las alertas resueltas (is_active=False) más
+antiguas que N días desde AlertaInsumo a AlertaArchivada.
+
+La tabla viva se recorre por rangos de PK; cada rango se copia y se borra en
+una transacción propia y el último PK procesado queda en CheckpointProceso,
+así que una corrida interrumpida se reanuda donde quedó en vez de volver a
+recorrer la tabla desde el inicio.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .borrado import rangos_pk
+from .models import AlertaInsumo, AlertaArchivada, CheckpointProceso
+from .versiones import incrementar_version_al_confirmar
+
+CHECKPOINT = "archivar_alertas"
+
+
+def alertas_archivables(dias):
+    """Alertas inactivas cuya resolución (updated_at) tiene más de `dias` días."""
+    limite = timezone.now() - timedelta(days=dias)
+    return AlertaInsumo.objects.filter(is_active=False, updated_at__lt=limite)
+
+
+def _archivar_rango(alertas):
+    filas = list(alertas.values_list("id", "insumo_id", "tipo", "mensaje", "fecha", "created_at", "updated_at"))
+    if not filas:
+        return 0
+    AlertaArchivada.objects.bulk_create(
+        [
+            AlertaArchivada(
+                id=pk, insumo_id=insumo_id, tipo=tipo, mensaje=mensaje,
+                fecha=fecha, creada_en=creada_en, resuelta_en=resuelta_en,
+            )
+            for pk, insumo_id, tipo, mensaje, fecha, creada_en, resuelta_en in filas
+        ],
+        ignore_conflicts=True,
+    )
+    # Se borran exactamente las filas copiadas: las que cambiaron entre medio quedan para la próxima corrida
+    borrar = AlertaInsumo.objects.filter(pk__in=[fila[0] for fila in filas])
+    return borrar._raw_delete(borrar.db)
+
+
+def archivar_alertas(dias=90, chunk_size=1000, reiniciar=False, progreso=None):
+    """
+    Archiva las alertas resueltas hace más de `dias` días en rangos de
+    `chunk_size` PK. Con `reiniciar` ignora el checkpoint y parte desde el inicio.
+    `progreso(archivadas, hasta_pk)` se llama después de cada rango.
+    Retorna la cantidad de alertas archivadas.
+    """
+    checkpoint, _ = CheckpointProceso.objects.get_or_create(nombre=CHECKPOINT)
+    desde = 0 if reiniciar else checkpoint.ultimo_pk
+    archivables = alertas_archivables(dias)
+    archivadas = 0
+
+    for inicio, fin in rangos_pk(AlertaInsumo.objects.all(), chunk_size, desde=desde):
+        with transaction.atomic():
+            n = _archivar_rango(archivables.filter(pk__gte=inicio, pk__lt=fin))
+            checkpoint.ultimo_pk = fin
+            checkpoint.save(update_fields=["ultimo_pk", "actualizado"])
+            if n:
+                incrementar_version_al_confirmar(AlertaInsumo)
+        archivadas += n
+        if progreso:
+            progreso(archivadas, fin)
+
+    # Recorrido completo: la próxima corrida vuelve a partir desde el primer PK
+    checkpoint.ultimo_pk = 0
+    checkpoint.save(update_fields=["ultimo_pk", "actualizado"])
+    return archivadas
@@ -4,11 +4,14 @@ USA CACHE - NO requiere modelo ConfiguracionAlertas
 """
 from decimal import Decimal
 from django.utils import timezone
-from django.db.models import Sum, Q
+from django.db.models import DecimalField, Sum, Q
 from django.db.models.functions import Coalesce
 from .models import Insumo, AlertaInsumo, InsumoLote
 from .alertas_config import alertas_activadas  # <-- Importar función del cache
+from .metricas import medir_evaluacion_alertas
+from .versiones import incrementar_version_al_confirmar
 
+@medir_evaluacion_alertas("stock")
 def check_and_create_stock_alerts(insumo=None):
     """
     Verifica niveles de stock y crea alertas si es necesario.
@@ -85,12 +88,76 @@ def check_and_create_stock_alerts(insumo=None):
                 
         else:
             # Stock en rango normal: desactivar alertas de stock existentes
-            AlertaInsumo.objects.filter(
+            desactivadas = AlertaInsumo.objects.filter(
                 insumo=ins,
                 tipo__in=['SIN_STOCK', 'BAJO_STOCK', 'STOCK_EXCESIVO'],
                 is_active=True
             ).update(is_active=False)
+            if desactivadas:
+                # update() no dispara señales: invalidar ETags a mano
+                incrementar_version_al_confirmar(AlertaInsumo)
 
+@medir_evaluacion_alertas("stock_masivo")
+def check_stock_alerts_batch(insumo_ids, chunk_size=1000):
+    """
+    Misma evaluación que check_and_create_stock_alerts para muchos insumos a la vez
+    (importaciones y cargas masivas): stock por insumo con una agregación por bloque
+    y alertas creadas/actualizadas/desactivadas con operaciones en lote.
+    """
+    if not alertas_activadas():
+        return
+
+    insumo_ids = list(insumo_ids)
+    tipos_stock = ['SIN_STOCK', 'BAJO_STOCK', 'STOCK_EXCESIVO']
+    hubo_cambios = False
+    for inicio in range(0, len(insumo_ids), chunk_size):
+        bloque = insumo_ids[inicio:inicio + chunk_size]
+        insumos = (
+            Insumo.objects.filter(id__in=bloque, is_active=True)
+            .select_related('unidad_medida')
+            .annotate(stock_actual=Coalesce(
+                Sum('lotes__cantidad_actual', filter=Q(lotes__is_active=True)), Decimal('0'),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ))
+        )
+        existentes = {
+            (insumo_id, tipo): alerta_id
+            for alerta_id, insumo_id, tipo in AlertaInsumo.objects.filter(
+                insumo_id__in=bloque, tipo__in=tipos_stock, is_active=True,
+            ).values_list('id', 'insumo_id', 'tipo')
+        }
+        crear, actualizar, en_rango = [], [], []
+        ahora = timezone.now()
+        for ins in insumos:
+            stock_actual, unidad = ins.stock_actual, ins.unidad_medida.nombre_corto
+            if stock_actual == Decimal('0'):
+                tipo, mensaje = 'SIN_STOCK', f'El insumo "{ins.nombre}" no tiene stock disponible'
+            elif stock_actual < ins.stock_minimo:
+                tipo, mensaje = 'BAJO_STOCK', f'Stock bajo: {stock_actual} {unidad} (mínimo: {ins.stock_minimo})'
+            elif stock_actual > ins.stock_maximo:
+                tipo, mensaje = 'STOCK_EXCESIVO', f'Stock excesivo: {stock_actual} {unidad} (máximo: {ins.stock_maximo})'
+            else:
+                en_rango.append(ins.id)
+                continue
+            alerta_id = existentes.get((ins.id, tipo))
+            if alerta_id:
+                actualizar.append(AlertaInsumo(id=alerta_id, mensaje=mensaje, updated_at=ahora))
+            else:
+                crear.append(AlertaInsumo(insumo=ins, tipo=tipo, mensaje=mensaje))
+
+        AlertaInsumo.objects.bulk_create(crear)
+        AlertaInsumo.objects.bulk_update(actualizar, ['mensaje', 'updated_at'])
+        desactivadas = AlertaInsumo.objects.filter(
+            insumo_id__in=en_rango, tipo__in=tipos_stock, is_active=True,
+        ).update(is_active=False)
+        hubo_cambios = hubo_cambios or bool(crear or actualizar or desactivadas)
+
+    if hubo_cambios:
+        # Operaciones en lote: sin señales, se invalidan los ETags a mano
+        incrementar_version_al_confirmar(AlertaInsumo)
+
+
+@medir_evaluacion_alertas("vencimiento")
 def check_lote_vencimiento(lote=None):
     """
     Verifica fechas de expiración de lotes y crea alertas.
@@ -108,10 +175,11 @@ def check_lote_vencimiento(lote=None):
     if lote:
         lotes = [lote]
     else:
+        # Sin el ORDER BY de Meta.ordering: el orden no importa y obligaba a recorrer el índice de fecha_ingreso
         lotes = InsumoLote.objects.filter(
             is_active=True,
             cantidad_actual__gt=0
-        )
+        ).select_related('insumo').order_by()
     
     hoy = timezone.now().date()
     
@@ -1,9 +1,16 @@
 # heladeria/inventario/signals.py (Contenido Corregido)
 
-from django.db.models.signals import post_save
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from .models import Insumo
+from .models import (
+    Insumo, Categoria, Bodega, Ubicacion, UnidadMedida, Proveedor,
+    InsumoLote, OrdenInsumo, OrdenInsumoDetalle, Entrada, Salida, AlertaInsumo,
+)
 from .services import check_and_create_stock_alerts # <--- CAMBIO AQUÍ
+from .versiones import incrementar_version_al_confirmar
+from .reporte_snapshot import programar_refresco
+from .ledger import sincronizar_movimientos, eliminar_movimientos
 
 @receiver(post_save, sender=Insumo)
 def insumo_post_save_check_alerts(sender, instance, created, **kwargs):
@@ -13,4 +20,61 @@ def insumo_post_save_check_alerts(sender, instance, created, **kwargs):
     # Se ejecuta al crear un insumo para generar inmediatamente la alerta si corresponde.
     # También se ejecuta si se guardan campos de actualización (ej. al editar el stock min/max).
     if created or kwargs.get('update_fields'):
-        check_and_create_stock_alerts(instance)
\ No newline at end of file
+        check_and_create_stock_alerts(instance)
+
+
+# --- Versiones de datos (ETag / respuestas 304) ---
+# Cualquier guardado o borrado de estos modelos invalida los ETag que dependen de ellos.
+MODELOS_VERSIONADOS = (
+    Insumo, Categoria, Bodega, Ubicacion, UnidadMedida, Proveedor,
+    InsumoLote, OrdenInsumo, OrdenInsumoDetalle, Entrada, Salida, AlertaInsumo,
+    get_user_model(),
+)
+
+
+def incrementar_version_por_senal(sender, **kwargs):
+    incrementar_version_al_confirmar(sender)
+
+
+for _modelo in MODELOS_VERSIONADOS:
+    _uid = _modelo._meta.label_lower
+    post_save.connect(incrementar_version_por_senal, sender=_modelo, dispatch_uid=f"version_save_{_uid}")
+    post_delete.connect(incrementar_version_por_senal, sender=_modelo, dispatch_uid=f"version_delete_{_uid}")
+
+
+# --- Proyección del reporte de disponibilidad ---
+@receiver(post_save, sender=InsumoLote)
+@receiver(post_delete, sender=InsumoLote)
+def lote_refrescar_snapshot(sender, instance, **kwargs):
+    programar_refresco([instance.insumo_id])
+
+
+@receiver(post_save, sender=Insumo)
+def insumo_refrescar_snapshot(sender, instance, **kwargs):
+    programar_refresco([instance.pk])
+
+
+@receiver(post_save, sender=Categoria)
+def categoria_refrescar_snapshot(sender, instance, created, **kwargs):
+    # Nombre o estado de la categoría se copian en la proyección
+    if not created:
+        programar_refresco(instance.insumos.values_list("pk", flat=True))
+
+
+@receiver(post_save, sender=UnidadMedida)
+def unidad_refrescar_snapshot(sender, instance, created, **kwargs):
+    if not created:
+        programar_refresco(instance.insumos_medidos.values_list("pk", flat=True))
+
+
+# --- Ledger único de movimientos ---
+@receiver(post_save, sender=Entrada)
+@receiver(post_save, sender=Salida)
+def movimiento_sincronizar_ledger(sender, instance, **kwargs):
+    sincronizar_movimientos(sender, [instance.pk])
+
+
+@receiver(post_delete, sender=Entrada)
+@receiver(post_delete, sender=Salida)
+def movimiento_eliminar_ledger(sender, instance, **kwargs):
+    eliminar_movimientos(sender, [instance.pk])
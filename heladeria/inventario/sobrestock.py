@@ -0,0 +1,189 @@
+"""
+Corrección de sobrestock (stock en lotes activos > stock_maximo) por FIFO.
+
+Para cada insumo el exceso se descuenta de sus lotes activos más antiguos
+(fecha_ingreso, id). El acumulado por insumo se calcula con funciones de
+ventana (SUM() OVER PARTITION BY insumo) cuando el motor las soporta; si no,
+con una sola pasada en Python sobre una consulta ordenada. Las reducciones se
+calculan y aplican en una transacción con los lotes afectados bloqueados
+(select_for_update), con un UPDATE relativo al valor actual de cada lote, y cada
+una queda registrada como una Salida de tipo AJUSTE creada con bulk_create: una
+Entrada o Salida concurrente no se pierde y el stock no queda negativo.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import BigIntegerField, Case, DecimalField, F, OuterRef, Subquery, Sum, Value, When, Window
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .ledger import sincronizar_movimientos
+from .models import Entrada, InsumoLote, Salida, Ubicacion
+from .reporte_snapshot import programar_refresco
+from .versiones import incrementar_version_al_confirmar
+
+DECIMAL = DecimalField(max_digits=12, decimal_places=2)
+OBSERVACION_AJUSTE = "Ajuste automático por sobrestock (FIFO)"
+
+
+def _lotes_activos(insumo_ids=None):
+    """Lotes activos con stock, con la ubicación donde se registró su última entrada."""
+    ultima_ubicacion = (
+        Entrada.objects.filter(insumo_lote=OuterRef("pk"))
+        .order_by("-fecha", "-id")
+        .values("ubicacion_id")[:1]
+    )
+    ubicacion_bodega = (
+        Ubicacion.objects.filter(bodega=OuterRef("bodega_id"), is_active=True)
+        .order_by("id")
+        .values("id")[:1]
+    )
+    qs = InsumoLote.objects.filter(is_active=True, cantidad_actual__gt=0)
+    if insumo_ids is not None:
+        qs = qs.filter(insumo_id__in=insumo_ids)
+    return qs.annotate(ubicacion_ajuste=Coalesce(
+        Subquery(ultima_ubicacion), Subquery(ubicacion_bodega), output_field=BigIntegerField(),
+    ))
+
+
+def _reducciones_ventana(insumo_ids=None):
+    """(lote, exceso, acumulado previo) con SUM() OVER; solo lotes que cubren parte del exceso."""
+    por_insumo = {"partition_by": [F("insumo_id")]}
+    fifo = {**por_insumo, "order_by": [F("fecha_ingreso").asc(), F("id").asc()]}
+    qs = (
+        _lotes_activos(insumo_ids)
+        .annotate(
+            stock_insumo=Window(Sum("cantidad_actual"), output_field=DECIMAL, **por_insumo),
+            acumulado=Window(Sum("cantidad_actual"), output_field=DECIMAL, **fifo),
+        )
+        .annotate(
+            exceso=F("stock_insumo") - F("insumo__stock_maximo"),
+            previo=F("acumulado") - F("cantidad_actual"),
+        )
+        .filter(exceso__gt=0, previo__lt=F("exceso"))
+        .order_by("insumo_id", "fecha_ingreso", "id")
+        .values("id", "insumo_id", "cantidad_actual", "ubicacion_ajuste", "exceso", "previo")
+    )
+    for fila in qs:
+        yield fila, Decimal(fila["exceso"]), Decimal(fila["previo"])
+
+
+def _reducciones_python(insumo_ids=None):
+    """Misma selección acumulando en Python sobre una consulta ordenada por insumo y FIFO."""
+    lotes = InsumoLote.objects.filter(is_active=True, cantidad_actual__gt=0)
+    if insumo_ids is not None:
+        lotes = lotes.filter(insumo_id__in=insumo_ids)
+    excesos = {
+        insumo_id: Decimal(total) - Decimal(maximo)
+        for insumo_id, maximo, total in (
+            lotes.order_by()
+            .values("insumo_id", "insumo__stock_maximo")
+            .annotate(total=Sum("cantidad_actual"))
+            .filter(total__gt=F("insumo__stock_maximo"))
+            .values_list("insumo_id", "insumo__stock_maximo", "total")
+        )
+    }
+    qs = (
+        _lotes_activos()
+        .filter(insumo_id__in=excesos)
+        .order_by("insumo_id", "fecha_ingreso", "id")
+        .values("id", "insumo_id", "cantidad_actual", "ubicacion_ajuste")
+    )
+    insumo_actual, previo = None, Decimal("0")
+    for fila in qs.iterator(chunk_size=2000):
+        if fila["insumo_id"] != insumo_actual:
+            insumo_actual, previo = fila["insumo_id"], Decimal("0")
+        exceso = excesos[insumo_actual]
+        if previo < exceso:
+            yield fila, exceso, previo
+        previo += fila["cantidad_actual"]
+
+
+def calcular_reducciones(insumo_ids=None):
+    """
+    Lista de dicts {lote_id, insumo_id, ubicacion_id, cantidad_actual, reduccion}
+    con lo que hay que descontar de cada lote para dejar cada insumo en su stock_maximo.
+    Con `insumo_ids` solo considera esos insumos.
+    """
+    if connection.features.supports_over_clause:
+        filas = _reducciones_ventana(insumo_ids)
+    else:
+        filas = _reducciones_python(insumo_ids)
+    reducciones = []
+    for fila, exceso, previo in filas:
+        cantidad = Decimal(fila["cantidad_actual"])
+        reducciones.append({
+            "lote_id": fila["id"],
+            "insumo_id": fila["insumo_id"],
+            "ubicacion_id": fila["ubicacion_ajuste"],
+            "cantidad_actual": cantidad,
+            "reduccion": min(cantidad, exceso - previo).quantize(Decimal("0.01")),
+        })
+    return reducciones
+
+
+def _descontar(reducciones, ahora):
+    """Un UPDATE por bloque, relativo al valor actual de cada lote (como importacion._escribir_salidas)."""
+    for inicio in range(0, len(reducciones), 1000):
+        bloque = reducciones[inicio:inicio + 1000]
+        InsumoLote.objects.filter(pk__in=[r["lote_id"] for r in bloque]).update(
+            cantidad_actual=F("cantidad_actual") - Case(
+                *(When(pk=r["lote_id"], then=Value(r["reduccion"])) for r in bloque),
+                output_field=DECIMAL,
+            ),
+            updated_at=ahora,
+        )
+
+
+def corregir_sobrestock(usuario, fecha=None):
+    """
+    Aplica las reducciones FIFO y registra una Salida AJUSTE por lote.
+    Los lotes sin ubicación posible (bodega sin ubicaciones activas) se omiten.
+    Retorna (aplicadas, omitidas) como listas de dicts de `calcular_reducciones`.
+    """
+    fecha = fecha or date.today()
+    ahora = timezone.now()
+    with transaction.atomic():
+        insumo_ids = {r["insumo_id"] for r in calcular_reducciones()}
+        if not insumo_ids:
+            return [], []
+        # Bloquea los lotes de los insumos con exceso (en orden de id, sin deadlocks entre
+        # correcciones) y recalcula con su stock ya fijo: nadie los modifica hasta el commit
+        list(
+            InsumoLote.objects.select_for_update().filter(insumo_id__in=insumo_ids, is_active=True)
+            .order_by("id").values_list("id", flat=True)
+        )
+        reducciones = calcular_reducciones(insumo_ids)
+        aplicadas = [r for r in reducciones if r["ubicacion_id"]]
+        omitidas = [r for r in reducciones if not r["ubicacion_id"]]
+        if not aplicadas:
+            return aplicadas, omitidas
+
+        _descontar(aplicadas, ahora)
+        salidas = [
+            Salida(
+                insumo_id=r["insumo_id"],
+                insumo_lote_id=r["lote_id"],
+                ubicacion_id=r["ubicacion_id"],
+                cantidad=r["reduccion"],
+                fecha_generada=fecha,
+                usuario=usuario,
+                tipo="AJUSTE",
+                observaciones=OBSERVACION_AJUSTE,
+            )
+            for r in aplicadas
+        ]
+        if connection.features.can_return_rows_from_bulk_insert:
+            Salida.objects.bulk_create(salidas, batch_size=1000)
+            # bulk_create/update() no disparan señales: ledger, versiones y snapshot a mano
+            for inicio in range(0, len(salidas), 1000):
+                sincronizar_movimientos(Salida, [s.pk for s in salidas[inicio:inicio + 1000]])
+        else:
+            # Sin RETURNING (MySQL) no hay pk para el ledger: las señales de save() lo sincronizan
+            for salida in salidas:
+                salida.save()
+        incrementar_version_al_confirmar(InsumoLote, Salida)
+        programar_refresco({r["insumo_id"] for r in aplicadas})
+    return aplicadas, omitidas
+
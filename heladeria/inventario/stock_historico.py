@@ -0,0 +1,185 @@
+"""
+Stock histórico diario por insumo y bodega (tabla StockDiario).
+
+El cálculo recorre el ledger de movimientos (entradas +, salidas -) ordenado
+por fecha en una sola pasada en streaming, partiendo del último estado
+conocido antes de la fecha de inicio. Solo se escribe fila para los
+(insumo, bodega) que cambiaron ese día.
+
+Las consultas de la API (stock en una fecha y tendencias) leen únicamente
+filas precalculadas.
+"""
+from datetime import timedelta
+from decimal import Decimal
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+from django.db.models import Max, Min, OuterRef, Subquery
+
+from .models import Entrada, Salida, Insumo, MovimientoLedger, StockDiario
+from .versiones import incrementar_version_al_confirmar
+
+MAX_DIAS_TENDENCIA = 731
+
+
+def _movimientos_desde(desde, chunk_size):
+    """Iterador de (fecha, insumo_id, bodega_id, cantidad con signo) ordenado por fecha."""
+    return (
+        MovimientoLedger.objects.filter(is_active=True, fecha__gte=desde)
+        .order_by("fecha", "id")
+        .values_list("fecha", "insumo_id", "bodega_id", "cantidad")
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def _estado_antes_de(desde):
+    """Último stock conocido por (insumo, bodega) antes de `desde`."""
+    ultimas = {
+        (insumo_id, bodega_id): fecha
+        for insumo_id, bodega_id, fecha in (
+            StockDiario.objects.filter(fecha__lt=desde)
+            .values("insumo_id", "bodega_id")
+            .annotate(ultima=Max("fecha"))
+            .values_list("insumo_id", "bodega_id", "ultima")
+        )
+    }
+    estado = {}
+    fechas = sorted(set(ultimas.values()))
+    for inicio in range(0, len(fechas), 500):
+        filas = (
+            StockDiario.objects.filter(fecha__in=fechas[inicio:inicio + 500])
+            .values_list("insumo_id", "bodega_id", "fecha", "cantidad")
+            .iterator()
+        )
+        for insumo_id, bodega_id, fecha, cantidad in filas:
+            if ultimas.get((insumo_id, bodega_id)) == fecha:
+                estado[(insumo_id, bodega_id)] = cantidad
+    return estado
+
+
+def primera_fecha_movimientos():
+    return MovimientoLedger.objects.filter(is_active=True).aggregate(m=Min("fecha"))["m"]
+
+
+def fecha_inicio_incremental():
+    """
+    Desde qué fecha hay que recalcular: el día siguiente al último calculado, o
+    antes si se registraron/editaron movimientos con fecha pasada después del
+    último cálculo. None si no hay historia (corresponde un backfill).
+    Los movimientos eliminados no se detectan: usar --desde en ese caso.
+    """
+    ultimo = StockDiario.objects.aggregate(fecha=Max("fecha"), calculado=Max("calculado_en"))
+    if ultimo["fecha"] is None:
+        return None
+    desde = ultimo["fecha"] + timedelta(days=1)
+    atrasadas = [
+        Entrada.objects.filter(updated_at__gt=ultimo["calculado"], fecha__lt=desde).aggregate(m=Min("fecha"))["m"],
+        Salida.objects.filter(updated_at__gt=ultimo["calculado"], fecha_generada__lt=desde).aggregate(m=Min("fecha_generada"))["m"],
+    ]
+    return min([desde] + [f for f in atrasadas if f])
+
+
+def recalcular_stock_diario(desde=None, chunk_size=2000, progreso=None):
+    """
+    Recalcula StockDiario para fechas >= `desde` (None = toda la historia).
+    `progreso(movimientos, filas)` se llama después de cada bloque escrito.
+    Retorna dict con desde, movimientos procesados y filas escritas.
+    """
+    if desde is None:
+        desde = primera_fecha_movimientos()
+        if desde is None:
+            StockDiario.objects.all().delete()
+            return {"desde": None, "movimientos": 0, "filas": 0}
+
+    precios = dict(Insumo.objects.values_list("id", "precio_unitario"))
+    movimientos = filas = 0
+    batch = []
+
+    def _escribir():
+        nonlocal filas
+        StockDiario.objects.bulk_create(batch)
+        filas += len(batch)
+        batch.clear()
+        if progreso:
+            progreso(movimientos, filas)
+
+    with transaction.atomic():
+        StockDiario.objects.filter(fecha__gte=desde).delete()
+        estado = _estado_antes_de(desde)
+
+        for fecha, del_dia in groupby(_movimientos_desde(desde, chunk_size), key=itemgetter(0)):
+            tocados = set()
+            for _, insumo_id, bodega_id, cantidad in del_dia:
+                clave = (insumo_id, bodega_id)
+                estado[clave] = estado.get(clave, Decimal("0")) + cantidad
+                tocados.add(clave)
+                movimientos += 1
+            for insumo_id, bodega_id in tocados:
+                cantidad = estado[(insumo_id, bodega_id)]
+                batch.append(StockDiario(
+                    fecha=fecha,
+                    insumo_id=insumo_id,
+                    bodega_id=bodega_id,
+                    cantidad=cantidad,
+                    valor=cantidad * (precios.get(insumo_id) or 0),
+                ))
+            if len(batch) >= chunk_size:
+                _escribir()
+        if batch:
+            _escribir()
+        incrementar_version_al_confirmar(StockDiario)
+
+    return {"desde": desde, "movimientos": movimientos, "filas": filas}
+
+
+# --- Consultas (solo filas precalculadas) ---
+
+def stock_en_fecha(insumo_id, fecha, bodega_id=None):
+    """Stock por bodega de un insumo al cierre de `fecha`: última fila <= fecha por bodega."""
+    ultima_fecha = (
+        StockDiario.objects.filter(
+            insumo_id=OuterRef("insumo_id"), bodega_id=OuterRef("bodega_id"), fecha__lte=fecha
+        )
+        .order_by("-fecha")
+        .values("fecha")[:1]
+    )
+    qs = StockDiario.objects.filter(insumo_id=insumo_id, fecha=Subquery(ultima_fecha))
+    if bodega_id:
+        qs = qs.filter(bodega_id=bodega_id)
+    return list(
+        qs.order_by("bodega__nombre")
+        .values("bodega_id", "bodega__nombre", "fecha", "cantidad", "valor")
+    )
+
+
+def tendencia_stock(insumo_id, desde, hasta, bodega_id=None):
+    """
+    Serie diaria [desde, hasta] del stock total (suma de bodegas o una bodega),
+    rellenando hacia adelante los días sin cambios.
+    """
+    hasta = min(hasta, desde + timedelta(days=MAX_DIAS_TENDENCIA - 1))
+    actual = {
+        f["bodega_id"]: (f["cantidad"], f["valor"])
+        for f in stock_en_fecha(insumo_id, desde - timedelta(days=1), bodega_id)
+    }
+    cambios = StockDiario.objects.filter(insumo_id=insumo_id, fecha__gte=desde, fecha__lte=hasta)
+    if bodega_id:
+        cambios = cambios.filter(bodega_id=bodega_id)
+    cambios = cambios.order_by("fecha").values_list("fecha", "bodega_id", "cantidad", "valor")
+    por_dia = {
+        fecha: list(filas) for fecha, filas in groupby(cambios.iterator(), key=itemgetter(0))
+    }
+
+    serie = []
+    dia = desde
+    while dia <= hasta:
+        for _, bod, cantidad, valor in por_dia.get(dia, ()):
+            actual[bod] = (cantidad, valor)
+        serie.append({
+            "fecha": dia.isoformat(),
+            "cantidad": float(sum(c for c, _ in actual.values())),
+            "valor": float(sum(v for _, v in actual.values())),
+        })
+        dia += timedelta(days=1)
+    return serie
@@ -1,4 +1,5 @@
 from django import template
+from inventario import referencias
 
 register = template.Library()
 
@@ -11,3 +12,12 @@ def split(value, arg):
     if value is None:
         return []
     return value.split(arg)
+
+
+@register.filter
+def nombre_ubicacion(ubicacion_id, defecto=""):
+    """
+    Nombre de la ubicación desde el mapa en memoria (sin JOIN ni consulta por fila).
+    Uso: {{ mov.ubicacion_id|nombre_ubicacion }}
+    """
+    return referencias.nombre_ubicacion(ubicacion_id, defecto)
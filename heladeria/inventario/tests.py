@@ -1,3 +1,413 @@
-from django.test import TestCase
+"""
+Regresiones de planes de consulta y de cantidad de consultas por vista.
 
-# Create your tests here.
+Se siembra un conjunto mediano de datos (insumos, lotes, movimientos, alertas y
+órdenes, con una parte inactiva), se piden las vistas críticas y se revisa con
+EXPLAIN QUERY PLAN el SQL que cada una ejecutó (CaptureQueriesContext): que siga
+usando su índice sin ordenar ni recorrer tablas completas. Si un cambio en
+modelos o vistas deja de usar un índice, falla aquí y no en producción.
+
+También cubre el endpoint /metrics (inventario/metricas.py), el consumo que
+usa el pronóstico (inventario/pronostico.py), la importación del catálogo y la
+unicidad de nombres en el admin y el detalle de la API de integraciones.
+
+Corre con `python manage.py test inventario` sobre SQLite.
+"""
+import json
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from . import analisis_indices, metricas
+from .admin import CategoriaAdminForm
+from .models import (
+    AlertaInsumo, Bodega, Categoria, Insumo, InsumoLote, MovimientoLedger,
+    OrdenInsumo, Proveedor, Salida, Ubicacion, UnidadMedida, normalizar_nombre,
+)
+from .importacion import leer_filas, validar_archivo
+from .importacion_catalogo import importar_catalogo, validar_catalogo
+from .pronostico import cargar_consumo
+from .services import check_stock_alerts_batch
+from .sobrestock import OBSERVACION_AJUSTE, corregir_sobrestock
+
+N_INSUMOS = 300
+LOTES_POR_INSUMO = 3
+MOVIMIENTOS_POR_LOTE = 4
+N_ALERTAS = 400
+N_ORDENES = 300
+
+
+def sembrar_datos(usuario):
+    """
+    Datos de tamaño mediano; cada décimo registro queda inactivo. Los catálogos
+    tienen varias filas para que el planificador no recorra tablas de una sola fila.
+    """
+    hoy = date.today()
+    usuarios = [usuario] + [
+        get_user_model().objects.create_user(email=f"bodega{i}@heladeria.cl", name=f"Bodega {i}", password="x")
+        for i in range(4)
+    ]
+    categorias = [
+        Categoria.objects.create(nombre=f"Categoría {i}") for i in range(8)
+    ]
+    unidades = [
+        UnidadMedida.objects.create(nombre_corto=corto, nombre_largo=largo)
+        for corto, largo in [("KG", "Kilogramos"), ("LT", "Litros"), ("UN", "Unidades"), ("GR", "Gramos"), ("CJ", "Cajas")]
+    ]
+    bodegas = [Bodega.objects.create(nombre=f"Bodega {i}", direccion="Calle 1") for i in range(3)]
+    ubicaciones = [Ubicacion.objects.create(bodega=b, nombre="A1") for b in bodegas]
+    proveedores = [
+        Proveedor.objects.create(
+            nombre_empresa=f"Proveedor {i}", rut_empresa=f"76.000.00{i}-K", email=f"ventas{i}@proveedor.cl",
+            telefono="221234567", direccion="Av. Principal 100", ciudad="Osorno", region="Los Lagos",
+        )
+        for i in range(5)
+    ]
+
+    insumos = Insumo.objects.bulk_create([
+        Insumo(
+            categoria=categorias[i % len(categorias)], nombre=f"Insumo {i:04d}",
+            clave=normalizar_nombre(f"Insumo {i:04d}"), stock_minimo=10, stock_maximo=200,
+            unidad_medida=unidades[i % len(unidades)], precio_unitario=1000 + i, is_active=i % 10 != 0,
+        )
+        for i in range(N_INSUMOS)
+    ])
+    lotes = InsumoLote.objects.bulk_create([
+        InsumoLote(
+            insumo=insumo, bodega=bodegas[j], proveedor=proveedores[i % len(proveedores)],
+            fecha_ingreso=hoy - timedelta(days=90 - j), fecha_expiracion=hoy + timedelta(days=(i * 7 + j * 13) % 365),
+            cantidad_inicial=100, cantidad_actual=Decimal(((i + j) % 5) * 20), usuario=usuarios[i % len(usuarios)],
+            is_active=(i + j) % 10 != 0,
+        )
+        for i, insumo in enumerate(insumos)
+        for j in range(LOTES_POR_INSUMO)
+    ])
+    MovimientoLedger.objects.bulk_create([
+        MovimientoLedger(
+            tipo="ENTRADA" if k % 2 == 0 else "SALIDA", origen_id=n, subtipo="COMPRA" if k % 2 == 0 else "VENTA",
+            fecha=hoy - timedelta(days=(n * 3) % 120), insumo_id=lote.insumo_id, insumo_lote=lote,
+            ubicacion=ubicaciones[n % len(ubicaciones)], bodega_id=lote.bodega_id,
+            cantidad=Decimal(10 if k % 2 == 0 else -5), usuario=usuarios[n % len(usuarios)],
+        )
+        for n, (lote, k) in enumerate((lote, k) for lote in lotes for k in range(MOVIMIENTOS_POR_LOTE))
+    ])
+    AlertaInsumo.objects.bulk_create([
+        AlertaInsumo(
+            insumo=insumos[i % N_INSUMOS], tipo="BAJO_STOCK", mensaje="Stock bajo el mínimo",
+            is_active=i % 10 != 0,
+        )
+        for i in range(N_ALERTAS)
+    ])
+    estados = ["PENDIENTE", "EN_CURSO", "CERRADA", "CANCELADA"]
+    OrdenInsumo.objects.bulk_create([
+        OrdenInsumo(
+            usuario=usuarios[i % len(usuarios)], estado=estados[i % len(estados)],
+            proveedor=proveedores[i % len(proveedores)], is_active=i % 10 != 0,
+        )
+        for i in range(N_ORDENES)
+    ])
+    with connection.cursor() as cursor:
+        # Estadísticas para el planificador, como en una base con uso real
+        cursor.execute("ANALYZE")
+
+
+class DatosMedianosMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.usuario = get_user_model().objects.create_superuser(email="admin@heladeria.cl", name="Admin", password="x")
+        sembrar_datos(cls.usuario)
+
+
+class PlanesDeConsultaTests(DatosMedianosMixin, TestCase):
+    """Las consultas críticas de las vistas usan su índice y no ordenan ni recorren tablas completas."""
+
+    def indices_por_columnas(self, modelo, *columnas):
+        """Índices de la tabla del modelo cuyas primeras columnas son `columnas`."""
+        with connection.cursor() as cursor:
+            restricciones = connection.introspection.get_constraints(cursor, modelo._meta.db_table)
+        return {
+            nombre for nombre, info in restricciones.items()
+            if info["index"] and info["columns"][:len(columnas)] == list(columnas)
+        }
+
+    def setUp(self):
+        self.client.force_login(self.usuario)
+
+    def plan_de_vista(self, url, tabla):
+        """
+        Pide `url` con el cache vacío, toma el SQL que la vista ejecutó sobre `tabla`
+        (sin contar COUNT del paginador) y devuelve su plan y hallazgos.
+        """
+        cache.clear()
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url)
+            if respuesta.streaming:
+                b"".join(respuesta.streaming_content)
+        self.assertEqual(respuesta.status_code, 200, url)
+        sentencias = [
+            q["sql"] for q in consultas.captured_queries
+            if f'FROM "{tabla}"' in q["sql"] and not q["sql"].startswith("SELECT COUNT(*)")
+        ]
+        self.assertEqual(len(sentencias), 1, f"{url}: se esperaba una consulta sobre {tabla}\n" + "\n".join(sentencias))
+        return analisis_indices.explicar_sql(sentencias[0])
+
+    def assertVistaUsa(self, url, tabla, indices):
+        plan, hallazgos = self.plan_de_vista(url, tabla)
+        texto = "\n".join(plan)
+        self.assertEqual(hallazgos, [], f"{url}:\n{texto}")
+        self.assertTrue(
+            any(f"INDEX {indice}" in texto for indice in indices),
+            f"{url} no usa ninguno de {sorted(indices)}:\n{texto}",
+        )
+
+    def insumo_con_lotes(self):
+        return InsumoLote.objects.filter(is_active=True, cantidad_actual__gt=0, insumo__is_active=True).values_list(
+            "insumo_id", flat=True
+        ).first()
+
+    def test_listado_insumos_con_stock(self):
+        url = reverse("inventario:listar_insumos")
+        self.assertVistaUsa(url, Insumo._meta.db_table, self.indices_por_columnas(Insumo, "nombre"))
+        # El stock sale del índice de lotes por insumo, sin GROUP BY sobre el listado
+        self.assertVistaUsa(url, Insumo._meta.db_table, self.indices_por_columnas(InsumoLote, "insumo_id"))
+
+    def test_lotes_por_vencimiento(self):
+        self.assertVistaUsa(
+            reverse("inventario:listar_lotes") + "?vencimiento=proximos&sort=fexpira",
+            InsumoLote._meta.db_table, self.indices_por_columnas(InsumoLote, "fecha_expiracion"),
+        )
+        self.assertVistaUsa(
+            reverse("inventario:api_obtener_lotes_por_insumo") + f"?insumo_id={self.insumo_con_lotes()}",
+            InsumoLote._meta.db_table, {"lote_activo_fefo_idx"},
+        )
+
+    def test_movimientos_por_fecha(self):
+        tabla = MovimientoLedger._meta.db_table
+        indices = self.indices_por_columnas(MovimientoLedger, "fecha", "id")
+        self.assertVistaUsa(reverse("inventario:listar_movimientos"), tabla, indices)
+        self.assertVistaUsa(reverse("inventario:exportar_movimientos"), tabla, indices)
+        self.assertVistaUsa(
+            reverse("inventario:api_kardex") + f"?insumo={self.insumo_con_lotes()}",
+            tabla, self.indices_por_columnas(MovimientoLedger, "insumo_id", "fecha", "id"),
+        )
+
+    def test_alertas_activas(self):
+        self.assertVistaUsa(reverse("inventario:listar_alertas"), AlertaInsumo._meta.db_table, {"alerta_activa_fecha_idx"})
+
+    def test_ordenes_pendientes(self):
+        url = reverse("inventario:listar_ordenes")
+        self.assertVistaUsa(url, OrdenInsumo._meta.db_table, {"orden_activa_fecha_idx"})
+        self.assertVistaUsa(url + "?estado=PENDIENTE", OrdenInsumo._meta.db_table, {"orden_activa_estado_idx"})
+
+
+class PresupuestoConsultasTests(DatosMedianosMixin, TestCase):
+    """
+    Cantidad de consultas por vista con el cache vacío (peor caso de cada página).
+    Incluyen sesión y usuario (2); listar_lotes además guarda el orden elegido en la sesión.
+    Un N+1 con 300 insumos rompe el presupuesto de inmediato.
+    """
+
+    PRESUPUESTOS = {
+        "inventario:listar_insumos": 7,
+        "inventario:listar_lotes": 8,
+        "inventario:listar_movimientos": 5,
+        "inventario:listar_alertas": 4,
+        "inventario:listar_ordenes": 5,
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.usuario)
+
+    def test_presupuesto_por_vista(self):
+        for nombre, presupuesto in self.PRESUPUESTOS.items():
+            with self.subTest(vista=nombre):
+                cache.clear()
+                with CaptureQueriesContext(connection) as consultas:
+                    response = self.client.get(reverse(nombre))
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(
+                    len(consultas), presupuesto,
+                    f"{nombre}: {len(consultas)} consultas (presupuesto {presupuesto})\n"
+                    + "\n".join(q["sql"] for q in consultas.captured_queries),
+                )
+
+
+class MetricasTests(TestCase):
+    """Endpoint /metrics y suma de los volcados de varios procesos."""
+
+    def setUp(self):
+        self.usuario = get_user_model().objects.create_superuser(email="admin@heladeria.cl", name="Admin", password="x")
+        self.client.force_login(self.usuario)
+
+    @override_settings(METRICAS_TOKEN="secreto")
+    def test_latencia_y_consultas_por_vista(self):
+        self.client.get(reverse("inventario:listar_alertas"))
+        texto = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secreto").content.decode()
+        self.assertIn('heladeria_peticiones_total{vista="inventario:listar_alertas",metodo="GET",estado="2xx"}', texto)
+        self.assertIn('heladeria_peticion_segundos_bucket{vista="inventario:listar_alertas",metodo="GET",le="+Inf"}', texto)
+        self.assertIn('heladeria_db_consultas_total{vista="inventario:listar_alertas"}', texto)
+
+    @override_settings(METRICAS_TOKEN="secreto")
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        respuesta = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer secreto")
+        self.assertEqual(respuesta.status_code, 200)
+
+    @override_settings(METRICAS_TOKEN="", DEBUG=False)
+    def test_sin_token_solo_en_debug(self):
+        self.assertEqual(self.client.get(reverse("metrics"), REMOTE_ADDR="127.0.0.1").status_code, 403)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+
+    def test_evaluacion_masiva_de_alertas(self):
+        check_stock_alerts_batch([])
+        self.assertIn(
+            'heladeria_evaluacion_alertas_segundos_count{evaluacion="stock_masivo"}', metricas.exportar_texto()
+        )
+
+    def test_suma_volcados_de_otros_procesos(self):
+        otro = metricas.Registro()
+        otro.sumar("heladeria_cache_total", ("prueba_otro_proceso", "hit"), 3)
+        otro.observar("heladeria_exportacion_segundos", ("prueba_otro_proceso",), 2)
+        with tempfile.TemporaryDirectory() as directorio, override_settings(METRICAS_DIR=directorio):
+            (Path(directorio) / "1.json").write_text(json.dumps(otro.volcar()))
+            metricas.contar_cache("prueba_otro_proceso", True, 2)
+            texto = metricas.exportar_texto()
+        self.assertIn('heladeria_cache_total{familia="prueba_otro_proceso",resultado="hit"} 5', texto)
+        self.assertIn('heladeria_exportacion_segundos_bucket{exportacion="prueba_otro_proceso",le="2.5"} 1', texto)
+        self.assertIn('heladeria_exportacion_segundos_count{exportacion="prueba_otro_proceso"} 1', texto)
+
+
+class ConsumoPronosticoTests(TestCase):
+    """El consumo del pronóstico solo cuenta salidas reales."""
+
+    def test_ajustes_no_son_consumo(self):
+        usuario = get_user_model().objects.create_user(email="bodega@heladeria.cl", name="Bodega", password="x")
+        insumo = Insumo.objects.create(
+            categoria=Categoria.objects.create(nombre="Lácteos"), nombre="Leche",
+            unidad_medida=UnidadMedida.objects.create(nombre_corto="LT", nombre_largo="Litros"),
+            stock_minimo=10, stock_maximo=200, precio_unitario=1000,
+        )
+        ubicacion = Ubicacion.objects.create(bodega=Bodega.objects.create(nombre="Central", direccion="Calle 1"), nombre="A1")
+        hoy = date.today()
+        Salida.objects.bulk_create([
+            Salida(insumo=insumo, ubicacion=ubicacion, cantidad=cantidad, fecha_generada=hoy, usuario=usuario, tipo=tipo)
+            for tipo, cantidad in [("VENTA", 5), ("MERMA", 2), ("AJUSTE", 50)]
+        ])
+        insumo_ids, matriz = cargar_consumo(hoy - timedelta(days=1), hoy)
+        self.assertEqual(list(insumo_ids), [insumo.pk])
+        self.assertEqual(matriz.tolist(), [[0.0, 7.0]])
+
+
+class ImportacionCatalogoTests(TestCase):
+    def test_reactiva_insumo_y_categoria_eliminados(self):
+        UnidadMedida.objects.create(nombre_corto="LT", nombre_largo="Litros")
+        categoria = Categoria.objects.create(nombre="Lacteos", is_active=False)
+        insumo = Insumo.objects.create(
+            categoria=categoria, nombre="Leche", unidad_medida=UnidadMedida.objects.get(),
+            stock_minimo=10, stock_maximo=200, precio_unitario=1000, is_active=False,
+        )
+        filas, errores, _ = validar_catalogo([{
+            "nombre": "LECHE", "categoria": "lacteos", "unidad_medida": "lt",
+            "stock_minimo": "5", "stock_maximo": "50", "precio_unitario": "1200",
+        }])
+        self.assertEqual(errores, [])
+        resultado = importar_catalogo(filas)
+        self.assertEqual(
+            (resultado["insumos_creados"], resultado["insumos_actualizados"], resultado["insumos_reactivados"]),
+            (0, 1, 1),
+        )
+        insumo.refresh_from_db()
+        categoria.refresh_from_db()
+        self.assertTrue(insumo.is_active)
+        self.assertTrue(categoria.is_active)
+        self.assertEqual((insumo.nombre, insumo.precio_unitario), ("LECHE", 1200))
+
+
+class SobrestockTests(TestCase):
+    def test_exceso_se_descuenta_fifo_con_salidas_de_ajuste(self):
+        usuario = get_user_model().objects.create_user(email="bodega@heladeria.cl", name="Bodega", password="x")
+        insumo = Insumo.objects.create(
+            categoria=Categoria.objects.create(nombre="Lacteos"), nombre="Leche",
+            unidad_medida=UnidadMedida.objects.create(nombre_corto="LT", nombre_largo="Litros"),
+            stock_minimo=10, stock_maximo=50, precio_unitario=1000,
+        )
+        bodega = Bodega.objects.create(nombre="Central", direccion="Calle 1")
+        ubicacion = Ubicacion.objects.create(bodega=bodega, nombre="A1")
+        hoy = date.today()
+        # 120 en stock, máximo 50: se descuentan 70 empezando por el lote más antiguo
+        antiguo, medio, nuevo = InsumoLote.objects.bulk_create([
+            InsumoLote(
+                insumo=insumo, bodega=bodega, fecha_ingreso=hoy - timedelta(days=dias),
+                fecha_expiracion=hoy + timedelta(days=90), cantidad_inicial=cantidad, cantidad_actual=cantidad,
+                usuario=usuario,
+            )
+            for dias, cantidad in [(10, 40), (5, 50), (1, 30)]
+        ])
+
+        aplicadas, omitidas = corregir_sobrestock(usuario)
+
+        self.assertEqual(omitidas, [])
+        self.assertEqual({r["lote_id"]: r["reduccion"] for r in aplicadas}, {antiguo.pk: 40, medio.pk: 30})
+        cantidades = dict(InsumoLote.objects.values_list("id", "cantidad_actual"))
+        self.assertEqual(cantidades, {antiguo.pk: 0, medio.pk: 20, nuevo.pk: 30})
+        self.assertEqual(
+            sorted(Salida.objects.values_list("insumo_lote_id", "cantidad", "tipo", "ubicacion_id", "observaciones")),
+            sorted([
+                (antiguo.pk, 40, "AJUSTE", ubicacion.pk, OBSERVACION_AJUSTE),
+                (medio.pk, 30, "AJUSTE", ubicacion.pk, OBSERVACION_AJUSTE),
+            ]),
+        )
+        self.assertEqual(MovimientoLedger.objects.filter(tipo="SALIDA", subtipo="AJUSTE").count(), 2)
+
+
+class ImportacionMovimientosTests(TestCase):
+    def test_nombre_repetido_en_tres_registros_es_ambiguo(self):
+        Insumo.objects.create(
+            categoria=Categoria.objects.create(nombre="Lacteos"), nombre="Leche",
+            unidad_medida=UnidadMedida.objects.create(nombre_corto="LT", nombre_largo="Litros"),
+            stock_minimo=10, stock_maximo=200, precio_unitario=1000,
+        )
+        for i in range(3):
+            Ubicacion.objects.create(bodega=Bodega.objects.create(nombre=f"Bodega {i}", direccion="Calle 1"), nombre="A1")
+        archivo = BytesIO(
+            "tipo,fecha,insumo,ubicacion,cantidad,lote\n"
+            f"SALIDA,{date.today().isoformat()},Leche,A1,5,\n".encode()
+        )
+        validos, errores, total = validar_archivo(leer_filas(archivo, "movimientos.csv"))
+        self.assertEqual((validos, total), ([], 1))
+        self.assertEqual(len(errores), 1)
+        self.assertIn("ubicación 'A1' es ambiguo", errores[0][1])
+
+
+class NombreUnicoAdminTests(TestCase):
+    def test_nombre_repetido_es_error_de_formulario(self):
+        Categoria.objects.create(nombre="Lacteos")
+        form = CategoriaAdminForm(data={"nombre": "  LACTEOS ", "is_active": True})
+        self.assertFalse(form.is_valid())
+        self.assertIn("nombre", form.errors)
+        self.assertTrue(CategoriaAdminForm(data={"nombre": "Frutas", "is_active": True}).is_valid())
+
+
+class ApiDetalleTests(TestCase):
+    def test_registro_desactivado_solo_con_inactivos(self):
+        self.client.force_login(
+            get_user_model().objects.create_superuser(email="admin@heladeria.cl", name="Admin", password="x")
+        )
+        categoria = Categoria.objects.create(nombre="Lacteos", is_active=False)
+        url = reverse("api-categorias-detail", args=[categoria.pk])
+        # Igual que el listado: lo desactivado no se ve salvo con inactivos=1
+        self.assertEqual(self.client.get(url).status_code, 404)
+        respuesta = self.client.get(url, {"inactivos": "1"})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()["nombre"], "Lacteos")
@@ -9,6 +9,7 @@ urlpatterns = [
     path('insumos/<int:insumo_id>/detalle/', views.ver_detalle_insumo, name='ver_detalle_insumo'),
     path('insumos/editar/<int:insumo_id>/', views.editar_insumo, name='editar_insumo'),
     path('insumos/eliminar/<int:insumo_id>/', views.eliminar_insumo, name='eliminar_insumo'),
+    path('insumos/<int:insumo_id>/aplicar-sugerencia/', views.aplicar_sugerencia_stock, name='aplicar_sugerencia_stock'),
     path('ajax/crear_unidad/', views.crear_unidad_medida_ajax, name='crear_unidad_medida_ajax'),
     path('ajax/editar_unidad/<int:pk>/', views.editar_unidad_medida_ajax, name='editar_unidad_medida_ajax'),
     path('ajax/eliminar_unidad/<int:pk>/', views.eliminar_unidad_medida_ajax, name='eliminar_unidad_medida_ajax'),
@@ -24,8 +25,13 @@ urlpatterns = [
     # --- API JSON Movimientos ---
     path('api/movimientos/entradas/', views.api_movimientos_entradas, name='api_movimientos_entradas'),
     path('api/movimientos/salidas/', views.api_movimientos_salidas, name='api_movimientos_salidas'),
+    path('api/movimientos/', views.api_movimientos, name='api_movimientos'),
+    path('movimientos/exportar/', views.exportar_movimientos, name='exportar_movimientos'),
+    path('movimientos/importar/', views.importar_movimientos, name='importar_movimientos'),
     path('api/buscar-insumos/', views.api_buscar_insumos, name='api_buscar_insumos'),
     path('api/obtener-lotes-por-insumo/', views.api_obtener_lotes_por_insumo, name='api_obtener_lotes_por_insumo'),
+    path('api/kardex/', views.api_kardex, name='api_kardex'),
+    path('kardex/exportar/', views.exportar_kardex, name='exportar_kardex'),
 
     # --- Lotes (Agrupados y Reordenados: Específico a General) ---
     path('lotes/crear/', views.crear_lote, name='crear_lote'),
@@ -50,6 +56,7 @@ urlpatterns = [
     # --- Órdenes ---
     path("ordenes/", views.listar_ordenes, name="listar_ordenes"),
     path("ordenes/nueva/", views.crear_orden, name="crear_orden"),
+    path("ordenes/reposicion/", views.generar_reposicion, name="generar_reposicion"),
     path("ordenes/<int:pk>/editar/", views.editar_orden, name="editar_orden"),
     path("ordenes/<int:pk>/eliminar/", views.eliminar_orden, name="eliminar_orden"),
     path("ordenes/<int:pk>/estado/", views.orden_cambiar_estado, name="orden_cambiar_estado"),
@@ -70,9 +77,13 @@ urlpatterns = [
 
     # --- Reportes ---
     path('reportes/disponibilidad/', views.reporte_disponibilidad, name='reporte_disponibilidad'),
+    path('reportes/stock-historico/', views.stock_historico, name='stock_historico'),
+    path('api/stock-historico/', views.api_stock_historico, name='api_stock_historico'),
+    path('api/stock-historico/tendencia/', views.api_stock_tendencia, name='api_stock_tendencia'),
     
     # --- Configuración de Alertas ---
     path('configuracion/alertas/', views.configurar_alertas, name='configurar_alertas'),
+    path('configuracion/cache/', views.estadisticas_cache_fragmentos, name='estadisticas_cache_fragmentos'),
     
     # Proovedorees
     path('proveedores/', views.listar_proveedores, name='listar_proveedores'),
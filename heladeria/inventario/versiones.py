@@ -0,0 +1,200 @@
+"""
+Registro de versiones de datos por modelo (usando cache de Django).
+
+Cada modelo versionado tiene una versión en el cache compartido entre procesos
+(ver CACHES en settings.py) que cambia en post_save/post_delete (ver signals.py)
+y, de forma explícita, después de operaciones masivas que no disparan señales
+(bulk_create, queryset.update(), queryset.delete()), también desde los comandos
+de manage.py.
+
+Las vistas combinan las versiones con los parámetros de la petición para
+calcular un ETag; si el navegador ya tiene esa versión se responde 304 sin
+volver a consultar la base de datos.
+"""
+import hashlib
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from inspect import iscoroutinefunction
+
+from accounts.decorators import ausuario
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from .metricas import contar_cache
+
+VERSION_KEY_PREFIX = "data_version:"
+
+# {modelo: versión} leídas en la petición actual (ver memo_por_peticion); None fuera de una petición
+_versiones_peticion = ContextVar("versiones_peticion", default=None)
+
+# Parámetros GET que no cambian la respuesta (anti-cache de jQuery, etc.)
+PARAMETROS_IGNORADOS = {"_"}
+
+
+def _clave(modelo):
+    return f"{VERSION_KEY_PREFIX}{modelo._meta.label_lower}"
+
+
+def _version_nueva():
+    # Basada en el tiempo más un sufijo aleatorio: no coincide con ninguna versión
+    # anterior aunque el cache se reinicie, ni con la que escriba otro proceso al mismo tiempo.
+    return int(time.time() * 1000) * 10000 + secrets.randbelow(10000)
+
+
+def incrementar_version(*modelos):
+    """
+    Cambia la versión de los modelos indicados (inmediatamente).
+    Escribe un valor nuevo en vez de usar cache.incr: en el cache de archivos incr es
+    leer + escribir, y dos procesos a la vez podían dejar el mismo número que un lector ya vio.
+    """
+    memo = _versiones_peticion.get()
+    if memo is not None:
+        for modelo in modelos:
+            # La misma petición que escribió debe ver la versión nueva
+            memo.pop(modelo, None)
+    cache.set_many({_clave(m): _version_nueva() for m in modelos}, timeout=None)
+
+
+def incrementar_version_al_confirmar(*modelos):
+    """
+    Incrementa la versión cuando la transacción actual se confirma.
+    Así ningún lector asocia la versión nueva con datos aún no confirmados.
+    Fuera de una transacción se ejecuta de inmediato.
+    """
+    transaction.on_commit(lambda: incrementar_version(*modelos))
+
+
+def obtener_versiones(*modelos):
+    """Devuelve una tupla con la versión actual de cada modelo (una sola lectura al cache)."""
+    claves = [_clave(m) for m in modelos]
+    versiones = cache.get_many(claves)
+    faltantes = [c for c in claves if c not in versiones]
+    contar_cache("data_version", True, len(claves) - len(faltantes))
+    contar_cache("data_version", False, len(faltantes))
+    for clave in faltantes:
+        cache.add(clave, _version_nueva(), timeout=None)
+    if faltantes:
+        versiones.update(cache.get_many(faltantes))
+    return tuple(versiones.get(c, 0) for c in claves)
+
+
+async def aobtener_versiones(*modelos):
+    """Versión async de obtener_versiones: no bloquea el event loop con la E/S del cache."""
+    claves = [_clave(m) for m in modelos]
+    versiones = await cache.aget_many(claves)
+    faltantes = [c for c in claves if c not in versiones]
+    contar_cache("data_version", True, len(claves) - len(faltantes))
+    contar_cache("data_version", False, len(faltantes))
+    for clave in faltantes:
+        await cache.aadd(clave, _version_nueva(), timeout=None)
+    if faltantes:
+        versiones.update(await cache.aget_many(faltantes))
+    return tuple(versiones.get(c, 0) for c in claves)
+
+
+@contextmanager
+def memo_por_peticion():
+    """Dentro del bloque, obtener_versiones_peticion lee cada modelo del cache a lo sumo una vez."""
+    token = _versiones_peticion.set({})
+    try:
+        yield
+    finally:
+        _versiones_peticion.reset(token)
+
+
+def obtener_versiones_peticion(*modelos):
+    """
+    Como obtener_versiones, pero reutiliza lo ya leído en la petición actual.
+    Para datos de referencia (ver referencias.py): varias lecturas por petición,
+    una sola ida al cache compartido.
+    """
+    memo = _versiones_peticion.get()
+    if memo is None:
+        return obtener_versiones(*modelos)
+    faltantes = [m for m in modelos if m not in memo]
+    if faltantes:
+        memo.update(zip(faltantes, obtener_versiones(*faltantes)))
+    return tuple(memo[m] for m in modelos)
+
+
+def query_normalizada(querydict):
+    """Serializa los parámetros GET en orden estable, sin los parámetros ignorados."""
+    return "&".join(
+        f"{k}={v}"
+        for k in sorted(querydict.keys())
+        if k not in PARAMETROS_IGNORADOS
+        for v in querydict.getlist(k)
+    )
+
+
+def calcular_etag(request, modelos, extra=(), versiones=None):
+    """
+    ETag = hash(versiones de los modelos + ruta + GET normalizado + usuario + extra).
+    `extra` permite agregar estado que no viaja en la URL (ej. per_page guardado en sesión).
+    Si ya se leyeron las versiones se pueden pasar en `versiones` para no repetir la lectura.
+    """
+    user = getattr(request, "user", None)
+    if versiones is None:
+        versiones = obtener_versiones(*modelos)
+    partes = [
+        request.path,
+        query_normalizada(request.GET),
+        str(getattr(user, "pk", "") or ""),
+        *(str(v) for v in versiones),
+        *(str(e) for e in extra),
+    ]
+    return '"%s"' % hashlib.sha1("|".join(partes).encode("utf-8")).hexdigest()
+
+
+def respuesta_no_modificada(request, etag):
+    """Devuelve un 304 si el cliente ya tiene `etag`; None en caso contrario."""
+    if request.method not in ("GET", "HEAD"):
+        return None
+    respuesta = get_conditional_response(request, etag=etag)
+    contar_cache("etag", respuesta is not None)
+    if respuesta is not None:
+        marcar_respuesta(respuesta, etag)
+    return respuesta
+
+
+def marcar_respuesta(response, etag):
+    """Agrega ETag y cabeceras para que el navegador revalide siempre antes de reutilizar."""
+    if response.status_code in (200, 304):
+        response["ETag"] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ("X-Requested-With",))
+    return response
+
+
+def etag_por_version(*modelos):
+    """
+    Decorador para endpoints GET cuyo contenido depende solo de `modelos`,
+    los parámetros GET y el usuario. Ubicarlo debajo de los decoradores de permisos.
+    Acepta vistas síncronas y async.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_async(request, *args, **kwargs):
+                # request.user debe estar resuelto antes de calcular el ETag (ver accounts.decorators.ausuario)
+                await ausuario(request)
+                etag = calcular_etag(request, modelos, versiones=await aobtener_versiones(*modelos))
+                no_modificada = respuesta_no_modificada(request, etag)
+                if no_modificada is not None:
+                    return no_modificada
+                return marcar_respuesta(await view_func(request, *args, **kwargs), etag)
+            return _wrapped_async
+
+        @wraps(view_func)
+        def _wrapped(request, *args, **kwargs):
+            etag = calcular_etag(request, modelos)
+            no_modificada = respuesta_no_modificada(request, etag)
+            if no_modificada is not None:
+                return no_modificada
+            return marcar_respuesta(view_func(request, *args, **kwargs), etag)
+        return _wrapped
+    return decorator
@@ -1,4 +1,6 @@
+from contextlib import nullcontext
 from decimal import Decimal
+from asgiref.sync import sync_to_async
 import json
 from django.shortcuts import render, redirect, get_object_or_404
 from accounts.decorators import perfil_required
@@ -6,26 +8,38 @@ from accounts.services import user_has_role
 from django.http import JsonResponse, HttpResponseBadRequest
 from django.contrib import messages
 from django.db import transaction
-from django.db.models import Sum, Q, DecimalField, Count, Min, F, Prefetch
+from django.db.models import Sum, Q, DecimalField, Max, F, OuterRef, Prefetch, Subquery
 from django.db.models.functions import Coalesce
 from django.core.paginator import Paginator
 from django.forms import ModelForm, inlineformset_factory, formset_factory
 from django.views.decorators.http import require_POST, require_http_methods
 from accounts.services import user_has_role
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth import get_user_model
 from django.db.models import Prefetch
 from .services import check_and_create_stock_alerts
+from .metricas import medir_exportacion
+from .replica import lectura_en_replica, usar_replica
+from .versiones import (
+    calcular_etag, respuesta_no_modificada, marcar_respuesta, etag_por_version, obtener_versiones,
+)
+from .cache_fragmentos import clave_fragmento, obtener_fragmento, renderizar_fragmento
+from .stock_historico import stock_en_fecha, tendencia_stock
+from .kardex import pagina_kardex, iterar_kardex
+from .reposicion import generar_ordenes_reposicion
+from . import importacion, referencias
 from .models import (
     Insumo, Categoria, Bodega,
     Entrada, Salida, InsumoLote,
     OrdenInsumo, OrdenInsumoDetalle, UnidadMedida, AlertaInsumo, Proveedor,
+    ReporteDisponibilidadSnapshot, StockDiario, MovimientoLedger, SugerenciaStock,
     ESTADO_ORDEN_CHOICES, TIPO_ORDEN_CHOICES            
 )
 from django.urls import reverse
 from .forms import (
     InsumoForm, CategoriaForm, SalidaLineaForm,EntradaLineaForm,EntradaLineaFormSet,SalidaLineaFormSet,
     EntradaLineaFormSetMovimiento, SalidaLineaFormSetMovimiento, 
-    EntradaLineaFormSetMovimientoAjax, SalidaLineaFormSetMovimientoAjax,
+    EntradaLineaFormSetMovimientoAjax, SalidaLineaFormSetMovimientoAjax, LineaMovimientoFormSet,
     OrdenInsumoForm, InsumoLoteMetadataForm,
     #MovimientoLineaFormSet, 
     BodegaForm, ProveedorForm,
@@ -45,7 +59,8 @@ from reportlab.lib.styles import getSampleStyleSheet
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from datetime import date,timedelta
 import csv
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
 from django.views.decorators.http import require_GET
 
 from functools import reduce
@@ -55,6 +70,12 @@ from django.template.loader import render_to_string
 from inventario import models
 
 
+class _Eco:
+    """Archivo falso para csv.writer: writerow devuelve la línea en vez de escribirla (exportaciones en streaming)."""
+    def write(self, value):
+        return value
+
+
 # --- Función genérica para listas con filtros, orden y paginación ---
 def list_with_filters(
     request,
@@ -70,8 +91,10 @@ def list_with_filters(
     default_order="asc",         
     tie_break="id",              
     extra_context=None,          # dict extra opcional
+    version_models=None,         # modelos de los que depende el listado (ETag/304 en AJAX, réplica)
 ):
     extra_context = extra_context or {}
+    es_ajax = request.headers.get("x-requested-with") == "XMLHttpRequest"
 
     # --- per_page (10/25/50) con sesión por lista ---
     allowed_pp = {"10", "25", "50", "100"}
@@ -104,34 +127,66 @@ def list_with_filters(
     order = request.session.get(f"order_{session_prefix}", default_order)
 
     if order_field:
-        ordering = order_field if order == "asc" else f"-{order_field}"
-        base_qs = base_qs.order_by(ordering, tie_break)
+        # Desempate en el mismo sentido: el orden coincide con un índice (campo, id)
+        signo = "" if order == "asc" else "-"
+        base_qs = base_qs.order_by(f"{signo}{order_field}", f"{signo}{tie_break}")
     else:
         # Si no hay campo de orden, mantenemos el QS (pero con desempate para determinismo)
         base_qs = base_qs.order_by(tie_break)
 
-    # --- paginación ---
-    paginator = Paginator(base_qs, per_page)
-    page_number = request.GET.get("page")
-    page_obj = paginator.get_page(page_number)
+    # --- ETag y cache de fragmentos: si el fragmento no cambió, 304 o HTML
+    # cacheado sin consultar ni renderizar ---
+    etag = clave_fragmento_html = None
+    if es_ajax and version_models:
+        # Estado que no viaja en la URL: per_page/order de sesión y flags
+        # como read_only (dependen del rol, no del usuario)
+        estado = [partial_template, per_page, order]
+        estado += [
+            f"{k}={v}" for k, v in sorted(extra_context.items())
+            if v is None or isinstance(v, (str, int, float, Decimal, date))
+        ]
+        versiones = obtener_versiones(*version_models)
+        etag = calcular_etag(request, version_models, extra=estado, versiones=versiones)
+        no_modificada = respuesta_no_modificada(request, etag)
+        if no_modificada is not None:
+            return no_modificada
+
+        clave_fragmento_html = clave_fragmento(request, partial_template, estado, versiones)
+        html = obtener_fragmento(request, partial_template, clave_fragmento_html)
+        if html is not None:
+            return marcar_respuesta(JsonResponse({"html": html}), etag)
+
+    # Paginación y render leen de la réplica si está al día para version_models (ver replica.py)
+    lectura = usar_replica(*version_models) if version_models and request.method == "GET" else nullcontext()
+    with lectura:
+        # --- paginación ---
+        paginator = Paginator(base_qs, per_page)
+        page_number = request.GET.get("page")
+        page_obj = paginator.get_page(page_number)
+
+        # --- armar contexto común ---
+        context = {
+            context_key: page_obj,
+            "per_page": per_page,
+            "q": q,
+            "order": order,
+            **extra_context,
+            "request": request,  # necesario para preservar GET en links dentro del partial
+        }
 
-    # --- armar contexto común ---
-    context = {
-        context_key: page_obj,
-        "per_page": per_page,
-        "q": q,
-        "order": order,
-        **extra_context,
-        "request": request,  # necesario para preservar GET en links dentro del partial
-    }
+        # --- respuesta AJAX (solo fragmento) ---
+        if es_ajax:
+            if clave_fragmento_html:
+                html = renderizar_fragmento(request, partial_template, context, clave_fragmento_html)
+            else:
+                html = render_to_string(partial_template, context, request=request)
+            response = JsonResponse({"html": html})
+            if etag:
+                marcar_respuesta(response, etag)
+            return response
 
-    # --- respuesta AJAX (solo fragmento) ---
-    if request.headers.get("x-requested-with") == "XMLHttpRequest":
-        html = render_to_string(partial_template, context, request=request)
-        return JsonResponse({"html": html})
-
-    # --- respuesta normal (página completa) ---
-    return render(request, full_template, context)
+        # --- respuesta normal (página completa) ---
+        return render(request, full_template, context)
 
 # --- DASHBOARD (ACTUALIZADO: Interactivo) ---
 @login_required
@@ -139,7 +194,7 @@ def dashboard_view(request):
     # OPTIMIZACIÓN: Cuentas totales usando valores en cache cuando sea posible
     # Para 100k+ registros, estas consultas deben ser rápidas con índices apropiados
     total_insumos = Insumo.objects.filter(is_active=True).count()
-    total_bodegas = Bodega.objects.filter(is_active=True).count()
+    total_bodegas = len(referencias.bodegas.activos())
     ordenes_pendientes_count = OrdenInsumo.objects.filter(estado='PENDIENTE', is_active=True).count()
     visitas = request.session.get('visitas', 0)
     request.session['visitas'] = visitas + 1
@@ -228,6 +283,7 @@ def listar_alertas(request):
         context_key="alertas",
         full_template="inventario/listar_alertas.html", 
         partial_template="inventario/partials/alertas_results.html", 
+        version_models=(AlertaInsumo, Insumo),
         default_per_page=20,
         default_order="desc", 
         tie_break="id",
@@ -309,14 +365,14 @@ from decimal import Decimal
 # --- Función AJAX: Obtener información de stock y límites para un Insumo ---
 
 @login_required
-def get_insumo_stock_info(request, insumo_id):
+async def get_insumo_stock_info(request, insumo_id):
     """
     Retorna en formato JSON el stock actual, stock mínimo y stock máximo 
     para un insumo dado, usado para asistir al usuario en formularios de movimiento.
     """
     try:
         # 1. Obtener el insumo y calcular el stock actual en una sola consulta
-        insumo = (
+        insumo = await (
             Insumo.objects.filter(id=insumo_id, is_active=True)
             .annotate(
                 stock_actual=Coalesce(
@@ -325,8 +381,8 @@ def get_insumo_stock_info(request, insumo_id):
                     output_field=DecimalField(max_digits=10, decimal_places=2)
                 )
             )
-            .select_related('unidad_medida')
-            .get()
+            .select_related('unidad_medida', 'sugerencia_stock')
+            .aget()
         )
         
         # 2. Determinar el mensaje de ayuda (simulación de inteligencia)
@@ -352,6 +408,27 @@ def get_insumo_stock_info(request, insumo_id):
         else:
             mensaje_ayuda = f"✅ **Stock OK**: {current_stock:.2f} {unidad_corto}. Rango óptimo: {min_stock:.2f} - {max_stock:.2f}."
 
+        # 3. Sugerencia calculada por consumo (comando calcular_sugerencias_stock), si existe
+        sugerencia = None
+        try:
+            sug = insumo.sugerencia_stock
+        except SugerenciaStock.DoesNotExist:
+            sug = None
+        if sug is not None:
+            sugerencia = {
+                'consumo_diario': float(sug.consumo_diario),
+                'stock_seguridad': float(sug.stock_seguridad),
+                'punto_reorden': float(sug.punto_reorden),
+                'minimo_sugerido': float(sug.minimo_sugerido),
+                'maximo_sugerido': float(sug.maximo_sugerido),
+                'metodo': sug.get_metodo_display(),
+                'calculado_en': sug.calculado_en.isoformat(),
+            }
+            mensaje_ayuda += (
+                f" 📈 Según consumo (~{sug.consumo_diario:.2f} {unidad_corto}/día): "
+                f"reordenar bajo **{sug.punto_reorden:.2f}**, rango sugerido {sug.minimo_sugerido:.2f} - {sug.maximo_sugerido:.2f}."
+            )
+
 
         return JsonResponse({
             'success': True,
@@ -360,6 +437,7 @@ def get_insumo_stock_info(request, insumo_id):
             'stock_maximo': float(max_stock),
             'unidad_medida': unidad_corto,
             'mensaje_ayuda': mensaje_ayuda,
+            'sugerencia': sugerencia,
         })
 
     except Insumo.DoesNotExist:
@@ -375,10 +453,16 @@ def get_insumo_stock_info(request, insumo_id):
     readonly_for=("Bodeguero",)             
 )
 def listar_insumos(request):
+    # Stock con subconsulta correlacionada (no JOIN + GROUP BY): la página sale en orden
+    # del índice por nombre sin tabla temporal y el stock se suma solo para sus filas
+    stock_por_insumo = (
+        InsumoLote.objects.filter(insumo=OuterRef('pk')).order_by()
+        .values('insumo').annotate(total=Sum('cantidad_actual')).values('total')
+    )
     qs = (
         Insumo.objects.filter(is_active=True)
-        .annotate(stock_actual=Coalesce(Sum('lotes__cantidad_actual'), 0, output_field=DecimalField()))
-        .select_related('categoria', 'unidad_medida') # Optimizada
+        .annotate(stock_actual=Coalesce(Subquery(stock_por_insumo), 0, output_field=DecimalField()))
+        .select_related('categoria', 'unidad_medida', 'sugerencia_stock') # Optimizada
     )
 
     allowed_sort = {"nombre", "categoria", "stock", "unidad"}
@@ -407,12 +491,35 @@ def listar_insumos(request):
         context_key="insumos",
         full_template="inventario/listar_insumos.html",
         partial_template="inventario/partials/insumos_results.html",
+        version_models=(Insumo, InsumoLote, Categoria, UnidadMedida, SugerenciaStock),
         default_per_page=10, # Este es solo el fallback inicial. list_with_filters usa la sesión o el valor GET.
         default_order="asc",
         tie_break="id",
         extra_context={"read_only": read_only,"titulo": "Listado de Insumos", "sort": sort},
     )
 
+@login_required
+@perfil_required(allow=("administrador", "Encargado"))
+@require_POST
+def aplicar_sugerencia_stock(request, insumo_id):
+    """Copia el mínimo/máximo sugerido por consumo al insumo."""
+    insumo = get_object_or_404(Insumo.objects.select_related('sugerencia_stock'), id=insumo_id, is_active=True)
+    try:
+        sug = insumo.sugerencia_stock
+    except SugerenciaStock.DoesNotExist:
+        messages.error(request, f"'{insumo.nombre}' no tiene sugerencia de stock calculada.")
+        return redirect("inventario:listar_insumos")
+
+    insumo.stock_minimo = sug.minimo_sugerido.quantize(Decimal("0.01"))
+    insumo.stock_maximo = max(sug.maximo_sugerido, sug.minimo_sugerido).quantize(Decimal("0.01"))
+    # update_fields dispara la revisión de alertas (signals.insumo_post_save_check_alerts)
+    insumo.save(update_fields=["stock_minimo", "stock_maximo", "updated_at"])
+    messages.success(
+        request,
+        f"Stock de '{insumo.nombre}' actualizado: mínimo {insumo.stock_minimo}, máximo {insumo.stock_maximo}.",
+    )
+    return redirect("inventario:listar_insumos")
+
 # --- CREAR INSUMO (Actualizado: Pasa UnidadMedidaForm) ---
 @login_required
 @perfil_required(allow=("administrador", "Encargado"))
@@ -522,7 +629,7 @@ def ver_detalle_insumo(request, insumo_id):
     # Obtener últimos movimientos (entradas y salidas)
     entradas_recientes = Entrada.objects.filter(
         insumo=insumo
-    ).select_related('ubicacion', 'usuario').order_by('-fecha')[:5]
+    ).select_related('usuario').order_by('-fecha')[:5]
     
     salidas_recientes = Salida.objects.filter(
         insumo=insumo
@@ -636,6 +743,8 @@ def eliminar_unidad_medida_ajax(request, pk):
 # --- exportar LOTES DE INSUMO ---
 @login_required
 @perfil_required(allow=("administrador", "Encargado"))
+@lectura_en_replica(InsumoLote, Insumo, Bodega, Proveedor)
+@medir_exportacion("lotes")
 def exportar_lotes(request):
     """
     Exporta la lista de lotes de insumos a Excel o PDF, respetando filtros y orden.
@@ -950,6 +1059,7 @@ def listar_insumos_lote(request):
         context_key="lotes",
         full_template="inventario/listar_insumo_lote.html",
         partial_template="inventario/partials/insumo_lote_results.html",
+        version_models=(InsumoLote, Insumo, Bodega, Proveedor),
         default_per_page=10,
         default_order="asc",
         tie_break="id",
@@ -962,7 +1072,7 @@ def listar_insumos_lote(request):
             "dias_proximos": dias,
 
             # 🔥 de aquí lo “trae” el template
-            "proveedores": Proveedor.objects.all().order_by("nombre_empresa"),
+            "proveedores": referencias.proveedores_activos.activos(),
             "proveedor_sel": proveedor_id,   # ⬅️ eso es lo que estás usando en el partial
         },
     )
@@ -1047,20 +1157,109 @@ def ver_detalle_lote(request, pk):
         messages.error(request, f"El lote #{pk} no existe o fue eliminado del sistema.")
         return redirect('inventario:listar_lotes')
     
-    # Obtener los movimientos asociados para el detalle
-    entradas = models.Entrada.objects.filter(insumo_lote=lote).select_related('ubicacion', 'usuario').order_by('-fecha')
-    salidas = models.Salida.objects.filter(insumo_lote=lote).select_related('ubicacion', 'usuario').order_by('-fecha_generada')
-
+    # Los movimientos se muestran en el kardex paginado (api_kardex); aquí solo los conteos
     return render(request, 'inventario/ver_detalle_lote.html', {
         'titulo': f'Detalle Lote #{pk}',
         'lote': lote,
-        'entradas': entradas,
-        'salidas': salidas,
+        'total_entradas': models.Entrada.objects.filter(insumo_lote=lote).count(),
+        'total_salidas': models.Salida.objects.filter(insumo_lote=lote).count(),
+    })
+
+
+# --- KARDEX (libro de existencias con saldo acumulado) ---
+def _kardex_objetivo(request):
+    """Lee ?insumo= o ?lote= y retorna (insumo_id, lote_id); (None, None) si falta."""
+    insumo_id = request.GET.get("insumo") or ""
+    lote_id = request.GET.get("lote") or ""
+    if lote_id.isdigit():
+        return None, int(lote_id)
+    if insumo_id.isdigit():
+        return int(insumo_id), None
+    return None, None
+
+
+@login_required
+@perfil_required(allow=("administrador", "Encargado"), readonly_for=("Bodeguero",))
+@require_GET
+@etag_por_version(Entrada, Salida, models.Ubicacion, Bodega, get_user_model())
+@lectura_en_replica(Entrada, Salida, models.Ubicacion, Bodega, get_user_model())
+def api_kardex(request):
+    """
+    Kardex paginado por cursor de un insumo o lote (?insumo= | ?lote=).
+    Parámetros: cursor (de la respuesta anterior), desde (YYYY-MM-DD), limit.
+    """
+    insumo_id, lote_id = _kardex_objetivo(request)
+    if not (insumo_id or lote_id):
+        return JsonResponse({"error": "Se requiere insumo o lote"}, status=400)
+    try:
+        pagina = pagina_kardex(
+            insumo_id=insumo_id,
+            lote_id=lote_id,
+            cursor=request.GET.get("cursor") or None,
+            desde=_parse_fecha(request.GET.get("desde")),
+            limit=int(request.GET.get("limit") or 50),
+        )
+    except ValueError:
+        return JsonResponse({"error": "Parámetros inválidos"}, status=400)
+
+    return JsonResponse({
+        "saldo_inicial": float(pagina["saldo_inicial"]),
+        "siguiente": pagina["siguiente"],
+        "results": [
+            {
+                "id": f["id"],
+                "tipo": f["tipo"],
+                "subtipo": f["subtipo"],
+                "fecha": f["fecha"].isoformat(),
+                "entrada": float(f["entrada"]),
+                "salida": float(f["salida"]),
+                "saldo": float(f["saldo"]),
+                "lote_id": f["lote_id"],
+                "ubicacion": f["ubicacion"],
+                "bodega": f["bodega"],
+                "usuario": f["usuario"],
+                "observaciones": f["observaciones"],
+            }
+            for f in pagina["filas"]
+        ],
     })
 
+
+@login_required
+@perfil_required(allow=("administrador", "Encargado"), readonly_for=("Bodeguero",))
+@require_GET
+@lectura_en_replica(Entrada, Salida, Insumo, InsumoLote, models.Ubicacion, Bodega, get_user_model())
+@medir_exportacion("kardex")
+def exportar_kardex(request):
+    """Exporta el kardex completo a CSV en streaming (saldo acumulado fila a fila)."""
+    insumo_id, lote_id = _kardex_objetivo(request)
+    if not (insumo_id or lote_id):
+        return HttpResponseBadRequest("Se requiere insumo o lote")
+    desde = _parse_fecha(request.GET.get("desde"))
+
+    writer = csv.writer(_Eco())
+
+    def filas():
+        yield writer.writerow([
+            "Fecha", "Tipo", "Subtipo", "ID", "Lote", "Bodega", "Ubicación",
+            "Entrada", "Salida", "Saldo", "Usuario", "Observaciones",
+        ])
+        for f in iterar_kardex(insumo_id=insumo_id, lote_id=lote_id, desde=desde):
+            yield writer.writerow([
+                f["fecha"].isoformat(), f["tipo"], f["subtipo"], f["id"], f["lote_id"] or "",
+                f["bodega"], f["ubicacion"], f["entrada"], f["salida"], f["saldo"],
+                f["usuario"], f["observaciones"],
+            ])
+
+    nombre = f"lote_{lote_id}" if lote_id else f"insumo_{insumo_id}"
+    response = StreamingHttpResponse(filas(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="kardex_{nombre}_{date.today().isoformat()}.csv"'
+    return response
+
 # --- CATEGORÍAS ---
 @login_required
 @perfil_required(allow=("administrador", "Encargado"), readonly_for=("Bodeguero",))
+@lectura_en_replica(Categoria)
 def listar_categorias(request):
     allowed_pp = {"5", "10", "20"}
     per_page_get = request.GET.get("per_page")
@@ -1331,8 +1530,42 @@ def registrar_movimiento(request):
         "orden": orden_obj,
     })'''
 
+def _movimientos_ledger(q="", insumo_id=None, tipo=None):
+    """Movimientos del ledger único (más recientes primero) con los filtros del listado."""
+    qs = (
+        MovimientoLedger.objects.select_related("insumo", "insumo_lote", "usuario")
+        .only(
+            "id", "tipo", "origen_id", "subtipo", "fecha", "cantidad", "observaciones", "ubicacion",
+            "insumo__nombre", "insumo_lote__id", "insumo_lote__fecha_expiracion",
+            "usuario__name", "usuario__email",
+        )
+        .order_by("-fecha", "-id")
+    )
+    if tipo:
+        qs = qs.filter(tipo=tipo)
+    if insumo_id:
+        try:
+            qs = qs.filter(insumo_id=int(insumo_id))
+        except (ValueError, TypeError):
+            pass
+    if q:
+        qs = qs.filter(
+            Q(insumo__nombre__icontains=q) | Q(ubicacion__nombre__icontains=q) | Q(observaciones__icontains=q)
+        )
+    return qs
+
+
+def _per_page_api(request):
+    try:
+        per_page = int(request.GET.get("per_page", 20))
+    except ValueError:
+        per_page = 20
+    return per_page if per_page in (10, 20, 50) else 20
+
+
 @login_required
 @perfil_required(allow=("administrador", "Encargado")) 
+@lectura_en_replica(Entrada, Salida, Insumo, InsumoLote, models.Ubicacion, get_user_model())
 def listar_movimientos(request):
     titulo = "Movimientos de Inventario"
     q = (request.GET.get("q") or "").strip()
@@ -1347,58 +1580,21 @@ def listar_movimientos(request):
     
     # Determinar qué pestaña se está solicitando (por GET o por defecto 'entradas')
     pestaña_activa = request.GET.get("tab", "entradas")
+    if pestaña_activa not in ("entradas", "salidas", "todos"):
+        pestaña_activa = "entradas"
 
-    # 1. Definición de QuerySets base
-    entradas_qs = (
-        Entrada.objects.select_related("insumo", "insumo_lote", "ubicacion")
-        .only("id", "fecha", "cantidad", "observaciones", "insumo__nombre", "ubicacion__nombre", "insumo_lote__fecha_expiracion", "usuario__name", "usuario__email")
-        .order_by("-fecha")
-    )
-    salidas_qs  = (
-        Salida.objects.select_related("insumo", "insumo_lote", "ubicacion")
-        .only("id", "fecha_generada", "cantidad", "tipo", "observaciones", "insumo__nombre", "ubicacion__nombre", "insumo_lote__id", "usuario__name", "usuario__email")
-        .order_by("-fecha_generada")
-    )
+    # 1. Todas las pestañas leen el ledger único (MovimientoLedger): una tabla, un índice por (fecha, id)
+    tipo_por_tab = {"entradas": "ENTRADA", "salidas": "SALIDA", "todos": None}
+    page_param = {"entradas": "page_e", "salidas": "page_s", "todos": "page_t"}[pestaña_activa]
+    movs_qs = _movimientos_ledger(q, insumo_id, tipo_por_tab[pestaña_activa])
 
-    # 2. Aplicación de filtros de búsqueda
-    # Filtro por insumo específico
-    if insumo_id:
-        try:
-            insumo_id_int = int(insumo_id)
-            entradas_qs = entradas_qs.filter(insumo_id=insumo_id_int)
-            salidas_qs = salidas_qs.filter(insumo_id=insumo_id_int)
-        except (ValueError, TypeError):
-            pass
+    # 2. Paginación solo de la pestaña activa (evita el COUNT(*) de las demás en la carga inicial)
+    vacio = Paginator(MovimientoLedger.objects.none(), 1).get_page(1)
+    paginas = {"entradas": vacio, "salidas": vacio, "todos": vacio}
+    paginas[pestaña_activa] = Paginator(movs_qs, per_page).get_page(request.GET.get(page_param))
+    entradas, salidas, todos = paginas["entradas"], paginas["salidas"], paginas["todos"]
     
-    # Filtro por texto (búsqueda general)
-    if q:
-        entradas_qs = entradas_qs.filter(
-            Q(insumo__nombre__icontains=q) | Q(ubicacion__nombre__icontains=q) | Q(observaciones__icontains=q)
-        )
-        salidas_qs = salidas_qs.filter(
-            Q(insumo__nombre__icontains=q) | Q(ubicacion__nombre__icontains=q)
-        )
-
-    # Inicialización de variables de contexto
-    entradas = None
-    salidas = None
-    
-    # 3. Paginación Condicional (para la carga inicial o AJAX)
-    if pestaña_activa == "salidas":
-        page_s = request.GET.get("page_s")
-        p_s = Paginator(salidas_qs, per_page)
-        salidas = p_s.get_page(page_s)
-        # Para evitar el COUNT(*) de entradas en la carga inicial si se solicita Salidas
-        entradas = Paginator(Entrada.objects.none(), 1).get_page(1)
-        
-    else: # pestaña_activa == "entradas" o carga inicial
-        page_e = request.GET.get("page_e")
-        p_e = Paginator(entradas_qs, per_page)
-        entradas = p_e.get_page(page_e)
-        # Para evitar el COUNT(*) de salidas en la carga inicial o si solo se ven entradas
-        salidas = Paginator(Salida.objects.none(), 1).get_page(1)
-    
-    # 4. Contexto común
+    # 3. Contexto común
     can_manage = request.user.is_superuser or user_has_role(request.user, "administrador", "encargado")
     
     # Obtener información del insumo seleccionado para mostrar en el filtro
@@ -1413,6 +1609,7 @@ def listar_movimientos(request):
         "titulo": titulo,
         "entradas": entradas,
         "salidas": salidas,
+        "todos": todos,
         "can_manage": can_manage,
         "q": q,
         "insumo_id": insumo_id,
@@ -1422,138 +1619,228 @@ def listar_movimientos(request):
         "is_salida_active": pestaña_activa == "salidas",
     }
 
-    # 5. RESPUESTA AJAX (Para paginación o cambio de pestaña)
+    # 4. RESPUESTA AJAX (Para paginación o cambio de pestaña)
     if request.headers.get("x-requested-with") == "XMLHttpRequest":
-        if pestaña_activa == "salidas":
-            html = render_to_string(
-                "inventario/partials/salidas_table.html",
-                {"movimientos": salidas, "q": q, "page_param": "page_s", "can_manage": can_manage},
-                request=request,
-            )
-        else:
-            html = render_to_string(
-                "inventario/partials/entradas_table.html",
-                {"movimientos": entradas, "q": q, "page_param": "page_e", "can_manage": can_manage},
-                request=request,
-            )
+        parcial = {
+            "entradas": "inventario/partials/entradas_table.html",
+            "salidas": "inventario/partials/salidas_table.html",
+            "todos": "inventario/partials/movimientos_table.html",
+        }[pestaña_activa]
+        html = render_to_string(
+            parcial,
+            {"movimientos": paginas[pestaña_activa], "q": q, "page_param": page_param, "can_manage": can_manage},
+            request=request,
+        )
         
         # Devolvemos un JSON que contiene solo el HTML renderizado
         return JsonResponse({"html": html})
 
 
-    # 6. RESPUESTA NORMAL (Carga inicial de la página completa)
+    # 5. RESPUESTA NORMAL (Carga inicial de la página completa)
     return render(request, "inventario/listar_movimientos.html", context)
 
 
+async def _apaginar(qs, numero, per_page):
+    """Equivalente async de Paginator.get_page: (filas, página, páginas, total)."""
+    count = await qs.acount()
+    paginas = max(1, -(-count // per_page))
+    try:
+        numero = min(max(int(numero), 1), paginas)
+    except (TypeError, ValueError):
+        numero = 1
+    inicio = (numero - 1) * per_page
+    filas = [fila async for fila in qs[inicio:inicio + per_page]]
+    return filas, numero, paginas, count
+
+
+async def _respuesta_movimientos(request, tipo, page_param, serializar):
+    qs = _movimientos_ledger(
+        (request.GET.get("q") or "").strip(), request.GET.get("insumo_id") or None, tipo
+    )
+    per_page = _per_page_api(request)
+    filas, numero, paginas, count = await _apaginar(qs, request.GET.get(page_param), per_page)
+    # Nombres de ubicación desde el mapa en memoria (sin JOIN); la recarga, si toca, consulta la base
+    ubicaciones = await sync_to_async(referencias.ubicaciones)()
+    return JsonResponse({
+        "results": [serializar(m, ubicaciones) for m in filas],
+        "page": numero,
+        "pages": paginas,
+        "count": count,
+        "per_page": per_page,
+    })
+
+
+def _usuario_mov(m):
+    return m.usuario.name or m.usuario.email
+
+
 # --- API JSON Paginada: Movimientos ---
 @login_required
 @perfil_required(allow=("administrador", "Encargado"))
 @require_GET
-def api_movimientos_entradas(request):
+@etag_por_version(Entrada, Insumo, InsumoLote, models.Ubicacion, get_user_model())
+@lectura_en_replica(Entrada, Insumo, InsumoLote, models.Ubicacion, get_user_model())
+async def api_movimientos_entradas(request):
     """Devuelve JSON paginado de entradas con filtros básicos."""
-    q = (request.GET.get("q") or "").strip()
-    try:
-        per_page = int(request.GET.get("per_page", 20))
-    except ValueError:
-        per_page = 20
-    if per_page not in (10, 20, 50):
-        per_page = 20
-    page_e = request.GET.get("page_e")
+    return await _respuesta_movimientos(request, "ENTRADA", "page_e", lambda e, ubicaciones: {
+        "id": e.origen_id,
+        "fecha": e.fecha.isoformat() if e.fecha else None,
+        "insumo": e.insumo.nombre,
+        "cantidad": float(e.cantidad_absoluta),
+        "ubicacion": referencias.nombre_ubicacion(e.ubicacion_id, mapa=ubicaciones),
+        "fecha_expiracion": (e.insumo_lote.fecha_expiracion.isoformat() if e.insumo_lote and e.insumo_lote.fecha_expiracion else None),
+        "usuario": _usuario_mov(e),
+    })
 
-    qs = (
-        Entrada.objects.select_related("insumo", "insumo_lote", "ubicacion", "usuario")
-        .only(
-            "id", "fecha", "cantidad", "observaciones",
-            "insumo__nombre", "ubicacion__nombre", "insumo_lote__fecha_expiracion",
-            "usuario__name", "usuario__email"
-        )
-        .order_by("-fecha")
-    )
-    if q:
-        qs = qs.filter(
-            Q(insumo__nombre__icontains=q) | Q(ubicacion__nombre__icontains=q) | Q(observaciones__icontains=q)
-        )
 
-    paginator = Paginator(qs, per_page)
-    page_obj = paginator.get_page(page_e)
+@login_required
+@perfil_required(allow=("administrador", "Encargado"))
+@require_GET
+@etag_por_version(Salida, Insumo, InsumoLote, models.Ubicacion, get_user_model())
+@lectura_en_replica(Salida, Insumo, InsumoLote, models.Ubicacion, get_user_model())
+async def api_movimientos_salidas(request):
+    """Devuelve JSON paginado de salidas con filtros básicos."""
+    return await _respuesta_movimientos(request, "SALIDA", "page_s", lambda s, ubicaciones: {
+        "id": s.origen_id,
+        "fecha_generada": s.fecha.isoformat() if s.fecha else None,
+        "insumo": s.insumo.nombre,
+        "cantidad": float(s.cantidad_absoluta),
+        "ubicacion": referencias.nombre_ubicacion(s.ubicacion_id, mapa=ubicaciones),
+        "lote_id": s.insumo_lote_id,
+        "tipo": s.subtipo,
+        "usuario": _usuario_mov(s),
+    })
 
-    data = [
-        {
-            "id": e.id,
-            "fecha": e.fecha.isoformat() if e.fecha else None,
-            "insumo": e.insumo.nombre,
-            "cantidad": float(e.cantidad),
-            "ubicacion": e.ubicacion.nombre,
-            "fecha_expiracion": (e.insumo_lote.fecha_expiracion.isoformat() if e.insumo_lote and e.insumo_lote.fecha_expiracion else None),
-            "usuario": (e.usuario.name or e.usuario.email) if hasattr(e, "usuario") else None,
-        }
-        for e in page_obj
-    ]
 
-    return JsonResponse({
-        "results": data,
-        "page": page_obj.number,
-        "pages": paginator.num_pages,
-        "count": paginator.count,
-        "per_page": per_page,
+@login_required
+@perfil_required(allow=("administrador", "Encargado"))
+@require_GET
+@etag_por_version(Entrada, Salida, Insumo, InsumoLote, models.Ubicacion, get_user_model())
+@lectura_en_replica(Entrada, Salida, Insumo, InsumoLote, models.Ubicacion, get_user_model())
+async def api_movimientos(request):
+    """Línea de tiempo combinada (entradas y salidas) paginada desde el ledger."""
+    return await _respuesta_movimientos(request, None, "page_t", lambda m, ubicaciones: {
+        "id": m.origen_id,
+        "tipo": m.tipo,
+        "subtipo": m.subtipo,
+        "fecha": m.fecha.isoformat() if m.fecha else None,
+        "insumo": m.insumo.nombre,
+        "cantidad": float(m.cantidad),
+        "ubicacion": referencias.nombre_ubicacion(m.ubicacion_id, mapa=ubicaciones),
+        "lote_id": m.insumo_lote_id,
+        "usuario": _usuario_mov(m),
     })
 
+COLUMNAS_EXPORTACION = [
+    ("fecha", "fecha"), ("tipo", "tipo"), ("subtipo", "subtipo"), ("id", "origen_id"),
+    ("insumo_id", "insumo_id"), ("insumo", "insumo__nombre"), ("lote_id", "insumo_lote_id"),
+    ("bodega", "bodega__nombre"), ("ubicacion", "ubicacion_id"), ("cantidad", "cantidad"),
+    ("usuario", "usuario__email"), ("orden_id", "orden_id"), ("observaciones", "observaciones"),
+]
+
 
 @login_required
 @perfil_required(allow=("administrador", "Encargado"))
 @require_GET
-def api_movimientos_salidas(request):
-    """Devuelve JSON paginado de salidas con filtros básicos."""
-    q = (request.GET.get("q") or "").strip()
-    try:
-        per_page = int(request.GET.get("per_page", 20))
-    except ValueError:
-        per_page = 20
-    if per_page not in (10, 20, 50):
-        per_page = 20
-    page_s = request.GET.get("page_s")
-
-    qs = (
-        Salida.objects.select_related("insumo", "insumo_lote", "ubicacion", "usuario")
-        .only(
-            "id", "fecha_generada", "cantidad", "tipo", "observaciones",
-            "insumo__nombre", "ubicacion__nombre", "insumo_lote__id",
-            "usuario__name", "usuario__email"
-        )
-        .order_by("-fecha_generada")
+@lectura_en_replica(Entrada, Salida, Insumo, InsumoLote, models.Ubicacion, get_user_model())
+@medir_exportacion("movimientos")
+def exportar_movimientos(request):
+    """
+    Exporta entradas y salidas de un rango de fechas en streaming (CSV o NDJSON).
+    Parámetros: desde, hasta (YYYY-MM-DD, por defecto el mes en curso), insumo_id,
+    bodega_id, tipo (ENTRADA | SALIDA) y formato (csv | ndjson).
+    Lee el ledger en orden (fecha, id) con un iterador por bloques: la memoria no
+    depende de la cantidad de filas.
+    """
+    hoy = date.today()
+    desde = _parse_fecha(request.GET.get("desde"), hoy.replace(day=1))
+    hasta = _parse_fecha(request.GET.get("hasta"), hoy)
+    if desde > hasta:
+        return HttpResponseBadRequest("El rango de fechas es inválido")
+
+    qs = MovimientoLedger.objects.filter(is_active=True, fecha__gte=desde, fecha__lte=hasta)
+    tipo = (request.GET.get("tipo") or "").upper()
+    if tipo in ("ENTRADA", "SALIDA"):
+        qs = qs.filter(tipo=tipo)
+    for parametro, campo in (("insumo_id", "insumo_id"), ("bodega_id", "bodega_id")):
+        valor = request.GET.get(parametro) or ""
+        if valor.isdigit():
+            qs = qs.filter(**{campo: int(valor)})
+
+    nombres = [nombre for nombre, _ in COLUMNAS_EXPORTACION]
+    # La ubicación se lee como id y se traduce con el mapa en memoria (un JOIN menos por fila)
+    ubicaciones = referencias.ubicaciones()
+    col_ubicacion = nombres.index("ubicacion")
+    filas = (
+        (*fila[:col_ubicacion], referencias.nombre_ubicacion(fila[col_ubicacion], mapa=ubicaciones), *fila[col_ubicacion + 1:])
+        for fila in qs.order_by("fecha", "id")
+        .values_list(*(campo for _, campo in COLUMNAS_EXPORTACION))
+        .iterator(chunk_size=5000)
     )
-    if q:
-        qs = qs.filter(
-            Q(insumo__nombre__icontains=q) | Q(ubicacion__nombre__icontains=q) | Q(observaciones__icontains=q)
-        )
+    nombre_archivo = f"movimientos_{desde.isoformat()}_{hasta.isoformat()}"
 
-    paginator = Paginator(qs, per_page)
-    page_obj = paginator.get_page(page_s)
+    if request.GET.get("formato") == "ndjson":
+        encoder = DjangoJSONEncoder()
+        contenido = (encoder.encode(dict(zip(nombres, fila))) + "\n" for fila in filas)
+        response = StreamingHttpResponse(contenido, content_type="application/x-ndjson")
+        response["Content-Disposition"] = f'attachment; filename="{nombre_archivo}.ndjson"'
+        return response
 
-    data = [
-        {
-            "id": s.id,
-            "fecha_generada": s.fecha_generada.isoformat() if s.fecha_generada else None,
-            "insumo": s.insumo.nombre,
-            "cantidad": float(s.cantidad),
-            "ubicacion": s.ubicacion.nombre,
-            "lote_id": (s.insumo_lote.id if s.insumo_lote else None),
-            "tipo": s.tipo,
-            "usuario": (s.usuario.name or s.usuario.email) if hasattr(s, "usuario") else None,
-        }
-        for s in page_obj
-    ]
+    writer = csv.writer(_Eco())
+
+    def contenido_csv():
+        yield writer.writerow(nombres)
+        for fila in filas:
+            yield writer.writerow(fila)
+
+    response = StreamingHttpResponse(contenido_csv(), content_type="text/csv; charset=utf-8")
+    response["Content-Disposition"] = f'attachment; filename="{nombre_archivo}.csv"'
+    return response
+
+
+@login_required
+@perfil_required(allow=("administrador", "Encargado"))
+@require_http_methods(["GET", "POST"])
+def importar_movimientos(request):
+    """
+    Carga masiva de entradas y salidas desde CSV o XLSX (ver columnas en
+    inventario/importacion.py). Primero se valida el archivo completo; si hay
+    errores no se escribe nada, salvo que se pida omitir las filas con error.
+    """
+    contexto = {"titulo": "Importar movimientos", "columnas": importacion.COLUMNAS}
+    archivo = request.FILES.get("archivo")
+    if request.method == "GET" or not archivo:
+        if request.method == "POST":
+            messages.error(request, "Selecciona un archivo CSV o XLSX.")
+        return render(request, "inventario/importar_movimientos.html", contexto)
+
+    try:
+        validos, errores, total = importacion.validar_archivo(importacion.leer_filas(archivo, archivo.name))
+    except importacion.ErrorArchivo as exc:
+        messages.error(request, str(exc))
+        return render(request, "inventario/importar_movimientos.html", contexto)
+
+    contexto.update({"total": total, "validos": len(validos), "errores": errores, "archivo_nombre": archivo.name})
+    solo_validar = request.POST.get("solo_validar") == "1"
+    omitir_errores = request.POST.get("omitir_errores") == "1"
+    if solo_validar or not validos or (errores and not omitir_errores):
+        if errores and not solo_validar:
+            messages.warning(request, "El archivo tiene errores; no se importó ningún movimiento.")
+        return render(request, "inventario/importar_movimientos.html", contexto)
+
+    escritos = importacion.importar_movimientos(validos, request.user)
+    messages.success(
+        request,
+        f"Importación completada: {escritos['entradas']} entrada(s) y {escritos['salidas']} salida(s)"
+        + (f"; {total - len(validos)} fila(s) omitidas por errores." if errores else "."),
+    )
+    return redirect("inventario:listar_movimientos")
 
-    return JsonResponse({
-        "results": data,
-        "page": page_obj.number,
-        "pages": paginator.num_pages,
-        "count": paginator.count,
-        "per_page": per_page,
-    })
 
 @login_required
-def api_obtener_lotes_por_insumo(request):
+@etag_por_version(InsumoLote, Insumo, models.Ubicacion, Bodega, Proveedor)
+@lectura_en_replica(InsumoLote, Insumo, models.Ubicacion, Bodega, Proveedor)
+async def api_obtener_lotes_por_insumo(request):
     """API para obtener lotes disponibles de un insumo específico."""
     insumo_id = request.GET.get('insumo_id')
     ubicacion_id = request.GET.get('ubicacion_id')  # Opcional: filtrar por bodega de la ubicación
@@ -1562,7 +1849,7 @@ def api_obtener_lotes_por_insumo(request):
         return JsonResponse({"error": "Se requiere insumo_id"}, status=400)
     
     try:
-        insumo = Insumo.objects.get(id=insumo_id, is_active=True)
+        insumo = await Insumo.objects.aget(id=insumo_id, is_active=True)
     except Insumo.DoesNotExist:
         return JsonResponse({"error": "Insumo no encontrado"}, status=404)
     
@@ -1575,11 +1862,9 @@ def api_obtener_lotes_por_insumo(request):
     
     # Si se especifica ubicación, filtrar por su bodega
     if ubicacion_id:
-        try:
-            ubicacion = models.Ubicacion.objects.get(id=ubicacion_id)
-            lotes_qs = lotes_qs.filter(bodega=ubicacion.bodega)
-        except models.Ubicacion.DoesNotExist:
-            pass
+        ubicacion = await sync_to_async(referencias.ubicacion)(ubicacion_id)
+        if ubicacion is not None:
+            lotes_qs = lotes_qs.filter(bodega_id=ubicacion.bodega_id)
     
     lotes_qs = lotes_qs.order_by('fecha_expiracion')  # FIFO: primero los que expiran antes
     
@@ -1593,13 +1878,15 @@ def api_obtener_lotes_por_insumo(request):
             "bodega_id": lote.bodega.id,
             "fecha_expiracion": lote.fecha_expiracion.isoformat(),
         }
-        for lote in lotes_qs
+        async for lote in lotes_qs.aiterator()
     ]
     
     return JsonResponse({"results": lotes})
 
 @login_required
-def api_buscar_insumos(request):
+@etag_por_version(Insumo, Categoria)
+@lectura_en_replica(Insumo, Categoria)
+async def api_buscar_insumos(request):
     """API para buscar insumos con autocompletado (Select2)."""
     q = (request.GET.get("q") or "").strip()
     ids = request.GET.get("ids", "").strip()  # IDs específicos para precargar
@@ -1620,8 +1907,7 @@ def api_buscar_insumos(request):
     qs = qs.order_by('nombre')
     
     # Paginación
-    paginator = Paginator(qs, per_page)
-    page_obj = paginator.get_page(page)
+    insumos, numero, paginas, _ = await _apaginar(qs, page, per_page)
     
     # Formato compatible con Select2
     results = [
@@ -1629,13 +1915,13 @@ def api_buscar_insumos(request):
             "id": insumo.id,
             "text": f"{insumo.nombre} ({insumo.categoria.nombre if insumo.categoria else 'Sin categoría'})",
         }
-        for insumo in page_obj
+        for insumo in insumos
     ]
     
     return JsonResponse({
         "results": results,
         "pagination": {
-            "more": page_obj.has_next()
+            "more": numero < paginas
         }
     })
 
@@ -1725,7 +2011,7 @@ def registrar_entrada(request):
     else:
         # Si hay precarga (insumo), no crear línea extra vacía
         if initial_data:
-            DynamicFormSet = formset_factory(EntradaLineaForm, extra=0, can_delete=True)
+            DynamicFormSet = formset_factory(EntradaLineaForm, formset=LineaMovimientoFormSet, extra=0, can_delete=True)
         else:
             DynamicFormSet = EntradaLineaFormSet
         formset = DynamicFormSet(initial=initial_data if initial_data else None)
@@ -1866,7 +2152,7 @@ def registrar_salida(request):
         # Evitar línea extra cuando se precarga desde insumo u orden
         if initial_data:
             # Usar extra=0 para que solo salgan las líneas precargadas
-            DynamicFormSet = formset_factory(SalidaLineaForm, extra=0, can_delete=True) 
+            DynamicFormSet = formset_factory(SalidaLineaForm, formset=LineaMovimientoFormSet, extra=0, can_delete=True) 
         else:
             # Usar extra=1 si no hay precarga, para dar un campo inicial al usuario
             DynamicFormSet = SalidaLineaFormSet
@@ -2078,8 +2364,10 @@ def registrar_entrada_orden(request, pk):
         return redirect('inventario:listar_ordenes')
 
     # --- OBTENER DEFAULTS para campos obligatorios (Ubicación/Proveedor/Fecha) ---
-    default_ubicacion = models.Ubicacion.objects.filter(is_active=True).first()
-    default_proveedor = models.Proveedor.objects.filter(is_active=True).first()
+    # Desde los catálogos en memoria: el de menor id, como .first(). El proveedor se toma de los
+    # ACTIVOS, que son los únicos que acepta el formulario de la línea.
+    default_ubicacion = min(referencias.ubicaciones.activos(), key=lambda u: u.id, default=None)
+    default_proveedor = min(referencias.proveedores_activos.activos(), key=lambda p: p.id, default=None)
     
     if not default_ubicacion or not default_proveedor:
          messages.error(request, "Error de Configuración: No hay ubicaciones o proveedores activos para precargar la entrada. Debe crear al menos uno.")
@@ -2193,7 +2481,7 @@ def registrar_entrada_orden(request, pk):
         messages.error(request, "Revisa los errores en el formulario antes de continuar.")
 
     # --- LÓGICA RENDER (GET/Fallo POST) ---
-    DynamicFormSet = formset_factory(EntradaLineaForm, extra=0, can_delete=True) 
+    DynamicFormSet = formset_factory(EntradaLineaForm, formset=LineaMovimientoFormSet, extra=0, can_delete=True) 
 
     if request.method == "POST" and formset.errors:
         # Si el POST falla, el formset ya contiene los errores
@@ -2255,7 +2543,7 @@ def registrar_salida_orden(request, pk):
             if not lineas:
                 messages.warning(request, "No se ingresó ninguna línea válida para registrar.")
                 # Si el POST falla sin líneas válidas, volvemos a mostrar el formulario con extra=0
-                DynamicFormSet = formset_factory(SalidaLineaForm, extra=0, can_delete=True)
+                DynamicFormSet = formset_factory(SalidaLineaForm, formset=LineaMovimientoFormSet, extra=0, can_delete=True)
                 formset = DynamicFormSet(initial=initial_data if initial_data else None)
                 return render(request, "inventario/registrar_salida.html", {
                     "formset": formset,
@@ -2321,7 +2609,7 @@ def registrar_salida_orden(request, pk):
 
     # --- LÓGICA RENDER (GET/Fallo POST) ---
     # Usamos extra=0 en ambos casos para evitar que se añadan líneas no relacionadas con la orden.
-    DynamicFormSet = formset_factory(SalidaLineaForm, extra=0, can_delete=True) 
+    DynamicFormSet = formset_factory(SalidaLineaForm, formset=LineaMovimientoFormSet, extra=0, can_delete=True) 
 
     formset = DynamicFormSet(initial=initial_data if initial_data else None)
 
@@ -2558,6 +2846,7 @@ def listar_bodegas(request):
         context_key="bodegas",
         full_template="inventario/listar_bodegas.html",
         partial_template="inventario/partials/bodegas_results.html",
+        version_models=(Bodega,),
         default_per_page=10,
         default_order="asc",   # GET 'order' la sobreescribe
         tie_break="id",
@@ -2646,7 +2935,7 @@ def listar_ordenes(request):
         qs = qs.filter(is_active=True)
     
     qs = (
-        qs.select_related("usuario")
+        qs.select_related("usuario", "proveedor")
         .prefetch_related(
             Prefetch(
                 "detalles",
@@ -2708,6 +2997,7 @@ def listar_ordenes(request):
         context_key="ordenes",
         full_template="inventario/listar_ordenes.html",
         partial_template="inventario/partials/ordenes_results.html",
+        version_models=(OrdenInsumo, OrdenInsumoDetalle, Proveedor, get_user_model()),
         default_per_page=10,
         default_order="desc",
         tie_break="id",
@@ -2720,9 +3010,26 @@ def listar_ordenes(request):
             "ESTADOS_ORDEN": ESTADOS_ORDEN,
             "ESTADO_ORDEN_CHOICES": ESTADO_ORDEN_CHOICES,
             "read_only": read_only, # <--- Se pasa el valor actualizado
+            "puede_reponer": request.user.is_superuser or user_has_role(request.user, "Administrador", "Encargado"),
         },
     )
 
+@login_required
+@perfil_required(allow=("administrador", "Encargado"))
+@require_POST
+def generar_reposicion(request):
+    """Crea órdenes de ENTRADA (una por proveedor) para los insumos bajo su mínimo."""
+    grupos = generar_ordenes_reposicion(request.user)
+    if not grupos:
+        messages.info(request, "No hay insumos bajo el mínimo que requieran reposición.")
+    else:
+        lineas = sum(len(filas) for filas in grupos.values())
+        messages.success(
+            request,
+            f"✅ {len(grupos)} orden(es) de reposición creadas con {lineas} insumo(s).",
+        )
+    return redirect("inventario:listar_ordenes")
+
 @login_required
 @perfil_required(allow=("administrador", "Encargado"))
 def orden_cambiar_estado(request, pk):
@@ -2871,6 +3178,7 @@ def eliminar_orden(request, pk):
 @login_required
 @perfil_required(allow=("administrador", "Encargado"))
 @require_http_methods(["GET", "POST"])
+@lectura_en_replica(InsumoLote, Insumo, Bodega, Categoria, UnidadMedida)
 def reporte_disponibilidad(request):
     """
     Reporte de disponibilidad de insumos con:
@@ -2928,82 +3236,56 @@ def reporte_disponibilidad(request):
 
     has_selection = bool(selected_insumos)
 
-    # Base queryset de insumos (activos + categoría activa)
-    insumos_base = (
-        Insumo.objects.filter(is_active=True, categoria__is_active=True)
-        .select_related("categoria")
-    )
-
-    # Si vienen seleccionados, filtramos por nombre (case-insensitive)
-    if has_selection:
-        insumos_base = insumos_base.filter(nombre__in=selected_insumos)
-
-    # Prefetch de lotes activos para cada insumo (ordenados por fecha de expiración)
-    lotes_qs = (
-        InsumoLote.objects
-        .filter(is_active=True)
-        .select_related("bodega")
-        .order_by("fecha_expiracion", "id")
-    )
+    # Lectura desde la proyección reporte_disponibilidad_snapshot (mantenida por
+    # señales): sin agregaciones sobre lotes en cada petición.
+    # visible = insumo activo + categoría activa
+    snapshot_base = ReporteDisponibilidadSnapshot.objects.filter(visible=True)
 
-    # Anotaciones de stock total, #lotes con stock, prox venc
+    # Si vienen seleccionados, filtramos por nombre
     if has_selection:
-        insumos_qs = (
-            insumos_base
-            .annotate(
-                stock_total=Coalesce(
-                    Sum(
-                        "lotes__cantidad_actual",
-                        filter=Q(lotes__is_active=True),
-                        output_field=DecimalField(max_digits=12, decimal_places=2),
-                    ),
-                    0,
-                    output_field=DecimalField(max_digits=12, decimal_places=2),
-                ),
-                lotes_con_stock=Count(
-                    "lotes",
-                    filter=Q(lotes__is_active=True, lotes__cantidad_actual__gt=0),
-                    distinct=True,
-                ),
-                prox_vencimiento=Min(
-                    "lotes__fecha_expiracion",
-                    filter=Q(lotes__is_active=True, lotes__cantidad_actual__gt=0),
-                ),
-            )
-            .prefetch_related(Prefetch("lotes", queryset=lotes_qs, to_attr="lotes_vis"))
-            .order_by("categoria__nombre", "nombre")
+        filas = list(
+            snapshot_base.filter(nombre__in=selected_insumos)
+            .order_by("categoria_nombre", "categoria_id", "nombre")
         )
     else:
-        insumos_qs = insumos_base.none()
+        filas = []
+
+    # Lotes indentados: solo para el HTML con la columna de lotes activa
+    if filas and show_lotes and fmt not in ("csv", "xlsx", "excel", "pdf"):
+        lotes_por_insumo = {}
+        lotes_qs = (
+            InsumoLote.objects
+            .filter(is_active=True, insumo_id__in=[f.insumo_id for f in filas])
+            .select_related("bodega")
+            .only("id", "insumo_id", "fecha_ingreso", "fecha_expiracion", "cantidad_actual", "bodega__nombre")
+            .order_by("fecha_expiracion", "id")
+        )
+        for lote in lotes_qs:
+            lotes_por_insumo.setdefault(lote.insumo_id, []).append(lote)
+        for f in filas:
+            f.lotes_vis = lotes_por_insumo.get(f.insumo_id, [])
 
     # Dataset para checkboxes (todos los nombres disponibles, ordenados)
     all_insumo_names = list(
-        Insumo.objects.filter(is_active=True, categoria__is_active=True)
-        .order_by("nombre")
-        .values_list("nombre", flat=True)
+        snapshot_base.order_by("nombre").values_list("nombre", flat=True)
     )
 
-    # Agrupado por categoría (para HTML)
+    # Agrupado por categoría (para HTML y exports)
     categorias = []
     cat_actual = None
     buffer = []
-    for i in insumos_qs:
-        if not cat_actual or i.categoria_id != cat_actual.id:
+    for i in filas:
+        if cat_actual is None or i.categoria_id != cat_actual:
             if buffer:
-                categorias.append({"categoria": cat_actual, "insumos": buffer})
+                categorias.append({"categoria_nombre": buffer[0].categoria_nombre, "insumos": buffer})
                 buffer = []
-            cat_actual = i.categoria
-        # cálculo auxiliar para HTML
-        i.precio_acumulado = (i.stock_total or 0) * (i.precio_unitario or 0)
+            cat_actual = i.categoria_id
         buffer.append(i)
     if buffer:
-        categorias.append({"categoria": cat_actual, "insumos": buffer})
+        categorias.append({"categoria_nombre": buffer[0].categoria_nombre, "insumos": buffer})
 
-    total_stock = sum((i.stock_total or 0) for i in insumos_qs)
-    total_valor = sum(
-        ((i.stock_total or 0) * (i.precio_unitario or 0))
-        for i in insumos_qs
-    )
+    total_stock = sum((i.stock_total or 0) for i in filas)
+    total_valor = sum((i.valor or 0) for i in filas)
 
     # ------- EXPORTS (respetan filtro de insumos, mantienen columnas clásicas) -------
     if fmt == "csv":
@@ -3028,9 +3310,9 @@ def reporte_disponibilidad(request):
             for i in bloque["insumos"]:
                 writer.writerow(
                     [
-                        bloque["categoria"].nombre if bloque["categoria"] else "",
+                        bloque["categoria_nombre"],
                         i.nombre,
-                        str(i.unidad_medida), # Asegurar str() para CSV
+                        i.unidad,
                         f"{i.precio_unitario}",
                         f"{i.stock_total:.2f}",
                         i.lotes_con_stock,
@@ -3096,9 +3378,9 @@ def reporte_disponibilidad(request):
                 
                 ws.append(
                     [
-                        bloque["categoria"].nombre,
+                        bloque["categoria_nombre"],
                         i.nombre,
-                        str(i.unidad_medida), # CORREGIDO: Forzar a string
+                        i.unidad,
                         float(i.precio_unitario or 0),
                         float(i.stock_total or 0),
                         int(i.lotes_con_stock or 0),
@@ -3221,7 +3503,7 @@ def reporte_disponibilidad(request):
         for bloque in categorias:
             story.append(
                 Paragraph(
-                    f"Categoría: {bloque['categoria'].nombre}",
+                    f"Categoría: {bloque['categoria_nombre']}",
                     styles["Heading3"],
                 )
             )
@@ -3230,7 +3512,7 @@ def reporte_disponibilidad(request):
                 data.append(
                     [
                         i.nombre,
-                        str(i.unidad_medida), # Asegurar str() para PDF
+                        i.unidad,
                         f"{(i.precio_unitario or 0):,.0f}",
                         f"{(i.stock_total or 0):,.2f}",
                         int(i.lotes_con_stock or 0),
@@ -3331,6 +3613,81 @@ def reporte_disponibilidad(request):
 
     return render(request, "inventario/reporte_disponibilidad.html", context)
 
+
+# --- STOCK HISTÓRICO (lee solo filas precalculadas de StockDiario) ---
+def _parse_fecha(valor, default=None):
+    try:
+        return date.fromisoformat(valor) if valor else default
+    except ValueError:
+        return default
+
+
+@login_required
+@perfil_required(allow=("administrador", "Encargado"))
+@lectura_en_replica(StockDiario)
+def stock_historico(request):
+    """Página de consulta: stock en una fecha y tendencia por insumo/bodega."""
+    hoy = date.today()
+    ultimo_calculo = StockDiario.objects.aggregate(f=Max("fecha"))["f"]
+    return render(request, "inventario/stock_historico.html", {
+        "titulo": "Stock Histórico",
+        "hoy": hoy,
+        "desde_default": hoy - timedelta(days=30),
+        "ultimo_calculo": ultimo_calculo,
+        "bodegas": referencias.bodegas.activos(),
+    })
+
+
+@login_required
+@perfil_required(allow=("administrador", "Encargado"))
+@require_GET
+@etag_por_version(StockDiario, Bodega)
+@lectura_en_replica(StockDiario, Bodega)
+def api_stock_historico(request):
+    """Stock por bodega de un insumo al cierre de una fecha (?insumo=&fecha=&bodega=)."""
+    insumo_id = request.GET.get("insumo")
+    if not (insumo_id or "").isdigit():
+        return JsonResponse({"error": "Se requiere insumo"}, status=400)
+    fecha = _parse_fecha(request.GET.get("fecha"), date.today())
+    bodega_id = request.GET.get("bodega") or None
+
+    filas = stock_en_fecha(int(insumo_id), fecha, bodega_id)
+    return JsonResponse({
+        "insumo": int(insumo_id),
+        "fecha": fecha.isoformat(),
+        "total": float(sum(f["cantidad"] for f in filas)),
+        "valor_total": float(sum(f["valor"] for f in filas)),
+        "bodegas": [
+            {
+                "bodega_id": f["bodega_id"],
+                "bodega": f["bodega__nombre"],
+                "cantidad": float(f["cantidad"]),
+                "valor": float(f["valor"]),
+                "desde": f["fecha"].isoformat(),
+            }
+            for f in filas
+        ],
+    })
+
+
+@login_required
+@perfil_required(allow=("administrador", "Encargado"))
+@require_GET
+@etag_por_version(StockDiario)
+@lectura_en_replica(StockDiario)
+def api_stock_tendencia(request):
+    """Serie diaria de stock de un insumo (?insumo=&desde=&hasta=&bodega=)."""
+    insumo_id = request.GET.get("insumo")
+    if not (insumo_id or "").isdigit():
+        return JsonResponse({"error": "Se requiere insumo"}, status=400)
+    hasta = _parse_fecha(request.GET.get("hasta"), date.today())
+    desde = _parse_fecha(request.GET.get("desde"), hasta - timedelta(days=30))
+    if desde > hasta:
+        return JsonResponse({"error": "El rango de fechas es inválido"}, status=400)
+
+    serie = tendencia_stock(int(insumo_id), desde, hasta, request.GET.get("bodega") or None)
+    return JsonResponse({"insumo": int(insumo_id), "serie": serie})
+
 # --- CRUD PROVEEDORES ---
 
 @login_required
@@ -3357,6 +3714,7 @@ def listar_proveedores(request):
         context_key="proveedores",
         full_template="inventario/listar_proveedores.html", # Plantilla de lista principal
         partial_template="inventario/partials/proveedores_results.html", # Tabla AJAX
+        version_models=(Proveedor,),
         default_per_page=10,
         tie_break="id",
         extra_context={
@@ -3467,3 +3825,13 @@ def configurar_alertas(request):
         return JsonResponse(context)
     
     return render(request, 'inventario/configurar_alertas_CACHE.html', context)
+
+
+@staff_member_required
+def estadisticas_cache_fragmentos(request):
+    """Aciertos/fallos del cache de fragmentos de listados (JSON). POST reinicia los contadores."""
+    from .cache_fragmentos import estadisticas_fragmentos, reiniciar_estadisticas
+
+    if request.method == "POST":
+        reiniciar_estadisticas()
+    return JsonResponse({"fragmentos": estadisticas_fragmentos()})